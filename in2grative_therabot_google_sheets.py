@@ -1,34 +1,54 @@
-import streamlit as st
-from datetime import datetime
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import pandas as pd
-
-# Google Sheets setup
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name("therabot-credentials.json", scope)
-client = gspread.authorize(creds)
-
-sheet = client.open_by_url("https://docs.google.com/spreadsheets/d/1wIewM-ehdoZTXB6OgP9vTXWqPhXkLZDfAY8O5w03Ntk")
-mood_ws = sheet.worksheet("Mood Logs")
-journal_ws = sheet.worksheet("Journal History")
-
-# Streamlit UI
-st.set_page_config(page_title="In2Grative TheraBot", layout="centered")
-st.title("In2Grative TheraBot")
-page = st.sidebar.selectbox("Navigate to:", ["Mood Scale", "Journal Entry"])
-
-if page == "Mood Scale":
-    st.header("Mood Scale")
-    mood = st.slider("Rate your mood (0–10)", 0, 10)
-    note = st.text_input("Optional note")
-    if st.button("Submit Mood"):
-        mood_ws.append_row([datetime.now().strftime("%Y-%m-%d %H:%M"), mood, note])
-        st.success("Mood entry saved to Google Sheets.")
-
-elif page == "Journal Entry":
-    st.header("Journal Entry")
-    entry = st.text_area("Write your thoughts")
-    if st.button("Submit Entry"):
-        journal_ws.append_row([datetime.now().strftime("%Y-%m-%d %H:%M"), entry])
-        st.success("Journal entry saved to Google Sheets.")
+import streamlit as st
+from datetime import datetime
+import pandas as pd
+from therabot_sheets_client import SheetsClient
+from therabot_sheets_sync import GspreadTransport, SheetsOutbox, SheetsSyncWorker
+
+# Google Sheets setup
+# The client authorizes and opens the spreadsheet on the first append, not at
+# import, and is cached for the process so reruns never reconnect.
+@st.cache_resource(show_spinner=False)
+def get_sheets_client():
+    return SheetsClient()
+
+# Rows are queued locally and appended in batches by a background thread, so
+# a submit never waits on Google and a failed append is retried, not lost.
+# One worker per process, shared across reruns and sessions.
+@st.cache_resource(show_spinner=False)
+def get_sheets_sync():
+    client = get_sheets_client()
+    return SheetsSyncWorker(SheetsOutbox(), GspreadTransport(client.worksheet, client.reset)).start()
+
+sheets_sync = get_sheets_sync()
+
+# Streamlit UI
+st.set_page_config(page_title="In2Grative TheraBot", layout="centered")
+st.title("In2Grative TheraBot")
+page = st.sidebar.selectbox("Navigate to:", ["Mood Scale", "Journal Entry"])
+sync_status = sheets_sync.status()
+if sync_status["pending"]:
+    st.sidebar.caption(f"{sync_status['pending']} entries waiting to sync to Google Sheets")
+if sync_status["dead_letters"]:
+    st.sidebar.warning(f"{sync_status['dead_letters']} entries were rejected by Google Sheets "
+                       f"and won't be retried. Last error: {sync_status['last_error']}")
+if st.sidebar.button("Check Google Sheets connection"):
+    health = get_sheets_client().health(connect=True)
+    if health["ok"]:
+        st.sidebar.success(f"Connected ({health['latency_ms']:.0f} ms)")
+    else:
+        st.sidebar.error(f"Google Sheets unreachable: {health['error']}")
+
+if page == "Mood Scale":
+    st.header("Mood Scale")
+    mood = st.slider("Rate your mood (0–10)", 0, 10)
+    note = st.text_input("Optional note")
+    if st.button("Submit Mood"):
+        sheets_sync.enqueue("Mood Logs", [datetime.now().strftime("%Y-%m-%d %H:%M"), mood, note])
+        st.success("Mood entry saved. It will sync to Google Sheets shortly.")
+
+elif page == "Journal Entry":
+    st.header("Journal Entry")
+    entry = st.text_area("Write your thoughts")
+    if st.button("Submit Entry"):
+        sheets_sync.enqueue("Journal History", [datetime.now().strftime("%Y-%m-%d %H:%M"), entry])
+        st.success("Journal entry saved. It will sync to Google Sheets shortly.")
@@ -0,0 +1,54 @@
+"""ConversationStore paging against a temporary database."""
+import pytest
+
+import therabot_chat
+from therabot_chat import ConversationStore
+from therabot_db import ConnectionPool, migrate
+from therabot_writer import GroupCommitWriter
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    pool = ConnectionPool(str(tmp_path / "chat.db"))
+    migrate(pool)
+    writer = GroupCommitWriter(pool)
+    monkeypatch.setattr(therabot_chat, "db_cursor", pool.cursor)
+    monkeypatch.setattr(therabot_chat, "get_writer", lambda: writer)
+    yield ConversationStore(1, recent_turns=5, page_turns=3)
+    writer.stop()
+    pool.close()
+
+
+def add(store, n):
+    for _ in range(n):
+        store.add_turn("question", "response", "CBT")
+
+
+def numbers(store):
+    return [turn.turn for turn in store.turns()]
+
+
+def test_load_earlier_pages_back_from_recent(store):
+    add(store, 12)
+    assert numbers(store) == [8, 9, 10, 11, 12]
+    assert store.load_earlier() == 3
+    assert numbers(store) == list(range(5, 13))
+    assert store.load_earlier() == 3
+    assert store.load_earlier() == 1
+    assert not store.has_earlier
+    assert numbers(store) == list(range(1, 13))
+
+
+def test_new_turns_after_paging_leave_no_gap(store):
+    add(store, 12)
+    store.load_earlier()
+    add(store, 7)
+    assert numbers(store) == list(range(5, 20))
+    store.load_earlier()
+    assert numbers(store) == list(range(2, 20))
+
+
+def test_without_paging_the_window_stays_bounded(store):
+    add(store, 9)
+    assert numbers(store) == [5, 6, 7, 8, 9]
+    assert store.has_earlier
@@ -0,0 +1,93 @@
+"""SheetsClient against the in-memory FakeWorkbook."""
+import pytest
+
+from therabot_sheets_client import FakeWorkbook, SheetsClient
+from therabot_sheets_sync import GspreadTransport
+
+
+class CountingWorkbook(FakeWorkbook):
+    def __init__(self, titles=()):
+        super().__init__(titles)
+        self.lookups = []
+        self.fail_metadata = None
+
+    def worksheet(self, name):
+        self.lookups.append(name)
+        return super().worksheet(name)
+
+    def fetch_sheet_metadata(self):
+        if self.fail_metadata:
+            raise self.fail_metadata
+        return super().fetch_sheet_metadata()
+
+
+class FailingWorksheet:
+    def append_rows(self, rows, **kwargs):
+        raise PermissionError("401: invalid credentials")
+
+
+@pytest.fixture
+def opened():
+    """An opener handing out a fresh CountingWorkbook per connect, and the list of them."""
+    books = []
+
+    def opener():
+        books.append(CountingWorkbook(["Mood Logs"]))
+        return books[-1]
+    return opener, books
+
+
+def test_no_connection_until_first_worksheet(opened):
+    opener, books = opened
+    client = SheetsClient(opener=opener)
+    assert not client.connected
+    assert client.health() == {"ok": None, "connected": False, "latency_ms": None, "error": None}
+    assert books == []
+
+    client.worksheet("Mood Logs")
+    assert client.connected
+    assert client.connects == 1
+    assert len(books) == 1
+
+
+def test_worksheet_handles_are_cached(opened):
+    opener, books = opened
+    client = SheetsClient(opener=opener)
+    first = client.worksheet("Mood Logs")
+    assert client.worksheet("Mood Logs") is first
+    client.worksheet("Journal History")
+    client.worksheet("Journal History")
+    assert books[0].lookups == ["Mood Logs", "Journal History"]
+    assert client.connects == 1
+
+
+def test_health_resets_after_auth_error(opened):
+    opener, books = opened
+    client = SheetsClient(opener=opener)
+    client.worksheet("Mood Logs")
+    books[0].fail_metadata = PermissionError("401: invalid credentials")
+
+    status = client.health()
+    assert status["ok"] is False
+    assert "invalid credentials" in status["error"]
+    assert not client.connected
+
+    client.worksheet("Mood Logs")
+    assert client.connects == 2
+    assert books[1].lookups == ["Mood Logs"]
+    assert client.health()["ok"] is True
+
+
+def test_failed_append_drops_stale_handles():
+    books = [CountingWorkbook(), CountingWorkbook()]
+    books[0].worksheets["Mood Logs"] = FailingWorksheet()
+    client = SheetsClient(opener=lambda: books[client.connects])
+    transport = GspreadTransport(client.worksheet, client.reset)
+
+    with pytest.raises(PermissionError):
+        transport.append_rows("Mood Logs", [["2024-01-01 09:00", 7, ""]])
+    assert not client.connected
+
+    transport.append_rows("Mood Logs", [["2024-01-01 09:00", 7, ""]])
+    assert client.connects == 2
+    assert books[1].worksheets["Mood Logs"].rows == [["2024-01-01 09:00", 7, ""]]
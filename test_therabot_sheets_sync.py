@@ -0,0 +1,118 @@
+"""SheetsOutbox and SheetsSyncWorker against the in-memory FakeSpreadsheet."""
+import time
+
+import pytest
+
+from therabot_sheets_sync import FakeSpreadsheet, SheetsOutbox, SheetsSyncWorker
+
+BACKOFF = 0.05
+
+
+@pytest.fixture
+def outbox_path(tmp_path):
+    return str(tmp_path / "outbox.db")
+
+
+def rows(n, start=0):
+    return [[f"2024-01-01 09:{i % 60:02d}", i % 11, f"note {i}"] for i in range(start, start + n)]
+
+
+def test_batches_in_queue_order(outbox_path):
+    sheet = FakeSpreadsheet()
+    worker = SheetsSyncWorker(SheetsOutbox(outbox_path), sheet, batch_size=4)
+    worker.enqueue_many("Mood Logs", rows(6))
+    worker.enqueue("Journal History", ["2024-01-01 09:00", "slept well"])
+
+    assert worker.drain_once() == 5
+    assert worker.drain_once() == 2
+    assert worker.drain_once() == 0
+    assert sheet.sheets["Mood Logs"] == rows(6)
+    assert sheet.sheets["Journal History"] == [["2024-01-01 09:00", "slept well"]]
+    assert sheet.calls == 3
+    assert worker.outbox.pending() == 0
+
+
+def test_failed_batch_is_kept_and_backs_off(outbox_path):
+    sheet = FakeSpreadsheet(failure_rate=1.0)
+    outbox = SheetsOutbox(outbox_path)
+    worker = SheetsSyncWorker(outbox, sheet, backoff_base=BACKOFF, backoff_max=BACKOFF * 4)
+    worker.enqueue_many("Mood Logs", rows(3))
+
+    assert worker.drain_once() == 0
+    assert outbox.pending() == 3
+    assert worker.failures == 1
+    assert "injected failure" in worker.last_error
+    first_delay = worker._retry_at["Mood Logs"] - time.monotonic()
+    assert 0 < first_delay <= BACKOFF
+
+    # Still backing off: the transport isn't called again
+    assert worker.drain_once() == 0
+    assert sheet.calls == 1
+
+    time.sleep(BACKOFF)
+    assert worker.drain_once() == 0
+    assert sheet.calls == 2
+    second_delay = worker._retry_at["Mood Logs"] - time.monotonic()
+    assert BACKOFF / 2 < second_delay <= BACKOFF * 2
+    attempts = {row[0] for row in outbox._conn.execute("SELECT attempts FROM outbox")}
+    assert attempts == {2}
+
+    sheet.failure_rate = 0.0
+    time.sleep(BACKOFF * 2)
+    assert worker.drain_once() == 3
+    assert sheet.sheets["Mood Logs"] == rows(3)
+    assert "Mood Logs" not in worker._retry_at
+    assert outbox.pending() == 0
+
+
+def test_backoff_is_capped(outbox_path):
+    worker = SheetsSyncWorker(SheetsOutbox(outbox_path), FakeSpreadsheet(failure_rate=1.0),
+                              backoff_base=BACKOFF, backoff_max=BACKOFF * 2)
+    worker.enqueue("Mood Logs", rows(1)[0])
+    for _ in range(5):
+        worker._retry_at.clear()
+        worker.drain_once()
+        assert worker._retry_at["Mood Logs"] - time.monotonic() <= BACKOFF * 2
+    assert worker._failures_in_row["Mood Logs"] == 5
+
+
+def test_rows_survive_a_restart(outbox_path):
+    down = FakeSpreadsheet(failure_rate=1.0)
+    worker = SheetsSyncWorker(SheetsOutbox(outbox_path), down, batch_size=10).start()
+    worker.enqueue_many("Mood Logs", rows(25))
+    worker.enqueue("Journal History", ["2024-01-01 09:00", "slept well"])
+    assert not worker.flush(timeout=0.2)
+    worker.stop()
+    worker.outbox.close()
+
+    up = FakeSpreadsheet()
+    worker = SheetsSyncWorker(SheetsOutbox(outbox_path), up, batch_size=10).start()
+    assert worker.outbox.pending() == 26
+    worker.enqueue_many("Mood Logs", rows(5, start=25))
+    assert worker.flush(timeout=5)
+    worker.stop()
+    worker.outbox.close()
+    assert up.sheets["Mood Logs"] == rows(30)
+    assert up.sheets["Journal History"] == [["2024-01-01 09:00", "slept well"]]
+    assert down.sheets == {}
+
+
+def test_rejected_batch_moves_to_dead_letters(outbox_path):
+    sheet = FakeSpreadsheet(missing={"Old Sheet"})
+    outbox = SheetsOutbox(outbox_path)
+    worker = SheetsSyncWorker(outbox, sheet, batch_size=2)
+    worker.enqueue_many("Old Sheet", rows(3))
+    worker.enqueue_many("Mood Logs", rows(2))
+
+    worker.drain_once()
+    worker.drain_once()
+    assert outbox.pending() == 0
+    assert sheet.sheets["Mood Logs"] == rows(2)
+    assert "Old Sheet" not in worker._retry_at
+    assert [row for _, row, _ in reversed(outbox.dead_letters())] == rows(3)
+
+    status = worker.status()
+    assert status["dead_letters"] == 3
+    assert status["pending"] == 0
+    assert "rows rejected" in status["last_error"]
+    assert worker.rejected_rows == 3
@@ -10,82 +10,46 @@ st.set_page_config(
 st.write("✅ App loaded successfully!")
 st.write("🚀 App started!")  # TEMP DEBUG
 # In therabot_app.py (above your main code)
-import os
 from datetime import datetime, timedelta
+import io
 import random
 import pandas as pd
-import matplotlib.pyplot as plt
-import base64
 import sqlite3
-import hashlib
-from PIL import Image
+from therabot_assessments import INSTRUMENTS, pack_responses
+from therabot_assets import load_logo
+from therabot_auth import LoginThrottled, authenticate, hash_password, verify_password
+from therabot_cache import dashboard_cache
+from therabot_charts import chart_service
+from therabot_chat import ConversationStore
+from therabot_db import db_cursor, bootstrap, is_ready, day_start_ts, day_end_ts, format_ts, day_from_key, now_ts
+from therabot_export import EXPORT_TABLES, ExportFormatError, export_csv, export_jsonl, import_jsonl, as_bytes
+from therabot_features import (combined_mask, combined_sentiment, has_label, label_names, recent_features,
+                               stored_features)
+from therabot_keywords import KEYWORD_SETS, keyword_matcher
+from therabot_recommend import Recommender
+from therabot_repositories import Repositories, make_backend
+from therabot_responses import response_catalog
+from therabot_search import search_journal
+from therabot_selfcare import self_care_catalog
+from therabot_sentiment import sentiment_engine
+from therabot_similarity import related_entries
+from therabot_themes import top_terms
 
 # Initialize database
-conn = sqlite3.connect('therapy_app.db', check_same_thread=False)
-c = conn.cursor()
-
-# Create tables if they don't exist
-c.execute('''CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE,
-    password TEXT,
-    email TEXT,
-    user_type TEXT,
-    trauma_history INTEGER)''')
-
-c.execute('''CREATE TABLE IF NOT EXISTS ai_therapist_questions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    date TEXT,
-    question TEXT,
-    response TEXT,
-    therapy_mode TEXT
-)''') 
-
-c.execute('''CREATE TABLE IF NOT EXISTS trauma_assessments
-             (id INTEGER PRIMARY KEY AUTOINCREMENT,
-              user_id INTEGER,
-              date TEXT,
-              pcl5_score INTEGER,
-              ptsdi_score INTEGER)''')
-
-c.execute('''CREATE TABLE IF NOT EXISTS mood_entries
-             (id INTEGER PRIMARY KEY AUTOINCREMENT,
-              user_id INTEGER,
-              date TEXT,
-              mood INTEGER,
-              note TEXT)''')
-
-c.execute('''CREATE TABLE IF NOT EXISTS journal_entries
-             (id INTEGER PRIMARY KEY AUTOINCREMENT,
-              user_id INTEGER,
-              date TEXT,
-              entry TEXT,
-              sentiment REAL)''')
-
-c.execute('''CREATE TABLE IF NOT EXISTS self_care_activities
-             (id INTEGER PRIMARY KEY AUTOINCREMENT,
-              user_id INTEGER,
-              date TEXT,
-              activity TEXT,
-              category TEXT,
-              duration INTEGER)''')
-
-c.execute('''CREATE TABLE IF NOT EXISTS sleep_data
-             (id INTEGER PRIMARY KEY AUTOINCREMENT,
-              user_id INTEGER,
-              date TEXT,
-              hours REAL,
-              quality TEXT)''')
-
-c.execute('''CREATE TABLE IF NOT EXISTS ai_therapist_questions
-             (id INTEGER PRIMARY KEY AUTOINCREMENT,
-              user_id INTEGER,
-              date TEXT,
-              question TEXT,
-              response TEXT)''')
-
-conn.commit() # Finalize table creation
+# Tables and indexes are created by the migrations in therabot_db; deploys run
+# `python therabot_db.py migrate`. Streamlit reruns this script on every
+# interaction, so the check is cached and happens once per worker process.
+@st.cache_resource(show_spinner=False)
+def init_database():
+    info = bootstrap()
+    print(f"[INITIAL LOAD] Database ready at schema v{info['schema_version']} "
+          f"in {info['seconds'] * 1000:.1f} ms (applied {info['applied'] or 'none'})")
+    return info
+
+init_database()
+if not is_ready():
+    st.error("The database is being upgraded. Please refresh in a moment.")
+    st.stop()
 
 # Initialize session state
 if 'current_page' not in st.session_state:
@@ -95,83 +59,54 @@ if 'user_id' not in st.session_state:
 if 'username' not in st.session_state:
     st.session_state.username = 'Guest'
 
-# helper: Get image base64
-def get_image_base64(path):
-    if os.path.exists(path):
-        try:
-            with open(path, "rb") as img_file:
-                return base64.b64encode(img_file.read()).decode('utf-8')
-        except Exception as e:
-            print(f"Error loading image from {path}: {e}")
-            return None
-    else:
-        print(f"File does not exist at: {path}")
-        parent_dir = os.path.dirname(path)
-        if os.path.exists(parent_dir):
-            print(f"Parent directory exists. Contents: {os.listdir(parent_dir)}")
-        else:
-            print(f"Parent directory does not exist: {parent_dir}")
+# Logo variants are resized and published to static/ once per worker process
+@st.cache_resource(show_spinner=False)
+def init_logo():
+    try:
+        logo = load_logo(static_serving=st.get_option("server.enableStaticServing"))
+    except Exception as e:
+        print(f"Error loading logo: {e}")
         return None
+    print(f"[INITIAL LOAD] Logo exists? {logo is not None}")
+    return logo
 
-# Use the specific path to the image
-import os
-from PIL import Image
+logo = init_logo()
 
-image_path = os.path.join(os.path.dirname(__file__), "In2Grative_Therapy_Logo_Design.png")
+# Mood, journal, self-care and assessment data go through the repositories;
+# THERABOT_STORAGE picks the backend (sqlite or sheets-mirror). A
+# user's cached dashboard is dropped once their write is committed.
+@st.cache_resource(show_spinner=False)
+def init_repositories():
+    return Repositories(make_backend(), on_write=dashboard_cache.invalidate)
 
-try:
-    logo_base64 = get_image_base64(image_path)
-    print(f"[INITIAL LOAD] Logo exists? {logo_base64 is not None}")
-except Exception as e:
-    print(f"Error loading logo: {e}")
-    logo_base64 = None
-    # Optionally provide a default image or continue without logo
+repos = init_repositories()
 
 # Authentication helpers
 def make_hashes(password):
-    return hashlib.sha256(str.encode(password)).hexdigest()
+    return hash_password(password)
 
 def check_hashes(password, hashed_text):
-    return make_hashes(password) == hashed_text
+    return verify_password(password, hashed_text)[0]
 
 def create_user(username, password, email, user_type, trauma_history):
-    global c
-    c.execute('INSERT INTO users (username, password, email, user_type, trauma_history) VALUES (?,?,?,?,?)',
-              (username, make_hashes(password), email, user_type, trauma_history))
-    conn.commit()
-    return c.lastrowid
+    with db_cursor() as c:
+        c.execute('INSERT INTO users (username, password, email, user_type, trauma_history) VALUES (?,?,?,?,?)',
+                  (username, make_hashes(password), email, user_type, trauma_history))
+        return c.lastrowid
 
 def login_user(username, password):
-    global c
-    c.execute('SELECT * FROM users WHERE username = ?', (username,))
-    data = c.fetchone()
-    if data and check_hashes(password, data[2]):
-        return data[0]  # Return user ID
-    return None
+    # Rate-limited; legacy SHA-256 hashes are upgraded on a successful login
+    return authenticate(username, password, ip=getattr(st.context, "ip_address", None))
 
 # AI Memory and Analysis Functions
 def analyze_journal_sentiment(text):
-    positive_words = ['happy', 'good', 'great', 'joy', 'excited', 'calm', 'peaceful', 'proud', 'grateful']
-    negative_words = ['sad', 'bad', 'angry', 'anxious', 'stress', 'depressed', 'trauma', 'triggered', 'fear']
-    score = 0
-    text_lower = text.lower()
-    for word in positive_words:
-        if word in text_lower:
-            score += 1
-    for word in negative_words:
-        if word in text_lower:
-            score -= 1
-    word_count = max(1, len(text.split()))
-    return score / word_count
+    return sentiment_engine.score(text)
 
 def generate_ai_response(user_id):
     user_type, trauma_history = get_user_type(user_id)
-    global c
-    c.execute('SELECT entry FROM journal_entries WHERE user_id = ? ORDER BY date DESC LIMIT 3', (user_id,))
-    recent_entries = c.fetchall()
-    c.execute('SELECT mood FROM mood_entries WHERE user_id = ? ORDER BY date DESC LIMIT 7', (user_id,))
-    mood_data = c.fetchall()
-    avg_mood = sum([m[0] for m in mood_data])/len(mood_data) if mood_data else 5
+    recent_entries = recent_features(user_id, 'journal', 3)
+    mood_data = repos.moods.recent(user_id, 7)
+    avg_mood = sum([m.mood for m in mood_data])/len(mood_data) if mood_data else 5
     
     # Customize response based on user type
     if user_type == 'veteran':
@@ -182,7 +117,7 @@ def generate_ai_response(user_id):
         base_response = ""
     
     if recent_entries:
-        sentiment = analyze_journal_sentiment(" ".join([e[0] for e in recent_entries]))
+        sentiment = combined_sentiment(recent_entries)
         if sentiment > 0.3:
             return base_response + "I'm noticing some positive themes in your recent reflections. Let's build on this momentum!"
         elif sentiment < -0.3:
@@ -194,8 +129,7 @@ def generate_ai_response(user_id):
     return base_response + "How are you feeling today compared to yesterday?"
 
 def generate_dynamic_journal_prompt(user_id):
-    c.execute('SELECT entry FROM journal_entries WHERE user_id = ? ORDER BY date DESC LIMIT 5', (user_id,))
-    recent_entries = [e[0] for e in c.fetchall()]
+    recent_entries = recent_features(user_id, 'journal', 5)
     
     if not recent_entries:
         return random.choice([
@@ -205,19 +139,8 @@ def generate_dynamic_journal_prompt(user_id):
         ])
     
     # Analyze for recurring themes
-    all_text = " ".join(recent_entries).lower()
-    themes = {
-        'relationships': ['friend', 'partner', 'family', 'relationship', 'love', 'argue'],
-        'work': ['work', 'job', 'career', 'boss', 'colleague'],
-        'trauma': ['trauma', 'trigger', 'memory', 'flashback', 'ptsd'],
-        'anxiety': ['anxious', 'worry', 'fear', 'panic', 'nervous'],
-        'achievement': ['accomplish', 'proud', 'success', 'achievement', 'goal']
-    }
-    
-    detected_themes = []
-    for theme, keywords in themes.items():
-        if any(keyword in all_text for keyword in keywords):
-            detected_themes.append(theme)
+    found = label_names(combined_mask(recent_entries), 'theme')
+    detected_themes = [theme for theme in KEYWORD_SETS['theme'] if theme in found]
     
     # Generate personalized prompt
     if not detected_themes:
@@ -261,162 +184,102 @@ def generate_dynamic_journal_prompt(user_id):
     
     return "What would you like to reflect on today?"
 
-# Enhanced AI Therapist Responses with Different Modalities
-def answer_ai_therapist_question(question, user_id=None, therapy_mode='CBT'):
-    """Generate a response to a mental health question with appropriate disclaimers"""
-    user_type, trauma_history = get_user_type(user_id) if user_id else ('general', 0)
-    
-    # Define common topics and responses for different therapy modes
-    therapy_responses = {
-        'CBT': {
-            "anxiety": "Let's examine the thoughts behind your anxiety. What evidence supports or contradicts your anxious thoughts?",
-            "depression": "Negative thought patterns often fuel depression. Can you identify any cognitive distortions in your thinking?",
-            "stress": "Stress often comes from our appraisal of situations. How might you reframe this stressful situation?",
-            "relationships": "Our thoughts about relationships affect our feelings. What automatic thoughts come up in your relationships?"
-        },
-        'ACT': {
-            "anxiety": "Rather than fighting anxiety, can you make space for it while still taking valued actions?",
-            "depression": "What values are important to you, and how might you take small steps toward them despite depressive feelings?",
-            "stress": "Stress is inevitable, but suffering is optional. What would acceptance of this situation look like?",
-            "relationships": "What core values do you want to guide your relationships?"
-        },
-        'DBT': {
-            "anxiety": "Let's try a distress tolerance skill. Would paced breathing or self-soothing with senses help right now?",
-            "depression": "Emotion regulation begins with naming emotions. What specific emotions are you feeling?",
-            "stress": "In crisis, remember STOP: Stop, Take a step back, Observe, Proceed mindfully.",
-            "relationships": "DEAR MAN skills can help: Describe, Express, Assert, Reinforce, stay Mindful, Appear confident, Negotiate."
-        },
-        'IFS': {
-            "anxiety": "Which part of you feels anxious? Can you describe it with curiosity rather than judgment?",
-            "depression": "A depressed part may be trying to protect you. What might it be protecting you from?",
-            "stress": "When stressed, which parts of you are activated? Is there a calm Self that can witness them?",
-            "relationships": "Which parts of you get activated in relationships? How might they interact with others' parts?"
-        },
-        'CPT': {
-            "trauma": "Let's examine stuck points in your trauma narrative. What thoughts feel most distressing?",
-            "anxiety": "Trauma can create unhelpful beliefs. What new understanding might challenge these beliefs?",
-            "depression": "How might trauma-related beliefs be affecting your current mood?",
-            "relationships": "How might trauma experiences be influencing your relationship patterns?"
-        },
-        'Somatic': {
-            "trauma": "Notice any body sensations as we discuss this. Where do you feel it in your body?",
-            "anxiety": "Let's ground in the body. Can you feel your feet on the floor and your breath moving?",
-            "depression": "Depression often shows in the body. What physical sensations accompany your low mood?",
-            "relationships": "How does your body respond when thinking about important relationships?"
-        }
-    }
-    
-    # Specialized responses for veterans and first responders
-    specialized_responses = {
-        'veteran': {
-            "combat": "Combat experiences can have lasting impacts. How are these memories affecting you now?",
-            "transition": "Transitioning to civilian life brings challenges. What aspects feel most difficult?",
-            "moral_injury": "Moral injury involves deep wounds. What thoughts keep coming up about these experiences?"
-        },
-        'first_responder': {
-            "critical_incident": "Critical incidents can accumulate. How has this recent event affected you?",
-            "shift_work": "Irregular schedules disrupt wellbeing. How are you managing sleep and recovery?",
-            "compassion_fatigue": "Caring constantly can deplete reserves. What replenishes your sense of purpose?"
-        }
+# Dashboard aggregates
+def load_dashboard_stats(user_id):
+    """Run every query the progress dashboard and charts need in one pass"""
+    with db_cursor() as c:
+        # Series and totals come from the daily rollups, one row per active day
+        c.execute('SELECT day, mood_sum * 1.0 / mood_count FROM daily_mood WHERE user_id = ? ORDER BY day', (user_id,))
+        mood_series = c.fetchall()
+        c.execute('SELECT SUM(mood_sum) * 1.0 / SUM(mood_count), MIN(mood_min), MAX(mood_max) FROM daily_mood WHERE user_id = ?',
+                  (user_id,))
+        mood_stats = c.fetchone()
+        c.execute('SELECT day, sentiment_sum / entry_count FROM daily_sentiment WHERE user_id = ? ORDER BY day',
+                  (user_id,))
+        sentiment_series = c.fetchall()
+        # Precomputed features, so the raw entry text is never read here
+        c.execute('''SELECT date, sentiment, token_count FROM text_features
+                     WHERE user_id = ? AND source = 'journal' ORDER BY date DESC LIMIT 5''',
+                  (user_id,))
+        recent_journal = c.fetchall()
+        c.execute('''SELECT category, SUM(activity_count), SUM(minutes) 
+                     FROM daily_self_care 
+                     WHERE user_id = ?
+                     GROUP BY category''',
+                  (user_id,))
+        self_care_by_category = c.fetchall()
+        c.execute('''SELECT date, activity, duration 
+                     FROM self_care_activities 
+                     WHERE user_id = ? 
+                     ORDER BY date DESC LIMIT 5''',
+                  (user_id,))
+        recent_self_care = c.fetchall()
+    return {
+        'mood_series': mood_series,
+        'mood_stats': mood_stats,
+        'sentiment_series': sentiment_series,
+        'recent_journal': recent_journal,
+        'self_care_by_category': self_care_by_category,
+        'recent_self_care': recent_self_care,
     }
-    
-    # Check for crisis keywords
-    crisis_keywords = ["suicide", "kill myself", "end my life", "self-harm", "hurting myself"]
-    if any(keyword in question.lower() for keyword in crisis_keywords):
-        return """
-        **Important:** I'm deeply concerned about what you're sharing. 
-        You're not alone, and there are people who want to help:
-        
-        - Veterans/Military: Press 1 after dialing 988 (U.S.)
-        - First Responders: 1-800-267-5463 (Canada) or 1-888-731-3473 (U.S.)
-        - General Crisis: Call/text 988 or chat at 988lifeline.org
-        
-        Please reach out to a trusted person or professional right now. 
-        Your life matters.
-        """
-    
-    # Check for specialized topics first
-    if user_type in ['veteran', 'first_responder']:
-        for topic, response in specialized_responses[user_type].items():
-            if topic in question.lower():
-                return f"""
-                **Regarding your experience:** {response}
-                
-                *{therapy_mode} perspective:* {therapy_responses[therapy_mode].get('trauma', 'This seems important to explore further.')}
-                
-                *Remember: I'm an AI assistant, not a licensed therapist. 
-                For professional help, consider reaching out to a mental health professional.*
-                """
-    
-    # Check for trauma-related topics
-    trauma_keywords = ["trauma", "ptsd", "flashback", "trigger", "memory"]
-    if trauma_history or any(keyword in question.lower() for keyword in trauma_keywords):
-        return f"""
-        **Trauma-informed response:** {therapy_responses[therapy_mode].get('trauma', 'Trauma affects everyone differently. Safety and pacing are important in healing.')}
-        
-        *Therapeutic approach ({therapy_mode}):* {therapy_responses[therapy_mode].get('trauma', 'Would you like to explore this memory with a grounding exercise?')}
-        
-        *Remember: Trauma healing often benefits from professional support. 
-        Consider reaching out to a trauma specialist.*
-        """
-    
-    # Check for common topics in current therapy mode
-    for topic, response in therapy_responses[therapy_mode].items():
-        if topic in question.lower():
-            return f"""
-            **{therapy_mode} perspective on {topic}:** {response}
-            
-            *Remember: I'm an AI assistant, not a licensed therapist. 
-            For professional help, consider reaching out to a mental health professional.*
-            """
-    
-    # Default response with current therapy mode
-    return f"""
-    **{therapy_mode} perspective:** Thank you for sharing. That sounds important to explore. 
-    From a {therapy_mode} perspective, we might examine {random.choice(['your thoughts about this', 'how you experience this emotionally', 'what values are involved', 'how your body responds'])}.
-    
-    Some approaches that might help:
-    - Journaling about this experience
-    - Practicing a grounding exercise
-    - Exploring alternative perspectives
-    
-    Would you like me to suggest some {therapy_mode} techniques that might be relevant?
-    """
+
+def get_dashboard_stats(user_id):
+    return dashboard_cache.get(user_id, lambda: load_dashboard_stats(user_id))
 
 # Data Visualization Functions
 def plot_mood_trend(user_id):
-    c.execute('SELECT date, mood FROM mood_entries WHERE user_id = ? ORDER BY date', (user_id,))
-    data = c.fetchall()
+    stats = get_dashboard_stats(user_id)
+    data = stats['mood_series']
     if len(data) < 2:
         return None
     
-    df = pd.DataFrame(data, columns=['Date', 'Mood'])
-    df['Date'] = pd.to_datetime(df['Date'])
-    df.set_index('Date', inplace=True)
+    dates = [day_from_key(day) for day, _ in data]
+    moods = [mood for _, mood in data]
     
-    fig, ax = plt.subplots(figsize=(10, 4))
-    df['Mood'].plot(ax=ax, marker='o', linestyle='-')
-    ax.set_ylim(0, 10)
-    ax.set_title('Your Mood Over Time')
-    ax.set_ylabel('Mood (0-10)')
-    ax.grid(True)
+    def draw(ax):
+        ax.plot(dates, moods, marker='o', linestyle='-')
+        ax.set_ylim(0, 10)
+        ax.set_title('Your Mood Over Time')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Mood (0-10)')
+        ax.grid(True)
     
-    return fig
+    return chart_service.render(user_id, 'mood_trend', stats['version'], draw, figsize=(10, 4))
+
+def plot_sentiment_trend(user_id):
+    stats = get_dashboard_stats(user_id)
+    data = stats['sentiment_series']
+    if not data:
+        return None
+    
+    dates = [day_from_key(day) for day, _ in data]
+    sentiments = [sentiment for _, sentiment in data]
+    
+    def draw(ax):
+        ax.plot(dates, sentiments, marker='o', label='Sentiment')
+        ax.set_title('Journal Sentiment Trend')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Sentiment (-1 to 1)')
+        ax.legend()
+        ax.grid(True)
+    
+    return chart_service.render(user_id, 'sentiment_trend', stats['version'], draw, figsize=(10, 4))
 
 def plot_self_care_categories(user_id):
-    c.execute('SELECT category, COUNT(*) FROM self_care_activities WHERE user_id = ? GROUP BY category', (user_id,))
-    data = c.fetchall()
+    stats = get_dashboard_stats(user_id)
+    data = [(category, count) for category, count, _ in stats['self_care_by_category']]
     if not data:
         return None
     
-    df = pd.DataFrame(data, columns=['Category', 'Count'])
+    categories = [category for category, _ in data]
+    counts = [count for _, count in data]
     
-    fig, ax = plt.subplots(figsize=(8, 8))
-    df.set_index('Category')['Count'].plot.pie(ax=ax, autopct='%1.1f%%')
-    ax.set_title('Self-Care Activity Distribution')
-    ax.set_ylabel('')
+    def draw(ax):
+        ax.pie(counts, labels=categories, autopct='%1.1f%%')
+        ax.set_title('Self-Care Activity Distribution')
+        ax.set_ylabel('')
     
-    return fig
+    return chart_service.render(user_id, 'self_care_categories', stats['version'], draw, figsize=(8, 8))
 
 # Trauma Assessment Tools
 def trauma_assessment():
@@ -429,137 +292,119 @@ def trauma_assessment():
     tab1, tab2 = st.tabs(["PCL-5 (PTSD Checklist)", "PTSD Symptom Scale"])
     
     with tab1:
-        st.subheader("PCL-5: PTSD Checklist for DSM-5")
-        st.write("""
-        In the past month, how much were you bothered by:
-        (1 = Not at all, 2 = A little bit, 3 = Moderately, 4 = Quite a bit, 5 = Extremely)
-        """)
-        
-        pcl5_questions = [
-            "Repeated, disturbing memories of the stressful experience?",
-            "Repeated, disturbing dreams of the stressful experience?",
-            "Suddenly feeling or acting as if the stressful experience were happening again?",
-            "Feeling very upset when something reminded you of the stressful experience?",
-            "Having strong physical reactions when something reminded you of the stressful experience?",
-            "Avoiding memories, thoughts, or feelings related to the stressful experience?",
-            "Avoiding external reminders of the stressful experience?",
-            "Trouble remembering important parts of the stressful experience?",
-            "Having strong negative beliefs about yourself, others, or the world?",
-            "Blaming yourself or someone else for the stressful experience?",
-            "Having strong negative feelings like fear, horror, anger, guilt, or shame?",
-            "Loss of interest in activities you used to enjoy?",
-            "Feeling distant or cut off from other people?",
-            "Trouble experiencing positive feelings?",
-            "Irritable behavior, angry outbursts, or acting aggressively?",
-            "Taking too many risks or doing things that could cause you harm?",
-            "Being 'superalert' or watchful or on guard?",
-            "Feeling jumpy or easily startled?",
-            "Having difficulty concentrating?",
-            "Trouble falling or staying asleep?"
-        ]
-        
-        scores = []
-        for i, question in enumerate(pcl5_questions):
-            score = st.select_slider(
-                question,
-                options=[1, 2, 3, 4, 5],
-                key=f"pcl5_{i}"
-            )
-            scores.append(score)
-        
-        if st.button("Calculate PCL-5 Score"):
-            total = sum(scores)
-            st.write(f"**Your score:** {total}/80")
-            
-            if total >= 33:
-                st.error("""
-                **Score suggests significant PTSD symptoms.**
-                Consider reaching out to a trauma specialist for evaluation.
-                Resources:
-                - VA PTSD Program (for veterans)
-                - Psychology Today's trauma specialist finder
-                - ISTSS.org therapist directory
-                """)
-            elif total >= 20:
-                st.warning("""
-                **Score suggests moderate PTSD symptoms.**
-                Monitoring symptoms and considering professional support may be helpful.
-                """)
-            else:
-                st.success("""
-                **Score suggests minimal PTSD symptoms.**
-                Continue healthy habits that support your wellbeing.
-                """)
-            
-            # Store assessment results
-            if 'user_id' in st.session_state:
-                today = datetime.now().strftime("%Y-%m-%d")
-                c.execute('INSERT INTO trauma_assessments (user_id, date, pcl5_score) VALUES (?,?,?)',
-                          (st.session_state.user_id, today, total))
-                conn.commit()
+        assessment_form(INSTRUMENTS['PCL-5'])
     
     with tab2:
-        st.subheader("PTSD Symptom Scale (PSS-I)")
-        st.write("""
-        In the past 2 weeks, how often have you experienced:
-        (0 = Not at all, 1 = Once per week, 2 = 2-4 times per week, 3 = 5+ times per week)
-        """)
-        
-        ptsd_questions = [
-            "Intrusive memories of the event",
-            "Distressing dreams about the event",
-            "Flashbacks or feeling like it's happening again",
-            "Upset when reminded of the event",
-            "Physical reactions when reminded (e.g., sweating, pounding heart)",
-            "Avoiding thoughts or feelings about the event",
-            "Avoiding activities or situations that remind you",
-            "Trouble remembering important parts of the event",
-            "Loss of interest in activities",
-            "Feeling detached from others",
-            "Difficulty experiencing positive emotions",
-            "Irritability or anger outbursts",
-            "Difficulty concentrating",
-            "Trouble falling or staying asleep",
-            "Being overly alert or watchful",
-            "Easily startled"
-        ]
-        
-        scores = []
-        for i, question in enumerate(ptsd_questions):
-            score = st.radio(
-                question,
-                options=[0, 1, 2, 3],
-                horizontal=True,
-                key=f"ptsd_{i}"
-            )
-            scores.append(score)
+        assessment_form(INSTRUMENTS['PSS-I'])
+
+def assessment_form(instrument):
+    """Ask a registered instrument's items, then score and store the submission"""
+    scale = ", ".join(f"{value} = {label}" for value, label in instrument.option_labels.items())
+    st.subheader(instrument.name)
+    st.write(f"{instrument.instructions}\n({scale})")
+    
+    responses = []
+    for i, question in enumerate(instrument.items):
+        key = f"{instrument.key}_{i}"
+        if instrument.widget == 'slider':
+            responses.append(st.select_slider(question, options=instrument.options, key=key))
+        else:
+            responses.append(st.radio(question, options=instrument.options, horizontal=True, key=key))
+    
+    if st.button(f"Calculate {instrument.key} Score"):
+        result = instrument.score(responses)
+        total = int(result.totals)
+        band = instrument.bands[result.bands]
+        st.write(f"**Your score:** {total}/{instrument.max_score}")
+        getattr(st, band.level)(band.message)
+        if instrument.alerts(responses):
+            st.error("""
+            **You mentioned thoughts of being better off dead or of hurting yourself.**
+            Please reach out now: call or text 988 (Veterans press 1), or text HOME to 741741.
+            The Crisis Support page lists more resources.
+            """)
         
-        if st.button("Calculate PSS Score"):
-            total = sum(scores)
-            st.write(f"**Your score:** {total}/48")
-            
-            if total >= 20:
-                st.error("""
-                **Score suggests significant PTSD symptoms.**
-                Consider reaching out to a trauma specialist for evaluation.
-                """)
-            elif total >= 11:
-                st.warning("""
-                **Score suggests moderate PTSD symptoms.**
-                Monitoring symptoms and considering professional support may be helpful.
-                """)
+        # Store assessment results
+        if 'user_id' in st.session_state:
+            ts = now_ts()
+            repos.assessment_responses.add(st.session_state.user_id, instrument.key,
+                                           pack_responses(responses), total, result.bands, ts=ts)
+            if instrument.column:
+                repos.assessments.add(st.session_state.user_id, ts=ts, **{instrument.column: total})
+
+def journal_search():
+    st.header("🔎 Search Your Journal")
+    
+    text = st.text_input("Search for words or \"an exact phrase\":", key="journal_search_text")
+    col1, col2 = st.columns(2)
+    with col1:
+        dates = st.date_input("Written between (optional)", value=(), key="journal_search_dates")
+    with col2:
+        order = st.selectbox("Sort by", ["relevance", "newest", "oldest"], format_func=str.title,
+                             key="journal_search_order")
+    
+    if not text.strip():
+        st.info("Search finds entries containing all of your words, including other forms like 'sleeping' for 'sleep'.")
+        return
+    
+    start = day_start_ts(dates[0]) if len(dates) > 0 else None
+    end = day_end_ts(dates[1]) if len(dates) > 1 else None
+    
+    # Keys of the pages visited so far; a new search starts over
+    search = (text, start, end, order)
+    if st.session_state.get('journal_search') != search:
+        st.session_state.journal_search = search
+        st.session_state.journal_search_pages = [None]
+    pages = st.session_state.journal_search_pages
+    
+    results = search_journal(st.session_state.user_id, text, start, end, order, after=pages[-1])
+    if not results.hits:
+        st.write("No journal entries match your search.")
+        return
+    
+    for hit in results.hits:
+        st.markdown(f"**{format_ts(hit.date, '%B %d, %Y %H:%M')}**  \n{hit.snippet}")
+        st.markdown("---")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if len(pages) > 1:
+            st.button("← Previous", key="journal_search_previous", on_click=pages.pop)
+    with col2:
+        if results.next is not None:
+            st.button("Next →", key="journal_search_next", on_click=pages.append, args=(results.next,))
+
+def my_data():
+    st.header("💾 My Data")
+    st.write("Take everything you've logged with you, to another device or to your clinician, "
+             "or bring in a record exported from another TheraBot.")
+    user_id = st.session_state.user_id
+    
+    st.subheader("Export")
+    # Generated when clicked. Streamlit needs the whole file as bytes, so this buffers it;
+    # `python therabot_export.py export` streams large records instead
+    st.download_button("Download my full record (JSON Lines)",
+                       data=lambda: as_bytes(export_jsonl(user_id)),
+                       file_name=f"therabot-export-{datetime.now():%Y-%m-%d}.jsonl",
+                       mime="application/jsonl", key="export_jsonl")
+    table = st.selectbox("Or download one part as a spreadsheet (CSV):", list(EXPORT_TABLES),
+                         format_func=lambda t: t.replace('_', ' ').title(), key="export_csv_table")
+    st.download_button("Download CSV", data=lambda: as_bytes(export_csv(user_id, table)),
+                       file_name=f"{table}.csv", mime="text/csv", key="export_csv")
+    
+    st.subheader("Import")
+    upload = st.file_uploader("TheraBot export file (.jsonl)", type=["jsonl"], key="import_file")
+    if upload is not None and st.button("Import into my record", key="import_button"):
+        try:
+            imported = import_jsonl(io.TextIOWrapper(upload, encoding='utf-8', newline=''), user_id)
+        except ExportFormatError as e:
+            st.error(f"This file couldn't be imported: {e}")
+        else:
+            dashboard_cache.invalidate(user_id)
+            if imported:
+                st.success(f"Imported {imported} entries.")
             else:
-                st.success("""
-                **Score suggests minimal PTSD symptoms.**
-                Continue healthy habits that support your wellbeing.
-                """)
-            
-            # Store assessment results
-            if 'user_id' in st.session_state:
-                today = datetime.now().strftime("%Y-%m-%d")
-                c.execute('INSERT INTO trauma_assessments (user_id, date, ptsdi_score) VALUES (?,?,?)',
-                          (st.session_state.user_id, today, total))
-                conn.commit()
+                st.info("This file has already been imported.")
 
 # Enhanced AI Therapist Feature with More Human-like Responses
 def ai_therapist():
@@ -594,22 +439,17 @@ def ai_therapist():
     - We can change approaches anytime if something isn't working for you
     """)
     
-    # Display conversation history with more natural formatting
-    if st.session_state.conversation_history:
+    # Conversation history is kept per user; only a recent window lives in memory
+    conversation = st.session_state.get('conversation')
+    if conversation is None or conversation.user_id != st.session_state.user_id:
+        conversation = st.session_state.conversation = ConversationStore.resume(st.session_state.user_id)
+    
+    # Display the visible window of the conversation in one block
+    if conversation:
         st.subheader("Our Conversation")
-        for i, (speaker, message) in enumerate(st.session_state.conversation_history):
-            if speaker == "You":
-                st.markdown(f"""
-                <div style='background-color: #f0f2f6; padding: 10px; border-radius: 10px; margin-bottom: 10px;'>
-                    <strong>You:</strong> {message}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                <div style='background-color: #e6f7ff; padding: 10px; border-radius: 10px; margin-bottom: 10px;'>
-                    <strong>TheraBot ({therapy_mode}):</strong> {message}
-                </div>
-                """, unsafe_allow_html=True)
+        if conversation.has_earlier and st.button("Load earlier messages"):
+            conversation.load_earlier()
+        st.markdown(conversation.render_html(), unsafe_allow_html=True)
     
     # User input with more conversational prompts
     prompt_questions = {
@@ -632,30 +472,20 @@ def ai_therapist():
         if not question.strip():
             st.warning("I'd love to hear from you. What's on your mind?")
         else:
-            today = datetime.now().strftime("%Y-%m-%d")
             response = answer_ai_therapist_question(
                 question, 
                 st.session_state.get('user_id'),
                 therapy_mode,
-                st.session_state.conversation_history
+                conversation.history()
             )
             
-            # Add to conversation history with natural flow
-            st.session_state.conversation_history.append(("You", question))
-            st.session_state.conversation_history.append(("TheraBot", response))
-            
-            # Store the question and response
-            if 'user_id' in st.session_state:
-                c.execute('''INSERT INTO ai_therapist_questions 
-                            (user_id, date, question, response, therapy_mode) 
-                            VALUES (?,?,?,?,?)''',
-                          (st.session_state.user_id, today, question, response, therapy_mode))
-                conn.commit()
+            # Store the question and response and add them to the conversation
+            conversation.add_turn(question, response, therapy_mode)
             
             st.rerun()
     
     if st.button("Clear Conversation"):
-        st.session_state.conversation_history = []
+        conversation.clear()
         st.success("Conversation cleared. I'm here when you're ready to talk.")
         st.rerun()
     
@@ -668,106 +498,23 @@ def ai_therapist():
     - Your feelings are valid, even the difficult ones
     """)
 
-def answer_ai_therapist_question(question, user_id=None, therapy_mode='CBT', conversation_history=[]):
-    """Generate a more human-like response to mental health questions"""
+def answer_ai_therapist_question(question, user_id=None, therapy_mode='CBT', conversation_history=[], rng=random):
+    """Generate a more human-like response to mental health questions.
+
+    Pass a seeded ``random.Random`` as ``rng`` to get reproducible responses.
+    """
     user_type, trauma_history = get_user_type(user_id) if user_id else ('general', 0)
     
     # Analyze conversation context
     last_few_messages = [msg[1] for msg in conversation_history[-4:] if msg[0] == "You"]
     context = " ".join(last_few_messages).lower()
     
-    # Define more natural responses for different therapy modes
-    therapy_responses = {
-        'CBT': {
-            "anxiety": [
-                "I hear how anxious you're feeling about this. What evidence do you have that supports or contradicts these worries?",
-                "Anxiety often makes us overestimate danger. What would you say to a friend who had this worry?",
-                "That sounds really stressful. Can we examine the thoughts behind this anxiety together?"
-            ],
-            "depression": [
-                "I'm sorry you're feeling this way. What negative thoughts come up most often for you?",
-                "Depression can really distort our thinking. Can you identify any patterns in these thoughts?",
-                "That sounds really hard. What would a slightly kinder perspective on this look like?"
-            ],
-            "stress": [
-                "Stress can feel overwhelming. How are you interpreting this situation?",
-                "I hear how stressed you are. What's one small way you might reframe this?",
-                "That sounds like a lot to handle. What thoughts make this feel most stressful?"
-            ]
-        },
-        'ACT': {
-            "anxiety": [
-                "Anxiety is tough. Rather than fighting it, what would it look like to make space for it while still doing what matters?",
-                "I hear that anxiety is present. What valued action could you take even with anxiety coming along?",
-                "What would it feel like to say 'I'm noticing anxiety' rather than 'I am anxious'?"
-            ],
-            "depression": [
-                "Depression can feel heavy. What small step toward something meaningful could you take today?",
-                "Even with depression present, what matters enough to you that you'd do it anyway?",
-                "What would acceptance of these feelings look like right now?"
-            ]
-        },
-        'DBT': {
-            "emotion": [
-                "Emotions can feel intense. What skills might help you ride this wave?",
-                "I hear the emotion in what you're sharing. Would a distress tolerance skill help right now?",
-                "What would wise mind say about this situation?"
-            ]
-        },
-        'IFS': {
-            "part": [
-                "I hear that part of you speaking. Can you describe it with curiosity?",
-                "What does this part need you to know?",
-                "How old does this part feel?"
-            ]
-        },
-        'CPT': {
-            "trauma": [
-                "Trauma memories can feel so present. What stuck points come up when you think about this?",
-                "How has your understanding of this experience changed over time?",
-                "What would challenge the most distressing thought about this memory?"
-            ]
-        },
-        'Somatic': {
-            "body": [
-                "Where do you feel that in your body right now?",
-                "Let's check in with your body. What sensations do you notice?",
-                "How does your body respond when you recall that experience?"
-            ]
-        }
-    }
+    # One pass over the message finds every crisis, trauma and topic keyword
+    hits = keyword_matcher.scan(question)
+    topics = hits.names('topic')
     
-    # Specialized responses for different user types
-    specialized_responses = {
-        'veteran': {
-            "combat": [
-                "Your service experiences stay with you. How are these memories affecting you today?",
-                "That sounds like it was really difficult. How does it show up for you now?",
-                "Combat leaves deep impressions. What helps you when these memories come up?"
-            ],
-            "transition": [
-                "Transitioning to civilian life brings unique challenges. What aspect feels hardest right now?",
-                "That shift from military to civilian life can be tough. What support do you wish you had?",
-                "What strengths from your service help you navigate this transition?"
-            ]
-        },
-        'first_responder': {
-            "critical_incident": [
-                "The things you see on the job can really stick with you. How is this affecting you?",
-                "That sounds like it was really intense. How are you taking care of yourself after that?",
-                "First responders see so much. What helps you process these experiences?"
-            ],
-            "shift": [
-                "The demands of shift work are real. How are you protecting your sleep and recovery?",
-                "What helps you transition between work mode and home mode?",
-                "How do you decompress after a tough shift?"
-            ]
-        }
-    }
-
     # Crisis response with more compassionate tone
-    crisis_keywords = ["suicide", "kill myself", "end my life", "self-harm", "hurting myself"]
-    if any(keyword in question.lower() for keyword in crisis_keywords):
+    if hits.has('crisis'):
         return """
         **I'm really concerned about what you're sharing.** You're not alone in this pain, and there are people who want to help:
 
@@ -778,82 +525,43 @@ def answer_ai_therapist_question(question, user_id=None, therapy_mode='CBT', con
         Would you be willing to reach out to one of these resources? Your life matters so much.
         """
     
-    # More natural transitions between responses
-    transition_phrases = [
-        "I hear you...",
-        "That makes sense...",
-        "I can understand why you'd feel that way...",
-        "Thank you for sharing that...",
-        "Let's explore that together..."
-    ]
-    
     # Check for specialized topics first with more natural language
     if user_type in ['veteran', 'first_responder']:
-        for topic, responses in specialized_responses[user_type].items():
-            if topic in question.lower():
-                chosen_response = random.choice(responses)
-                transition = random.choice(transition_phrases)
-                return f"""
+        topic = response_catalog.match_topic(topics, user_type=user_type)
+        if topic:
+            chosen_response = response_catalog.pick(response_catalog.candidates(None, user_type, topic), rng)
+            transition = response_catalog.pick(response_catalog.phrases('transition'), rng)
+            return f"""
                 {transition} {chosen_response}
 
-                From a {therapy_mode} perspective, we might explore {random.choice([
-                    "how this shows up in your thoughts and feelings",
-                    "what values are involved here",
-                    "how your body responds when this comes up",
-                    "what parts of you get activated"
-                ])}.
+                From a {therapy_mode} perspective, we might explore {response_catalog.pick(response_catalog.phrases('specialized_approach'), rng)}.
 
                 Would you like to talk more about this?
                 """
     
     # More conversational trauma responses
-    trauma_keywords = ["trauma", "ptsd", "flashback", "trigger", "memory"]
-    if trauma_history or any(keyword in question.lower() for keyword in trauma_keywords):
-        trauma_responses = [
-            "Trauma can affect us in so many ways. How is this showing up for you?",
-            "That sounds really difficult. What helps you feel safe when this comes up?",
-            "I hear the pain in what you're sharing. How does this affect you now?"
-        ]
-        
-        chosen_response = random.choice(trauma_responses)
-        transition = random.choice(transition_phrases)
+    if trauma_history or hits.has('trauma'):
+        chosen_response = response_catalog.pick(response_catalog.phrases('trauma'), rng)
+        transition = response_catalog.pick(response_catalog.phrases('transition'), rng)
         return f"""
         {transition} {chosen_response}
 
-        From a {therapy_mode} perspective, we might {random.choice([
-            "explore how this memory affects you now",
-            "look at thoughts that keep coming up about this",
-            "notice how your body responds when remembering",
-            "identify parts that hold this experience"
-        ])}.
+        From a {therapy_mode} perspective, we might {response_catalog.pick(response_catalog.phrases('trauma_approach'), rng)}.
 
         Would you like to try a grounding exercise together?
         """
     
     # Find the most appropriate response
-    for topic, responses in therapy_responses.get(therapy_mode, {}).items():
-        if topic in question.lower():
-            return random.choice(responses)
+    topic = response_catalog.match_topic(topics, therapy_mode=therapy_mode)
+    if topic:
+        return response_catalog.pick(response_catalog.candidates(therapy_mode, None, topic), rng)
     
     # If no specific topic matched, use a general response
-    general_responses = [
-        "Thank you for sharing that with me. What else comes up as you talk about this?",
-        "I hear what you're saying. How does this make you feel in your body?",
-        "That sounds important. Would you like to explore this further?",
-        "Tell me more about what that's like for you.",
-        "I'm listening. What would be most helpful to focus on right now?"
-    ]
-    
-    transition = random.choice(transition_phrases)
-    approach = random.choice([
-        "we might explore your thoughts about this",
-        "it could help to notice how your body responds",
-        "we could examine what values are involved",
-        "we might look at which parts of you are present"
-    ])
+    transition = response_catalog.pick(response_catalog.phrases('transition'), rng)
+    approach = response_catalog.pick(response_catalog.phrases('general_approach'), rng)
     
     return f"""
-    {transition} {random.choice(general_responses)}
+    {transition} {response_catalog.pick(response_catalog.phrases('general'), rng)}
 
     From a {therapy_mode} perspective, {approach}.
 
@@ -865,140 +573,30 @@ def self_care_guidance():
     st.header("🧘 Self-Care Strategies")
     
     user_type, trauma_history = get_user_type(st.session_state.user_id) if 'user_id' in st.session_state else ('general', 0)
+    guidance = self_care_catalog.guidance_for(user_type, bool(trauma_history))
     
-    tab1, tab2, tab3 = st.tabs(["Quick Relief", "Daily Practices", "Professional Help"])
-    
-    with tab1:
-        st.subheader("Immediate Coping Strategies")
-        
-        if user_type == 'veteran' or trauma_history:
-            st.write("""
-            **For trauma-related distress:**
-            - 🌍 **Orienting Exercise**: 
-              Name 5 things you see, 4 sounds you hear, 3 things you can touch
-            - 🕰️ **Temporal Awareness**: 
-              Remind yourself "That was then, this is now"
-            - 🚶 **Grounding Walk**: 
-              Focus on each step and your surroundings
-            """)
-        
-        if user_type == 'first_responder':
-            st.write("""
-            **For first responder stress:**
-            - 🚨 **Critical Incident Pause**: 
-              After intense calls, take 3 minutes to breathe and transition
-            - 🛡️ **Boundary Visualization**: 
-              Imagine a protective shield between work and personal life
-            - 🤝 **Buddy Check**: 
-              Quick connection with a colleague after tough shifts
-            """)
-        
-        st.write("""
-        **For acute distress:**
-        - 🌬️ **5-4-3-2-1 Grounding**: 
-          Name 5 things you see, 4 you can touch, 3 you hear, 2 you smell, 1 you taste
-        - ❄️ **Temperature Change**: 
-          Hold an ice cube or splash cold water on your face
-        - 🏃 **Movement**: 
-          Walk briskly or do jumping jacks to release tension
-        - 📝 **Thought Download**: 
-          Write down everything in your mind without filtering
-        """)
-        
-        st.subheader("Calming Breathing Exercises")
-        st.write("""
-        **4-7-8 Breathing:**
-        1. Breathe in quietly through nose for 4 seconds
-        2. Hold breath for 7 seconds
-        3. Exhale completely through mouth for 8 seconds
-        4. Repeat 3-4 times
-        
-        **Box Breathing (used by Navy SEALs):**
-        1. Inhale for 4 seconds
-        2. Hold for 4 seconds
-        3. Exhale for 4 seconds
-        4. Hold for 4 seconds
-        5. Repeat
-        """)
-    
-    with tab2:
-        st.subheader("Daily Mental Health Practices")
-        
-        if user_type == 'veteran':
-            st.write("""
-            **For Veterans:**
-            - 🎖️ **Service Connection**: 
-              Maintain bonds with fellow veterans
-            - 🕊️ **Transition Rituals**: 
-              Create routines that mark civilian life
-            - 📅 **Structure**: 
-              Maintain regular daily rhythms
-            """)
-        
-        if user_type == 'first_responder':
-            st.write("""
-            **For First Responders:**
-            - 🔄 **Shift Transition**: 
-              Decompression routine after shifts
-            - 👥 **Peer Support**: 
-              Regular check-ins with colleagues
-            - 🧠 **Mental Rehearsal**: 
-              Visualize handling challenging calls successfully
-            """)
-        
-        st.write("""
-        **General Practices:**
-        - ☀️ Morning sunlight exposure
-        - 💧 Stay hydrated
-        - 🚶‍♂️ Regular movement
-        - 🛌 Consistent sleep schedule
-        - 🎨 Creative expression
-        - 👥 Meaningful social connection
-        """)
-    
-    with tab3:
-        st.subheader("When to Seek Professional Help")
-        st.write("""
-        Consider reaching out to a therapist if you experience:
-        - Persistent sadness or anxiety
-        - Difficulty functioning at work/school
-        - Significant changes in sleep/appetite
-        - Loss of interest in activities
-        - Thoughts of self-harm
-        - Trauma symptoms interfering with life
-        """)
-        
-        if user_type == 'veteran':
-            st.write("""
-            **Veteran-Specific Resources:**
-            - VA Mental Health Services
-            - Wounded Warrior Project
-            - Give an Hour
-            - Cohen Veterans Network
-            """)
-        
-        if user_type == 'first_responder':
-            st.write("""
-            **First Responder Resources:**
-            - Code Green Campaign
-            - First Responder Support Network
-            - Safe Call Now
-            - CopLine
-            """)
+    for tab, blocks in zip(st.tabs(list(guidance)), guidance.values()):
+        with tab:
+            for kind, text in blocks:
+                if kind == 'subheader':
+                    st.subheader(text)
+                else:
+                    st.markdown(text)
 
 def get_user_type(user_id):
-    c.execute('SELECT user_type, trauma_history FROM users WHERE id = ?', (user_id,))
-    row = c.fetchone()
+    with db_cursor() as c:
+        c.execute('SELECT user_type, trauma_history FROM users WHERE id = ?', (user_id,))
+        row = c.fetchone()
     if row:
         return row[0], bool(row[1])
     return 'general', False
 
 # Enhanced Welcome Page with User Type Selection
 def welcome_page():
-    if logo_base64:
+    if logo:
         st.markdown(f"""
         <div style="text-align: center;">
-            <img src="data:image/png;base64,{logo_base64}" style="max-width: 200px; margin-bottom: 10px;">
+            <img src="{logo['src']}" srcset="{logo['srcset']}" width="200" style="max-width: 200px; margin-bottom: 10px;">
             <h3>Guided by science, powered by AI, grounded in care</h3>
         </div>
         """, unsafe_allow_html=True)
@@ -1019,13 +617,17 @@ def welcome_page():
                 username = st.text_input("Username")
                 password = st.text_input("Password", type="password")
                 if st.form_submit_button("Login"):
-                    user_id = login_user(username, password)
-                    if user_id:
-                        st.session_state.user_id = user_id
-                        st.session_state.username = username
-                        st.rerun()
+                    try:
+                        user_id = login_user(username, password)
+                    except LoginThrottled as e:
+                        st.error(f"Too many login attempts. Please try again in {e.retry_after:.0f} seconds.")
                     else:
-                        st.error("Invalid username or password")
+                        if user_id:
+                            st.session_state.user_id = user_id
+                            st.session_state.username = username
+                            st.rerun()
+                        else:
+                            st.error("Invalid username or password")
         
         with tab2:
             with st.form("Register"):
@@ -1111,10 +713,7 @@ def welcome_page():
         st.subheader("Quick Mood Check")
         mood = st.slider("How are you feeling right now?", 0, 10, 5)
         if st.button("Log Quick Mood", key="btn_quick_mood"):
-            today = datetime.now().strftime("%Y-%m-%d")
-            c.execute('INSERT INTO mood_entries (user_id, date, mood) VALUES (?,?,?)',
-                      (st.session_state.user_id, today, mood))
-            conn.commit()
+            repos.moods.add(st.session_state.user_id, mood)
             st.success("Mood logged!")
 # Enhanced Journal with AI memory
 def journal_entry():
@@ -1173,21 +772,21 @@ def journal_entry():
         if len(entry) < 20:
             st.warning("That's quite brief! Are you sure you don't want to add more?")
         else:
-            today = datetime.now().strftime("%Y-%m-%d")
             sentiment = analyze_journal_sentiment(entry)
             
-            c.execute('INSERT INTO journal_entries (user_id, date, entry, sentiment) VALUES (?,?,?,?)',
-                      (st.session_state.user_id, today, entry, sentiment))
-            conn.commit()
+            # Wait for the id even in async durability mode; related entries leave it out.
+            # The save scans the entry's keywords once; read its themes back from that row
+            saved = repos.journal.add(st.session_state.user_id, entry, sentiment, wait=True)
+            themes = stored_features('journal', saved.id).theme_mask
             
             # Enhanced AI response based on user type and content
             if user_type == 'veteran':
                 base_response = "Thank you for your service. "
-                if "service" in entry.lower() or "military" in entry.lower():
+                if has_label(themes, 'journal', 'military'):
                     base_response += "Your military experience has shaped who you are today. "
             elif user_type == 'first_responder':
                 base_response = "Your work makes a profound difference. "
-                if "shift" in entry.lower() or "call" in entry.lower():
+                if has_label(themes, 'journal', 'first_response'):
                     base_response += "The challenges of first response work are unique. "
             else:
                 base_response = ""
@@ -1195,7 +794,7 @@ def journal_entry():
             if sentiment > 0.2:
                 ai_response = base_response + "I notice positive tones in your writing. Celebrate these moments!"
             elif sentiment < -0.2:
-                if trauma_history or any(word in entry.lower() for word in ['trauma', 'ptsd', 'trigger']):
+                if trauma_history or has_label(themes, 'journal', 'trauma'):
                     ai_response = base_response + "Your words reflect difficult experiences. The VA and other organizations offer specialized support for trauma healing."
                 else:
                     ai_response = base_response + "Your words reflect some difficulty. Remember, writing about challenges is already a step toward processing them."
@@ -1204,84 +803,65 @@ def journal_entry():
             
             st.success(f"**TheraBot:** {ai_response}\n\nJournal saved!")
             
-            # Connect to previous entries if available
-            c.execute('SELECT entry FROM journal_entries WHERE user_id = ? AND date != ? ORDER BY date DESC LIMIT 1',
-                      (st.session_state.user_id, today))
-            prev_entry = c.fetchone()
-            
-            if prev_entry:
-                common_words = set(entry.lower().split()) & set(prev_entry[0].lower().split())
-                if common_words:
-                    st.info(f"**Connection to previous entry:** You mentioned similar themes about {', '.join(common_words)}.")
+            # Connect to the most related past entries, from anywhere in the journal
+            related = related_entries(st.session_state.user_id, entry, exclude={saved.id})
+            if related:
+                connections = "\n".join(
+                    f"- {format_ts(r.date, '%B %d, %Y')}: {', '.join(r.shared[:5])}" for r in related)
+                st.info(f"**Connection to previous entries:** You wrote about similar themes before:\n{connections}")
 
 # Enhanced Self-Care Library with tracking
+SELF_CARE_PAGE_SIZE = 50
+# label -> days back from today; None means all time
+THEME_WINDOWS = {"Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90, "All time": None}
+
+# Built from the full self-care history once an hour per process and
+# updated in place as activities are logged in between
+@st.cache_resource(ttl=3600, show_spinner=False)
+def init_recommender():
+    with db_cursor() as c:
+        c.execute('SELECT user_id, date, activity FROM self_care_activities ORDER BY date')
+        history = pd.DataFrame(c.fetchall(), columns=['user_id', 'date', 'activity'])
+    load_user = lambda user_id: [(a.date, a.activity) for a in repos.self_care.between(user_id, None, None)]
+    return Recommender.from_history(history, [a.name for a in self_care_catalog.activities], load_user)
+
+def log_self_care(activity):
+    logged = repos.self_care.add(st.session_state.user_id, activity.name, activity.category, activity.minutes)
+    init_recommender().observe(st.session_state.user_id, activity.name, logged.date)
+    st.success(f"Logged: {activity.name}!")
+
 def self_care_library():
     st.header("🌿 Self-Care Resource Library")
     
     tab1, tab2, tab3 = st.tabs(["Browse Activities", "Your Self-Care History", "Self-Care Guidance"])
     
     with tab1:
-        category = st.selectbox("Browse by category:", [
-            "Quick Pick-Me-Ups (5 min or less)",
-            "Emotional Care",
-            "Physical Wellbeing",
-            "Social Connection",
-            "Productivity Boosters",
-            "Creativity Sparks"
-        ])
+        suggestions = init_recommender().recommend(st.session_state.user_id)
+        if suggestions:
+            st.subheader("Suggested for You")
+            for name, _ in suggestions:
+                activity = self_care_catalog.named(name)
+                if st.button(f"{activity.name} ({activity.minutes} min)", key=f"suggested_{activity.id}"):
+                    log_self_care(activity)
         
-        if category == "Quick Pick-Me-Ups (5 min or less)":
-            activities = [
-                ("Deep breathing (4-7-8 technique)", "Relaxation", 5),
-                ("Stretch break", "Physical", 5),
-                ("Hydration station", "Physical", 2),
-                ("Mini dance party", "Joy", 5),
-                ("Nature gaze", "Mindfulness", 3)
-            ]
-        elif category == "Emotional Care":
-            activities = [
-                ("Self-compassion break", "Emotional", 3),
-                ("Gratitude moment", "Emotional", 5),
-                ("Emotional check-in", "Emotional", 5),
-                ("Comfort object", "Emotional", 2)
-            ]
-        elif category == "Physical Wellbeing":
-            activities = [
-                ("Posture reset", "Physical", 1),
-                ("Hydration check", "Physical", 1),
-                ("Energy snack", "Physical", 5),
-                ("Micro-movement", "Physical", 3)
-            ]
-        elif category == "Social Connection":
-            activities = [
-                ("Reach out to someone", "Social", 10),
-                ("Social media detox", "Social", 30),
-                ("Kindness boost", "Social", 5),
-                ("Memory lane", "Social", 10)
-            ]
-        elif category == "Productivity Boosters":
-            activities = [
-                ("Pomodoro technique", "Focus", 25),
-                ("Two-minute rule", "Focus", 2),
-                ("Priority triage", "Focus", 10),
-                ("Declutter sprint", "Focus", 15)
-            ]
-        elif category == "Creativity Sparks":
-            activities = [
-                ("Doodle break", "Creative", 10),
-                ("Word play", "Creative", 5),
-                ("Color therapy", "Creative", 15),
-                ("Creative consumption", "Creative", 20)
-            ]
+        category = st.selectbox("Browse by category:", self_care_catalog.categories())
+        col1, col2 = st.columns(2)
+        with col1:
+            max_minutes = st.selectbox("Time available:", [None, 2, 5, 15, 30],
+                                       format_func=lambda m: "Any" if m is None else f"{m} min or less")
+        with col2:
+            tag = st.selectbox("Focus:", [None] + self_care_catalog.tags(),
+                               format_func=lambda t: "Any" if t is None else t)
+        
+        activities = self_care_catalog.query(category=category, max_minutes=max_minutes, tag=tag,
+                                             limit=SELF_CARE_PAGE_SIZE)
         
         st.subheader(f"{category} Activities")
-        for activity, _, duration in activities:
-            if st.button(f"{activity} ({duration} min)"):
-                today = datetime.now().strftime("%Y-%m-%d")
-                c.execute('INSERT INTO self_care_activities (user_id, date, activity, category, duration) VALUES (?,?,?,?,?)',
-                          (st.session_state.user_id, today, activity, category, duration))
-                conn.commit()
-                st.success(f"Logged: {activity}!")
+        if not activities:
+            st.info("No activities match these filters")
+        for activity in activities:
+            if st.button(f"{activity.name} ({activity.minutes} min)", key=f"self_care_{activity.id}"):
+                log_self_care(activity)
     
     with tab2:
         st.subheader("Your Self-Care History")
@@ -1297,23 +877,18 @@ def self_care_library():
             end_date = st.date_input("End date", end_date)
         
         # Fetch activities in date range
-        c.execute('''SELECT date, activity, duration FROM self_care_activities 
-                     WHERE user_id = ? AND date BETWEEN ? AND ?
-                     ORDER BY date DESC''',
-                  (st.session_state.user_id, start_date.strftime("%Y-%m-%d"), 
-                   end_date.strftime("%Y-%m-%d")))
-        activities = c.fetchall()
+        activities = repos.self_care.between(st.session_state.user_id, day_start_ts(start_date), day_end_ts(end_date))
         
         if activities:
             st.write(f"Found {len(activities)} activities:")
-            for date, activity, duration in activities:
-                st.write(f"- {date}: {activity} ({duration} min)")
+            for activity in activities:
+                st.write(f"- {format_ts(activity.date)}: {activity.activity} ({activity.duration} min)")
             
             # Visualization
             st.subheader("Activity Distribution")
-            fig = plot_self_care_categories(st.session_state.user_id)
-            if fig:
-                st.pyplot(fig)
+            chart = plot_self_care_categories(st.session_state.user_id)
+            if chart:
+                st.image(chart)
             else:
                 st.info("Complete more activities to see visualizations")
         else:
@@ -1325,58 +900,50 @@ def self_care_library():
 # Progress Tracking Dashboard
 def progress_tracking():
     st.header("📈 Your Progress Dashboard")
+    stats = get_dashboard_stats(st.session_state.user_id)
     
     tab1, tab2, tab3 = st.tabs(["Mood Trends", "Journal Insights", "Self-Care Report"])
     
     with tab1:
         st.subheader("Mood Over Time")
-        mood_fig = plot_mood_trend(st.session_state.user_id)
-        if mood_fig:
-            st.pyplot(mood_fig)
-            
-            # Mood statistics
-            c.execute('SELECT AVG(mood), MIN(mood), MAX(mood) FROM mood_entries WHERE user_id = ?',
-                      (st.session_state.user_id,))
-            avg, min_mood, max_mood = c.fetchone()
+        mood_chart = plot_mood_trend(st.session_state.user_id)
+        if mood_chart:
+            st.image(mood_chart)
+        else:
+            st.info("Log moods on more days to see trends")
+        
+        # Mood statistics
+        avg, min_mood, max_mood = stats['mood_stats']
+        if avg is not None:
             st.write(f"**Average mood:** {avg:.1f}/10")
             st.write(f"**Range:** {min_mood} (low) to {max_mood} (high)")
-        else:
-            st.info("Log more moods to see trends")
     
     with tab2:
         st.subheader("Journal Insights")
-        c.execute('SELECT date, entry, sentiment FROM journal_entries WHERE user_id = ? ORDER BY date DESC LIMIT 5',
-                  (st.session_state.user_id,))
-        entries = c.fetchall()
+        entries = stats['recent_journal']
         
         if entries:
-            # Sentiment over time
-            df = pd.DataFrame(entries, columns=['Date', 'Entry', 'Sentiment'])
-            df['Date'] = pd.to_datetime(df['Date'])
+            # Sentiment over time (daily average)
+            sentiment_chart = plot_sentiment_trend(st.session_state.user_id)
+            if sentiment_chart:
+                st.image(sentiment_chart)
             
-            fig, ax = plt.subplots(figsize=(10, 4))
-            df.plot(x='Date', y='Sentiment', ax=ax, marker='o')
-            ax.set_title('Journal Sentiment Trend')
-            ax.set_ylabel('Sentiment (-1 to 1)')
-            ax.grid(True)
-            st.pyplot(fig)
-            
-            # Common themes
+            # Themes: what stood out in this window compared with the rest of the journal
             st.write("**Recent Journal Themes**")
-            all_text = " ".join([e[1] for e in entries]).lower()
-            common_words = pd.Series(all_text.split()).value_counts().head(10)
-            st.bar_chart(common_words)
+            window = st.selectbox("Themes from", list(THEME_WINDOWS), index=1, key="theme_window")
+            days = THEME_WINDOWS[window]
+            start = day_start_ts(datetime.now() - timedelta(days=days - 1)) if days else None
+            themes = top_terms(st.session_state.user_id, start)
+            if themes:
+                st.bar_chart(pd.Series([t.weight for t in themes], index=[t.term for t in themes], name="Weight"))
+            else:
+                st.info("No journal entries in this period")
         else:
             st.info("Write more journal entries to see insights")
     
     with tab3:
         st.subheader("Self-Care Report")
-        c.execute('''SELECT category, COUNT(*), SUM(duration) 
-                     FROM self_care_activities 
-                     WHERE user_id = ?
-                     GROUP BY category''',
-                  (st.session_state.user_id,))
-        category_data = c.fetchall()
+        category_data = stats['self_care_by_category']
         
         if category_data:
             df = pd.DataFrame(category_data, columns=['Category', 'Count', 'Total Minutes'])
@@ -1391,14 +958,9 @@ def progress_tracking():
                 st.bar_chart(df.set_index('Category')['Total Minutes'])
             
             st.write("**Recent Activities**")
-            c.execute('''SELECT date, activity, duration 
-                         FROM self_care_activities 
-                         WHERE user_id = ? 
-                         ORDER BY date DESC LIMIT 5''',
-                      (st.session_state.user_id,))
-            recent = c.fetchall()
+            recent = stats['recent_self_care']
             for date, activity, duration in recent:
-                st.write(f"- {date}: {activity} ({duration} min)")
+                st.write(f"- {format_ts(date)}: {activity} ({duration} min)")
         else:
             st.info("Log self-care activities to see your report")
 
@@ -1426,16 +988,20 @@ def mood_scale():
     
     if st.button("Log Mood"):
         if 'user_id' in st.session_state:
-            today = datetime.now().strftime("%Y-%m-%d")
-            c.execute('INSERT INTO mood_entries (user_id, date, mood, note) VALUES (?,?,?,?)',
-                      (st.session_state.user_id, today, mood, note))
-            conn.commit()
+            repos.moods.add(st.session_state.user_id, mood, note)
             st.success("Mood logged successfully!")
         else:
             st.error("Please login to log your mood")
 
 def self_assessments():
     st.header("🧐 Self-Assessments")
+    tab1, tab2, tab3 = st.tabs(["PHQ-9 (Depression)", "GAD-7 (Anxiety)", "PSS (Stress)"])
+    with tab1:
+        assessment_form(INSTRUMENTS['PHQ-9'])
+    with tab2:
+        assessment_form(INSTRUMENTS['GAD-7'])
+    with tab3:
+        assessment_form(INSTRUMENTS['PSS'])
     trauma_assessment()  # Use the existing trauma assessment function
 
 def crisis_support():
@@ -1457,8 +1023,6 @@ def crisis_support():
     """)
 
 def main():
-    if 'conversation_history' not in st.session_state:
-        st.session_state.conversation_history = []
     if 'current_page' not in st.session_state:
         st.session_state.current_page = "Welcome"
     if 'user_id' not in st.session_state:
@@ -1477,10 +1041,12 @@ def main():
                 "Welcome": "🏠",
                 "Mood Scale": "📊",
                 "Journal Entry": "📝",
+                "Journal Search": "🔎",
                 "Self-Care Library": "🌿",
                 "Progress Tracking": "📈",
                 "Self-Assessment": "🧐",
                 "AI Therapist": "💬",
+                "My Data": "💾",
                 "Crisis Support": "🆘"
             }
 
@@ -1506,6 +1072,8 @@ def main():
             mood_scale()
         elif st.session_state.current_page == "Journal Entry":
             journal_entry()
+        elif st.session_state.current_page == "Journal Search":
+            journal_search()
         elif st.session_state.current_page == "Self-Care Library":
             self_care_library()
         elif st.session_state.current_page == "Progress Tracking":
@@ -1514,6 +1082,8 @@ def main():
             self_assessments()
         elif st.session_state.current_page == "AI Therapist":
             ai_therapist()
+        elif st.session_state.current_page == "My Data":
+            my_data()
         elif st.session_state.current_page == "Crisis Support":
             crisis_support()
     else:
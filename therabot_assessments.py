@@ -0,0 +1,309 @@
+"""Assessment instruments and scoring for In2Grative TheraBot.
+
+Each instrument is defined once in the registry: its items, response
+options, reverse-scored items and severity bands. Scoring is a NumPy
+operation over a (submissions x items) array, so one form submission and a
+research export of millions of stored responses go through the same code:
+reverse-score, sum the rows, then ``searchsorted`` the totals into bands.
+
+Stored responses are one uint8 per item (see ``pack_responses``), so a
+batch of rows from ``assessment_responses`` unpacks with a single
+``np.frombuffer``.
+
+Run ``python therabot_assessments.py bench`` to time bulk scoring against a
+per-submission Python loop.
+"""
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# ``minimum`` is the lowest total in the band; ``level`` picks the UI alert style
+Band = namedtuple('Band', 'minimum label level message')
+Scores = namedtuple('Scores', 'totals bands')
+
+
+class Instrument:
+    """A questionnaire: items answered on ``options``, summed into severity bands.
+
+    ``reverse`` and ``alert_items`` hold zero-based item positions. Any answer
+    above the lowest option on an alert item is flagged whatever the total.
+    """
+
+    def __init__(self, key, name, instructions, items, options, bands, reverse=(), alert_items=(),
+                 option_labels=None, widget='radio', column=None):
+        self.key = key
+        self.name = name
+        self.instructions = instructions
+        self.items = tuple(items)
+        self.options = tuple(options)
+        self.option_labels = option_labels
+        self.bands = tuple(sorted(bands, key=lambda band: band.minimum))
+        self.reverse = np.array(sorted(reverse), dtype=np.intp)
+        self.alert_items = tuple(alert_items)
+        self.widget = widget
+        # Column in the legacy trauma_assessments table, if any
+        self.column = column
+        self._minimums = np.array([band.minimum for band in self.bands])
+
+    @property
+    def max_score(self):
+        return len(self.items) * self.options[-1]
+
+    def score(self, responses):
+        """Totals and band indexes for one submission (items,) or many (n, items)."""
+        responses = np.asarray(responses, dtype=np.int64)
+        if responses.shape[-1] != len(self.items):
+            raise ValueError(f"{self.key} has {len(self.items)} items, got {responses.shape[-1]} responses")
+        low, high = self.options[0], self.options[-1]
+        if responses.size and (responses.min() < low or responses.max() > high):
+            raise ValueError(f"{self.key} responses must be between {low} and {high}")
+        if self.reverse.size:
+            responses = responses.copy()
+            responses[..., self.reverse] = low + high - responses[..., self.reverse]
+        totals = responses.sum(axis=-1)
+        bands = np.searchsorted(self._minimums, totals, side='right') - 1
+        return Scores(totals, bands)
+
+    def band(self, total):
+        return self.bands[int(np.searchsorted(self._minimums, total, side='right') - 1)]
+
+    def alerts(self, responses):
+        """Alert items answered above the lowest option, per submission."""
+        responses = np.asarray(responses)
+        if not self.alert_items:
+            return np.zeros(responses.shape[:-1], dtype=bool)
+        return (responses[..., list(self.alert_items)] > self.options[0]).any(axis=-1)
+
+
+def pack_responses(responses):
+    return bytes(bytearray(responses))
+
+
+def unpack_responses(blobs, instrument):
+    """Stack stored response blobs into an (n, items) array in one call."""
+    return np.frombuffer(b''.join(blobs), dtype=np.uint8).reshape(-1, len(instrument.items))
+
+
+INSTRUMENTS = {}
+
+
+def register(instrument):
+    INSTRUMENTS[instrument.key] = instrument
+    return instrument
+
+
+def score(key, responses):
+    return INSTRUMENTS[key].score(responses)
+
+
+FREQUENCY_0_3 = {0: "Not at all", 1: "Several days", 2: "More than half the days", 3: "Nearly every day"}
+
+register(Instrument(
+    'PHQ-9', "PHQ-9: Patient Health Questionnaire",
+    "Over the last 2 weeks, how often have you been bothered by:",
+    [
+        "Little interest or pleasure in doing things",
+        "Feeling down, depressed, or hopeless",
+        "Trouble falling or staying asleep, or sleeping too much",
+        "Feeling tired or having little energy",
+        "Poor appetite or overeating",
+        "Feeling bad about yourself, or that you are a failure or have let yourself or your family down",
+        "Trouble concentrating on things, such as reading or watching television",
+        "Moving or speaking noticeably slowly, or being so fidgety or restless that you move around a lot more than usual",
+        "Thoughts that you would be better off dead, or of hurting yourself",
+    ],
+    options=(0, 1, 2, 3), option_labels=FREQUENCY_0_3, alert_items=(8,),
+    bands=[
+        Band(0, "minimal", 'success', "**Score suggests minimal depressive symptoms.**"),
+        Band(5, "mild", 'success', "**Score suggests mild depressive symptoms.** Keep an eye on how you feel."),
+        Band(10, "moderate", 'warning', "**Score suggests moderate depressive symptoms.** "
+                                        "Talking with a professional may be helpful."),
+        Band(15, "moderately severe", 'error', "**Score suggests moderately severe depressive symptoms.** "
+                                               "Consider reaching out to a mental health professional."),
+        Band(20, "severe", 'error', "**Score suggests severe depressive symptoms.** "
+                                    "Please reach out to a mental health professional soon."),
+    ],
+))
+
+register(Instrument(
+    'GAD-7', "GAD-7: Generalized Anxiety Disorder Scale",
+    "Over the last 2 weeks, how often have you been bothered by:",
+    [
+        "Feeling nervous, anxious, or on edge",
+        "Not being able to stop or control worrying",
+        "Worrying too much about different things",
+        "Trouble relaxing",
+        "Being so restless that it is hard to sit still",
+        "Becoming easily annoyed or irritable",
+        "Feeling afraid, as if something awful might happen",
+    ],
+    options=(0, 1, 2, 3), option_labels=FREQUENCY_0_3,
+    bands=[
+        Band(0, "minimal", 'success', "**Score suggests minimal anxiety.**"),
+        Band(5, "mild", 'success', "**Score suggests mild anxiety.** Keep an eye on how you feel."),
+        Band(10, "moderate", 'warning', "**Score suggests moderate anxiety.** "
+                                        "Talking with a professional may be helpful."),
+        Band(15, "severe", 'error', "**Score suggests severe anxiety.** "
+                                    "Consider reaching out to a mental health professional."),
+    ],
+))
+
+register(Instrument(
+    'PSS', "PSS-10: Perceived Stress Scale",
+    "In the last month, how often have you:",
+    [
+        "Been upset because of something that happened unexpectedly?",
+        "Felt that you were unable to control the important things in your life?",
+        "Felt nervous and stressed?",
+        "Felt confident about your ability to handle your personal problems?",
+        "Felt that things were going your way?",
+        "Found that you could not cope with all the things that you had to do?",
+        "Been able to control irritations in your life?",
+        "Felt that you were on top of things?",
+        "Been angered because of things that happened that were outside of your control?",
+        "Felt difficulties were piling up so high that you could not overcome them?",
+    ],
+    options=(0, 1, 2, 3, 4),
+    option_labels={0: "Never", 1: "Almost never", 2: "Sometimes", 3: "Fairly often", 4: "Very often"},
+    reverse=(3, 4, 6, 7),
+    bands=[
+        Band(0, "low", 'success', "**Score suggests low perceived stress.**"),
+        Band(14, "moderate", 'warning', "**Score suggests moderate perceived stress.** "
+                                        "Regular self-care and rest may help."),
+        Band(27, "high", 'error', "**Score suggests high perceived stress.** "
+                                  "Consider talking with someone you trust or a professional."),
+    ],
+))
+
+register(Instrument(
+    'PCL-5', "PCL-5: PTSD Checklist for DSM-5",
+    "In the past month, how much were you bothered by:",
+    [
+        "Repeated, disturbing memories of the stressful experience?",
+        "Repeated, disturbing dreams of the stressful experience?",
+        "Suddenly feeling or acting as if the stressful experience were happening again?",
+        "Feeling very upset when something reminded you of the stressful experience?",
+        "Having strong physical reactions when something reminded you of the stressful experience?",
+        "Avoiding memories, thoughts, or feelings related to the stressful experience?",
+        "Avoiding external reminders of the stressful experience?",
+        "Trouble remembering important parts of the stressful experience?",
+        "Having strong negative beliefs about yourself, others, or the world?",
+        "Blaming yourself or someone else for the stressful experience?",
+        "Having strong negative feelings like fear, horror, anger, guilt, or shame?",
+        "Loss of interest in activities you used to enjoy?",
+        "Feeling distant or cut off from other people?",
+        "Trouble experiencing positive feelings?",
+        "Irritable behavior, angry outbursts, or acting aggressively?",
+        "Taking too many risks or doing things that could cause you harm?",
+        "Being 'superalert' or watchful or on guard?",
+        "Feeling jumpy or easily startled?",
+        "Having difficulty concentrating?",
+        "Trouble falling or staying asleep?",
+    ],
+    options=(0, 1, 2, 3, 4),
+    option_labels={0: "Not at all", 1: "A little bit", 2: "Moderately", 3: "Quite a bit", 4: "Extremely"},
+    widget='slider', column='pcl5_score',
+    bands=[
+        Band(0, "minimal", 'success', """
+        **Score suggests minimal PTSD symptoms.**
+        Continue healthy habits that support your wellbeing.
+        """),
+        Band(20, "moderate", 'warning', """
+        **Score suggests moderate PTSD symptoms.**
+        Monitoring symptoms and considering professional support may be helpful.
+        """),
+        Band(33, "significant", 'error', """
+        **Score suggests significant PTSD symptoms.**
+        Consider reaching out to a trauma specialist for evaluation.
+        Resources:
+        - VA PTSD Program (for veterans)
+        - Psychology Today's trauma specialist finder
+        - ISTSS.org therapist directory
+        """),
+    ],
+))
+
+register(Instrument(
+    'PSS-I', "PTSD Symptom Scale (PSS-I)",
+    "In the past 2 weeks, how often have you experienced:",
+    [
+        "Intrusive memories of the event",
+        "Distressing dreams about the event",
+        "Flashbacks or feeling like it's happening again",
+        "Upset when reminded of the event",
+        "Physical reactions when reminded (e.g., sweating, pounding heart)",
+        "Avoiding thoughts or feelings about the event",
+        "Avoiding activities or situations that remind you",
+        "Trouble remembering important parts of the event",
+        "Loss of interest in activities",
+        "Feeling detached from others",
+        "Difficulty experiencing positive emotions",
+        "Irritability or anger outbursts",
+        "Difficulty concentrating",
+        "Trouble falling or staying asleep",
+        "Being overly alert or watchful",
+        "Easily startled",
+    ],
+    options=(0, 1, 2, 3),
+    option_labels={0: "Not at all", 1: "Once per week", 2: "2-4 times per week", 3: "5+ times per week"},
+    column='ptsdi_score',
+    bands=[
+        Band(0, "minimal", 'success', """
+        **Score suggests minimal PTSD symptoms.**
+        Continue healthy habits that support your wellbeing.
+        """),
+        Band(11, "moderate", 'warning', """
+        **Score suggests moderate PTSD symptoms.**
+        Monitoring symptoms and considering professional support may be helpful.
+        """),
+        Band(20, "significant", 'error', """
+        **Score suggests significant PTSD symptoms.**
+        Consider reaching out to a trauma specialist for evaluation.
+        """),
+    ],
+))
+
+
+def benchmark(submissions=1_000_000, seed=7):
+    """Score random stored submissions per instrument, vectorized vs a Python loop.
+
+    Returns [(instrument, vectorized_s, loop_s_estimate)]; the loop is timed on
+    a 10,000-row sample and scaled up.
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for instrument in INSTRUMENTS.values():
+        responses = rng.integers(instrument.options[0], instrument.options[-1] + 1,
+                                 size=(submissions, len(instrument.items)), dtype=np.uint8)
+        blobs = [row.tobytes() for row in responses]
+        started = time.perf_counter()
+        instrument.score(unpack_responses(blobs, instrument))
+        vectorized = time.perf_counter() - started
+
+        sample = [list(row) for row in responses[:10000]]
+        reverse = set(instrument.reverse.tolist())
+        low, high = instrument.options[0], instrument.options[-1]
+        started = time.perf_counter()
+        for row in sample:
+            total = sum(low + high - v if i in reverse else v for i, v in enumerate(row))
+            instrument.band(total)
+        loop = (time.perf_counter() - started) * submissions / len(sample)
+        results.append((instrument.key, vectorized, loop))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["bench"]:
+        print(f"{'instrument':>10} {'vectorized s':>13} {'python loop s':>14}   (1,000,000 submissions)")
+        for key, vectorized, loop in benchmark():
+            print(f"{key:>10} {vectorized:>13.2f} {loop:>14.1f}")
+        return 0
+    print("usage: python therabot_assessments.py bench")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
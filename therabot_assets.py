@@ -0,0 +1,85 @@
+"""Static assets for In2Grative TheraBot.
+
+The 1024px source logo is resized once per process into the sizes the
+200px welcome slot actually needs (1x and 2x). The variants are written to
+Streamlit's ``static/`` folder and referenced by URL, so pages no longer
+inline a 1.7 MB data URI on every render.
+"""
+import base64
+import hashlib
+import io
+import os
+
+from PIL import Image
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_SOURCE = os.path.join(APP_DIR, "In2Grative_Therapy_Logo_Design.png")
+# Streamlit serves this folder at app/static/ when server.enableStaticServing is on
+STATIC_DIR = os.path.join(APP_DIR, "static")
+STATIC_URL = "app/static"
+LOGO_WIDTHS = (200, 400)
+
+
+def _resize_png(img, width):
+    height = round(img.height * width / img.width)
+    out = io.BytesIO()
+    img.resize((width, height), Image.LANCZOS).save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def build_logo_variants(source=LOGO_SOURCE, widths=LOGO_WIDTHS):
+    """Return {width: png_bytes} for each requested width, or {} if the source is missing."""
+    if not os.path.exists(source):
+        print(f"File does not exist at: {source}")
+        return {}
+    with Image.open(source) as img:
+        img = img.convert("RGBA") if img.mode in ("P", "LA") else img
+        return {width: _resize_png(img, width) for width in widths}
+
+
+def publish_static(variants, source=LOGO_SOURCE, out_dir=STATIC_DIR):
+    """Write variants into the static folder and return {width: url}.
+
+    File names carry a hash of the source so a new logo never collides with a
+    browser-cached old one. Existing files are reused rather than rewritten.
+    """
+    with open(source, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:10]
+    os.makedirs(out_dir, exist_ok=True)
+    urls = {}
+    for width, data in variants.items():
+        name = f"logo_{width}_{digest}.png"
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        urls[width] = f"{STATIC_URL}/{name}"
+    return urls
+
+
+def load_logo(static_serving=True):
+    """Build the logo once and describe how to embed it.
+
+    Returns a dict with ``src``/``srcset`` for an <img> tag, or None if there is
+    no logo. Without static serving (or a writable static folder) it falls back
+    to a data URI of the small variant, which is still ~50x lighter than the
+    original.
+    """
+    variants = build_logo_variants()
+    if not variants:
+        return None
+    smallest = min(variants)
+    if static_serving:
+        try:
+            urls = publish_static(variants)
+            return {
+                "src": urls[smallest],
+                "srcset": ", ".join(f"{url} {width // smallest}x" for width, url in sorted(urls.items())),
+                "bytes": len(variants[smallest]),
+            }
+        except OSError as e:
+            print(f"Could not publish logo to {STATIC_DIR}: {e}")
+    encoded = base64.b64encode(variants[smallest]).decode("utf-8")
+    return {"src": f"data:image/png;base64,{encoded}", "srcset": "", "bytes": len(variants[smallest])}
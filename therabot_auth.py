@@ -0,0 +1,203 @@
+"""Password hashing and login throttling for In2Grative TheraBot.
+
+Passwords are hashed with salted scrypt (PBKDF2-SHA256 where the local
+OpenSSL has no scrypt). The cost is tunable through THERABOT_SCRYPT_N;
+run ``python therabot_auth.py calibrate`` to pick one for a target login
+latency on the current hardware. Rows still holding the original unsalted
+SHA-256 hex digests are verified the old way and rehashed on their next
+successful login.
+
+Login attempts pass through token-bucket limiters per username and per
+client IP before any hashing happens, so a login storm can't pin the CPU.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+
+from therabot_cache import LRUCache
+from therabot_db import db_cursor
+
+SCRYPT_N = int(os.environ.get("THERABOT_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = int(os.environ.get("THERABOT_PBKDF2_ITERATIONS", "600000"))
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Successful verifications are remembered briefly so a user re-submitting the
+# same password doesn't pay for scrypt again
+VERIFY_CACHE_SIZE = 1024
+VERIFY_CACHE_SECONDS = 300
+
+HAS_SCRYPT = hasattr(hashlib, "scrypt")
+
+
+class LoginThrottled(Exception):
+    """Raised when a username or client has run out of login attempts."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many login attempts; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _unb64(text):
+    return base64.b64decode(text.encode("ascii"))
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r, dklen=KEY_BYTES)
+
+
+def hash_password(password, n=SCRYPT_N):
+    """Salted hash in a self-describing 'scheme$params$salt$hash' format."""
+    salt = os.urandom(SALT_BYTES)
+    if HAS_SCRYPT:
+        key = _scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+    key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS, KEY_BYTES)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password(password, stored):
+    """Return (matches, needs_rehash) for a stored hash of any supported scheme."""
+    if not stored:
+        return False, False
+    parts = stored.split("$")
+    if parts[0] == "scrypt" and len(parts) == 6:
+        n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+        key = _scrypt(password, _unb64(parts[4]), n, r, p)
+        ok = hmac.compare_digest(key, _unb64(parts[5]))
+        return ok, ok and (not HAS_SCRYPT or (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P))
+    if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+        iterations = int(parts[1])
+        key = hashlib.pbkdf2_hmac("sha256", password.encode(), _unb64(parts[2]), iterations, KEY_BYTES)
+        ok = hmac.compare_digest(key, _unb64(parts[3]))
+        return ok, ok and (HAS_SCRYPT or iterations != PBKDF2_ITERATIONS)
+    # Legacy rows: unsalted single-round SHA-256 hex digest
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    ok = hmac.compare_digest(legacy, stored)
+    return ok, ok
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets: ``capacity`` attempts, refilled at ``rate`` per second."""
+
+    def __init__(self, capacity, rate, max_keys=10000):
+        self.capacity = capacity
+        self.rate = rate
+        self._buckets = LRUCache(max_keys)
+        self._lock = threading.Lock()
+
+    def consume(self, key, now=None):
+        """Take one token for ``key``; return 0 if allowed, else seconds until one is free."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets.put(key, (tokens, now))
+                return (1 - tokens) / self.rate
+            self._buckets.put(key, (tokens - 1, now))
+            return 0
+
+
+username_limiter = TokenBucketLimiter(capacity=5, rate=1 / 30)
+ip_limiter = TokenBucketLimiter(capacity=20, rate=1 / 3)
+
+_verify_key = os.urandom(32)
+_verified = LRUCache(VERIFY_CACHE_SIZE)
+# Burned on unknown usernames so they take as long as real ones
+_dummy_hash = None
+
+
+def _verify_cached(username, password, stored):
+    token = hmac.new(_verify_key, f"{username}\0{password}\0{stored}".encode(), hashlib.sha256).digest()
+    expires = _verified.get(token)
+    if expires and expires > time.monotonic():
+        return True, False
+    ok, needs_rehash = verify_password(password, stored)
+    if ok and not needs_rehash:
+        _verified.put(token, time.monotonic() + VERIFY_CACHE_SECONDS)
+    return ok, needs_rehash
+
+
+def authenticate(username, password, ip=None):
+    """Return the user id for valid credentials, else None. Raises LoginThrottled."""
+    global _dummy_hash
+    # Usernames are case-sensitive, so "Bob" and "bob" are separate accounts with separate buckets
+    waits = [username_limiter.consume(username)]
+    if ip:
+        waits.append(ip_limiter.consume(ip))
+    if max(waits):
+        raise LoginThrottled(max(waits))
+
+    with db_cursor() as c:
+        c.execute('SELECT id, password FROM users WHERE username = ?', (username,))
+        row = c.fetchone()
+    if not row:
+        _dummy_hash = _dummy_hash or hash_password("not-a-password")
+        verify_password(password, _dummy_hash)
+        return None
+
+    user_id, stored = row
+    ok, needs_rehash = _verify_cached(username, password, stored)
+    if not ok:
+        return None
+    if needs_rehash:
+        with db_cursor() as c:
+            # Only replace the hash we verified, in case it changed meanwhile
+            c.execute('UPDATE users SET password = ? WHERE id = ? AND password = ?',
+                      (hash_password(password), user_id, stored))
+    return user_id
+
+
+def calibrate(target_ms=100, r=SCRYPT_R, p=SCRYPT_P, max_log2_n=20):
+    """Largest power-of-two scrypt N whose hash time stays under ``target_ms``.
+
+    Returns (n, measured_ms) and the timings of every N tried.
+    """
+    salt = os.urandom(SALT_BYTES)
+    best = None
+    timings = []
+    for log2_n in range(10, max_log2_n + 1):
+        n = 2 ** log2_n
+        started = time.perf_counter()
+        _scrypt("calibration-password", salt, n, r, p)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        timings.append((n, elapsed_ms))
+        if elapsed_ms > target_ms:
+            break
+        best = (n, elapsed_ms)
+    return best, timings
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["calibrate"]:
+        print("usage: python therabot_auth.py calibrate [target_ms]")
+        return 2
+    if not HAS_SCRYPT:
+        print("hashlib.scrypt is unavailable here; tune THERABOT_PBKDF2_ITERATIONS instead")
+        return 1
+    target_ms = float(argv[1]) if len(argv) > 1 else 100
+    best, timings = calibrate(target_ms)
+    for n, elapsed_ms in timings:
+        print(f"N=2**{n.bit_length() - 1:<3} {elapsed_ms:8.1f} ms  ({128 * SCRYPT_R * n // 2 ** 20} MiB)")
+    if best:
+        print(f"Use THERABOT_SCRYPT_N={best[0]} for ~{best[1]:.0f} ms per login (target {target_ms:.0f} ms)")
+    else:
+        print(f"Even N=1024 exceeds {target_ms:.0f} ms on this machine")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""In-process caches for In2Grative TheraBot.
+
+Caches live at module level, so they are shared by every session served by
+the same Streamlit worker process and survive script reruns.
+"""
+import itertools
+import threading
+from collections import OrderedDict
+
+DASHBOARD_CACHE_USERS = 1024
+CHART_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used key past ``maxsize``."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+class ByteLRUCache:
+    """LRU cache of ``bytes`` values bounded by their total size rather than count."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class UserAggregateCache:
+    """Per-user dashboard aggregates with explicit invalidation on writes.
+
+    ``get(user_id, loader)`` returns the cached aggregates or calls ``loader()``
+    once to build them. Anything that inserts rows feeding the dashboard must
+    call ``invalidate(user_id)`` afterwards. Each cached entry carries a
+    ``version`` that changes whenever the entry is rebuilt, for use in keys of
+    caches derived from these aggregates.
+    """
+
+    def __init__(self, max_users=DASHBOARD_CACHE_USERS):
+        self._entries = LRUCache(max_users)
+        self._invalidations = {}
+        self._versions = itertools.count(1)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, loader):
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        with self._lock:
+            token = self._invalidations.get(user_id, 0)
+        entry = dict(loader())
+        with self._lock:
+            entry['version'] = next(self._versions)
+            # Don't cache a result that raced with a write for the same user
+            if self._invalidations.get(user_id, 0) == token:
+                self._entries.put(user_id, entry)
+        return entry
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._invalidations[user_id] = self._invalidations.get(user_id, 0) + 1
+            self._entries.pop(user_id)
+
+    def clear(self):
+        self._entries.clear()
+
+
+dashboard_cache = UserAggregateCache()
@@ -0,0 +1,46 @@
+"""Chart rendering for In2Grative TheraBot.
+
+Charts are drawn on standalone ``matplotlib.figure.Figure`` objects instead
+of pyplot, so nothing is registered in pyplot's global figure list and each
+figure is freed as soon as it has been rendered. The encoded image bytes are
+cached by (user, chart, data version, format), so reruns over unchanged data
+skip matplotlib entirely.
+"""
+import io
+
+from matplotlib.figure import Figure
+
+from therabot_cache import ByteLRUCache, CHART_CACHE_BYTES
+
+
+class ChartService:
+    """Render charts to PNG/SVG bytes through a size-bounded cache."""
+
+    def __init__(self, max_bytes=CHART_CACHE_BYTES, dpi=100):
+        self.cache = ByteLRUCache(max_bytes)
+        self.dpi = dpi
+
+    def render(self, user_id, chart, version, draw, figsize=(10, 4), fmt="png"):
+        """Return the chart image, calling ``draw(ax)`` only on a cache miss.
+
+        ``version`` must change whenever the data behind the chart changes.
+        """
+        key = (user_id, chart, version, fmt)
+        image = self.cache.get(key)
+        if image is None:
+            image = self._render(draw, figsize, fmt)
+            self.cache.put(key, image)
+        return image
+
+    def _render(self, draw, figsize, fmt):
+        fig = Figure(figsize=figsize, dpi=self.dpi)
+        try:
+            draw(fig.subplots())
+            buf = io.BytesIO()
+            fig.savefig(buf, format=fmt, bbox_inches="tight")
+            return buf.getvalue()
+        finally:
+            fig.clear()
+
+
+chart_service = ChartService()
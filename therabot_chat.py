@@ -0,0 +1,149 @@
+"""Conversation storage for the AI Therapist page.
+
+Each turn is written to ``ai_therapist_questions`` as soon as it happens,
+tagged with a chat session id and its turn number within that session.
+Only the most recent turns are kept in session memory in a fixed-size ring
+buffer. Older turns are read back from the database a page at a time when
+the user asks for them, and the visible window is rendered as a single HTML
+block, so a rerun costs the same after 5 turns or 500.
+
+Because sessions live in the database, a user who reconnects (or lands on
+another worker process) resumes their latest session by loading just its
+last few turns through the (session_id, turn) index.
+"""
+import html
+import uuid
+from collections import deque, namedtuple
+
+from therabot_db import db_cursor, now_ts
+from therabot_features import record_features
+from therabot_writer import get_writer
+
+RECENT_TURNS = 20
+PAGE_TURNS = 10
+# A session untouched for this long is not resumed; the user starts a new one
+SESSION_IDLE_SECONDS = 6 * 60 * 60
+
+Turn = namedtuple('Turn', 'id turn question response therapy_mode')
+
+USER_BUBBLE = """<div style='background-color: #f0f2f6; padding: 10px; border-radius: 10px; margin-bottom: 10px;'>
+    <strong>You:</strong> {message}
+</div>"""
+BOT_BUBBLE = """<div style='background-color: #e6f7ff; padding: 10px; border-radius: 10px; margin-bottom: 10px;'>
+    <strong>TheraBot ({therapy_mode}):</strong> {message}
+</div>"""
+
+
+def latest_session(user_id, idle_seconds=SESSION_IDLE_SECONDS):
+    """The user's most recently active session id, if it is still fresh."""
+    with db_cursor() as c:
+        c.execute('''SELECT session_id FROM chat_sessions
+                     WHERE user_id = ? AND last_active_at >= ?
+                     ORDER BY last_active_at DESC LIMIT 1''',
+                  (user_id, now_ts() - idle_seconds))
+        row = c.fetchone()
+    return row[0] if row else None
+
+
+def load_turns(session_id, before_turn=None, limit=RECENT_TURNS):
+    """Up to ``limit`` turns of a session older than ``before_turn``, oldest first."""
+    with db_cursor() as c:
+        c.execute('''SELECT id, turn, question, response, therapy_mode FROM ai_therapist_questions
+                     WHERE session_id = ? AND turn < ?
+                     ORDER BY turn DESC LIMIT ?''',
+                  (session_id, before_turn if before_turn is not None else 2 ** 62, limit))
+        rows = c.fetchall()
+    return [Turn(*row) for row in reversed(rows)]
+
+
+def _append_turn(c, session_id, user_id, now, question, response, therapy_mode):
+    # Number the turn inside the write transaction so concurrent workers
+    # appending to the same session can't collide
+    c.execute('''INSERT INTO chat_sessions (session_id, user_id, started_at, last_active_at, turn_count)
+                 VALUES (?,?,?,?,1)
+                 ON CONFLICT (session_id) DO UPDATE SET
+                     last_active_at = excluded.last_active_at,
+                     turn_count = turn_count + 1''',
+              (session_id, user_id, now, now))
+    c.execute('SELECT turn_count FROM chat_sessions WHERE session_id = ?', (session_id,))
+    turn_number = c.fetchone()[0]
+    c.execute('''INSERT INTO ai_therapist_questions
+                (user_id, date, question, response, therapy_mode, session_id, turn)
+                VALUES (?,?,?,?,?,?,?)''',
+              (user_id, now, question, response, therapy_mode, session_id, turn_number))
+    turn_id = c.lastrowid
+    record_features(c, 'chat', turn_id, user_id, now, question)
+    return Turn(turn_id, turn_number, question, response, therapy_mode)
+
+
+class ConversationStore:
+    """One user's chat session: a ring buffer of recent turns plus pages loaded on demand."""
+
+    def __init__(self, user_id, session_id=None, recent_turns=RECENT_TURNS, page_turns=PAGE_TURNS):
+        self.user_id = user_id
+        self.session_id = session_id or uuid.uuid4().hex
+        self.page_turns = page_turns
+        self.recent = deque(maxlen=recent_turns)
+        self.earlier = []
+
+    @classmethod
+    def resume(cls, user_id, **kwargs):
+        """Rehydrate the user's latest fresh session, or start a new one."""
+        session_id = latest_session(user_id)
+        store = cls(user_id, session_id, **kwargs)
+        if session_id:
+            store.recent.extend(load_turns(session_id, limit=store.recent.maxlen))
+        return store
+
+    @property
+    def has_earlier(self):
+        window = self.earlier or self.recent
+        return bool(window) and window[0].turn > 1
+
+    def add_turn(self, question, response, therapy_mode):
+        # Waits even in async durability mode: the turn number is needed here
+        turn = get_writer().write(_append_turn, self.session_id, self.user_id, now_ts(),
+                                  question, response, therapy_mode, wait=True)
+        if self.earlier and len(self.recent) == self.recent.maxlen:
+            # Keep the evicted turn visible; otherwise it would fall between earlier and recent
+            self.earlier.append(self.recent[0])
+        self.recent.append(turn)
+        return turn
+
+    def load_earlier(self):
+        """Page the next batch of older turns in from the database."""
+        if not self.has_earlier:
+            return 0
+        window = self.earlier or self.recent
+        page = load_turns(self.session_id, before_turn=window[0].turn, limit=self.page_turns)
+        self.earlier = page + self.earlier
+        return len(page)
+
+    def turns(self):
+        return self.earlier + list(self.recent)
+
+    def history(self, turns=2):
+        """The last few turns as (speaker, message) pairs, oldest first."""
+        pairs = []
+        for turn in list(self.recent)[-turns:]:
+            pairs.append(("You", turn.question))
+            pairs.append(("TheraBot", turn.response))
+        return pairs
+
+    def clear(self):
+        """Start a fresh session; the old one stays in the database."""
+        self.session_id = uuid.uuid4().hex
+        self.recent.clear()
+        self.earlier = []
+
+    def render_html(self):
+        """The visible window as one HTML string, for a single st.markdown call."""
+        parts = []
+        for turn in self.turns():
+            parts.append(USER_BUBBLE.format(message=html.escape(turn.question, quote=False)))
+            parts.append(BOT_BUBBLE.format(therapy_mode=html.escape(turn.therapy_mode or ''),
+                                           message=html.escape(turn.response, quote=False)))
+        return "\n".join(parts)
+
+    def __bool__(self):
+        return bool(self.recent)
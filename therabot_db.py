@@ -0,0 +1,642 @@
+"""Database access for In2Grative TheraBot.
+
+Every page gets its own pooled SQLite connection and cursor through
+``db_cursor()`` instead of sharing one module-level cursor between
+Streamlit session threads. The schema is owned by the versioned
+migrations at the bottom of this module; run them at deploy time with
+``python therabot_db.py migrate``.
+"""
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time
+
+DB_PATH = os.environ.get("THERABOT_DB", "therapy_app.db")
+POOL_SIZE = int(os.environ.get("THERABOT_DB_POOL_SIZE", "8"))
+
+# Applied to every new connection. WAL lets readers run alongside the single
+# writer, and NORMAL sync is durable across app crashes in WAL mode.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+)
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections that can be shared across threads."""
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, timeout=10.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection free after {self.timeout}s")
+
+    def release(self, conn):
+        if self._closed:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commit on success, roll back on error."""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def cursor(self):
+        """Borrow a connection and yield a fresh cursor on it."""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def db_connection():
+    return get_pool().connection()
+
+
+def db_cursor():
+    return get_pool().cursor()
+
+
+# Date helpers
+# Tracking tables store ``date`` as INTEGER Unix seconds: it sorts
+# numerically, fits in at most 8 bytes and keeps the time of day so entries
+# logged on the same day still come back in order.
+def now_ts():
+    return int(time.time())
+
+
+def day_start_ts(day):
+    """Unix seconds for local midnight at the start of ``day``."""
+    return int(datetime.combine(day, dt_time.min).timestamp())
+
+
+def day_end_ts(day):
+    """Unix seconds for the last second of ``day`` (local time)."""
+    return int(datetime.combine(day, dt_time.max).timestamp())
+
+
+def format_ts(ts, fmt="%Y-%m-%d"):
+    return datetime.fromtimestamp(ts).strftime(fmt)
+
+
+def day_key(ts):
+    """Local calendar day of ``ts`` as a YYYYMMDD integer, the key of the rollup tables."""
+    return int(datetime.fromtimestamp(ts).strftime("%Y%m%d"))
+
+
+def day_from_key(day):
+    return datetime.strptime(str(day), "%Y%m%d")
+
+
+# SQL equivalent of day_key() for backfills
+DAY_KEY_SQL = "CAST(strftime('%Y%m%d', date, 'unixepoch', 'localtime') AS INTEGER)"
+
+
+# Schema migrations
+TRACKING_TABLES = {
+    'mood_entries': """(id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        date INTEGER,
+        mood INTEGER,
+        note TEXT)""",
+    'journal_entries': """(id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        date INTEGER,
+        entry TEXT,
+        sentiment REAL)""",
+    'self_care_activities': """(id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        date INTEGER,
+        activity TEXT,
+        category TEXT,
+        duration INTEGER)""",
+    'trauma_assessments': """(id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        date INTEGER,
+        pcl5_score INTEGER,
+        ptsdi_score INTEGER)""",
+    'ai_therapist_questions': """(id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        date INTEGER,
+        question TEXT,
+        response TEXT,
+        therapy_mode TEXT)""",
+    'sleep_data': """(id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        date INTEGER,
+        hours REAL,
+        quality TEXT)""",
+}
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _migrate_base_schema(conn):
+    """Create the original tables, filling in columns older databases lack."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE,
+        password TEXT,
+        email TEXT,
+        user_type TEXT,
+        trauma_history INTEGER)''')
+    for table, definition in TRACKING_TABLES.items():
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {table} {definition.replace("date INTEGER", "date TEXT")}')
+
+    # Databases created by earlier versions of the app may predate these columns
+    missing = {
+        'users': [('user_type', 'TEXT'), ('trauma_history', 'INTEGER')],
+        'ai_therapist_questions': [('therapy_mode', 'TEXT')],
+    }
+    for table, columns in missing.items():
+        existing = _columns(conn, table)
+        for name, col_type in columns:
+            if name not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {col_type}')
+
+
+def _migrate_integer_dates(conn):
+    """Rebuild tracking tables with INTEGER dates, converting 'YYYY-MM-DD' text."""
+    for table, definition in TRACKING_TABLES.items():
+        conn.execute(f'CREATE TABLE {table}_new {definition}')
+        columns = [col for col in _columns(conn, table) if col in _columns(conn, f'{table}_new')]
+        selected = [
+            "CASE WHEN typeof(date) = 'text' THEN CAST(strftime('%s', date, 'utc') AS INTEGER) ELSE date END"
+            if col == 'date' else col
+            for col in columns
+        ]
+        conn.execute(f'INSERT INTO {table}_new ({", ".join(columns)}) SELECT {", ".join(selected)} FROM {table}')
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+
+
+def _migrate_user_date_indexes(conn):
+    """Composite (user_id, date) indexes so per-user recency queries avoid scans.
+
+    Columns read by the dashboards are appended so those queries are answered
+    from the index alone.
+    """
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_mood_entries_user_date ON mood_entries (user_id, date, mood)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_journal_entries_user_date ON journal_entries (user_id, date, sentiment)')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_self_care_activities_user_date
+                    ON self_care_activities (user_id, date, category, duration)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_trauma_assessments_user_date
+                    ON trauma_assessments (user_id, date, pcl5_score, ptsdi_score)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_ai_therapist_questions_user_date
+                    ON ai_therapist_questions (user_id, date)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sleep_data_user_date ON sleep_data (user_id, date, hours)')
+
+
+def _migrate_daily_rollups(conn):
+    """Per-user daily rollups, kept current by the record_* helpers below."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS daily_mood (
+        user_id INTEGER,
+        day INTEGER,
+        mood_sum INTEGER,
+        mood_count INTEGER,
+        mood_min INTEGER,
+        mood_max INTEGER,
+        PRIMARY KEY (user_id, day)) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS daily_sentiment (
+        user_id INTEGER,
+        day INTEGER,
+        sentiment_sum REAL,
+        entry_count INTEGER,
+        PRIMARY KEY (user_id, day)) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS daily_self_care (
+        user_id INTEGER,
+        day INTEGER,
+        category TEXT,
+        minutes INTEGER,
+        activity_count INTEGER,
+        PRIMARY KEY (user_id, day, category)) WITHOUT ROWID''')
+    backfill_rollups(conn)
+
+
+def _migrate_chat_sessions(conn):
+    """Group AI Therapist turns into sessions with a per-session turn number.
+
+    Existing turns become one 'legacy-<user_id>' session per user.
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS chat_sessions (
+        session_id TEXT PRIMARY KEY,
+        user_id INTEGER,
+        started_at INTEGER,
+        last_active_at INTEGER,
+        turn_count INTEGER)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_active ON chat_sessions (user_id, last_active_at)')
+    conn.execute('ALTER TABLE ai_therapist_questions ADD COLUMN session_id TEXT')
+    conn.execute('ALTER TABLE ai_therapist_questions ADD COLUMN turn INTEGER')
+    conn.execute('''UPDATE ai_therapist_questions
+                    SET session_id = 'legacy-' || ai_therapist_questions.user_id, turn = numbered.turn
+                    FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id) AS turn
+                          FROM ai_therapist_questions) AS numbered
+                    WHERE ai_therapist_questions.id = numbered.id''')
+    conn.execute('''INSERT INTO chat_sessions (session_id, user_id, started_at, last_active_at, turn_count)
+                    SELECT session_id, user_id, MIN(date), MAX(date), MAX(turn)
+                    FROM ai_therapist_questions GROUP BY session_id''')
+    conn.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_ai_therapist_questions_session_turn
+                    ON ai_therapist_questions (session_id, turn)''')
+
+
+def _migrate_assessment_responses(conn):
+    """Item-level answers for every assessment instrument.
+
+    ``responses`` packs one unsigned byte per item so stored submissions can
+    be rescored in bulk straight from the blobs.
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS assessment_responses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        date INTEGER,
+        instrument TEXT,
+        responses BLOB,
+        total INTEGER,
+        band INTEGER)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_assessment_responses_user_instrument_date
+                    ON assessment_responses (user_id, instrument, date, total)''')
+
+
+def _migrate_journal_search(conn):
+    """FTS5 index over journal entries, kept in step by triggers.
+
+    The index is external-content: it stores only the inverted index and
+    reads entry text back from journal_entries. ``user_id`` is indexed as a
+    token so a search matches one user's entries inside the index instead
+    of filtering every user's matches afterwards; bm25 gives that column no
+    weight.
+    """
+    conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS journal_fts USING fts5(
+        entry, user_id,
+        content='journal_entries', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2')''')
+    conn.execute("INSERT INTO journal_fts (journal_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')")
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS journal_fts_insert AFTER INSERT ON journal_entries BEGIN
+        INSERT INTO journal_fts (rowid, entry, user_id) VALUES (new.id, new.entry, new.user_id);
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS journal_fts_delete AFTER DELETE ON journal_entries BEGIN
+        INSERT INTO journal_fts (journal_fts, rowid, entry, user_id) VALUES ('delete', old.id, old.entry, old.user_id);
+    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS journal_fts_update AFTER UPDATE OF entry, user_id ON journal_entries BEGIN
+        INSERT INTO journal_fts (journal_fts, rowid, entry, user_id) VALUES ('delete', old.id, old.entry, old.user_id);
+        INSERT INTO journal_fts (rowid, entry, user_id) VALUES (new.id, new.entry, new.user_id);
+    END''')
+    rebuild_journal_search(conn)
+
+
+def _migrate_journal_terms(conn):
+    """Per-user term counts for journal themes, by day and over all time."""
+    from therabot_themes import backfill_terms
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS daily_terms (
+        user_id INTEGER,
+        day INTEGER,
+        term TEXT,
+        tf INTEGER,
+        df INTEGER,
+        PRIMARY KEY (user_id, day, term)) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS user_terms (
+        user_id INTEGER,
+        term TEXT,
+        tf INTEGER,
+        df INTEGER,
+        PRIMARY KEY (user_id, term)) WITHOUT ROWID''')
+    backfill_terms(conn)
+
+
+def _migrate_journal_similarity(conn):
+    """MinHash signatures and LSH band buckets for related-entry lookups."""
+    from therabot_similarity import backfill_signatures
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS journal_signatures (
+        entry_id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        signature BLOB)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS journal_lsh (
+        user_id INTEGER,
+        band INTEGER,
+        bucket INTEGER,
+        entry_id INTEGER,
+        PRIMARY KEY (user_id, band, bucket, entry_id)) WITHOUT ROWID''')
+    backfill_signatures(conn)
+
+
+def _migrate_text_features(conn):
+    """Write-time features of journal entries and chat questions."""
+    from therabot_features import backfill_features
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS text_features (
+        source TEXT,
+        source_id INTEGER,
+        user_id INTEGER,
+        date INTEGER,
+        token_count INTEGER,
+        sentiment REAL,
+        theme_mask INTEGER,
+        crisis INTEGER,
+        trauma INTEGER,
+        version TEXT,
+        PRIMARY KEY (source, source_id)) WITHOUT ROWID''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_text_features_user_source_date
+                    ON text_features (user_id, source, date)''')
+    backfill_features(conn)
+
+
+def _migrate_data_imports(conn):
+    """Progress of each user data import, so an interrupted import resumes where it stopped."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS data_imports (
+        import_key TEXT,
+        user_id INTEGER,
+        position_table TEXT,
+        position_id INTEGER,
+        rows INTEGER,
+        completed INTEGER,
+        started_at INTEGER,
+        updated_at INTEGER,
+        PRIMARY KEY (import_key, user_id))''')
+
+
+def _migrate_pcl5_scale(conn):
+    """Rescale legacy PCL-5 totals from the old 1-5 item scale to the published 0-4 one.
+
+    The old form always answered all 20 items, so its totals run 20-100 and
+    subtracting 20 gives the 0-4 total. Totals saved since migration 6 come
+    with a PCL-5 assessment_responses row a moment apart and are already 0-4.
+    """
+    conn.execute('''UPDATE trauma_assessments SET pcl5_score = pcl5_score - 20
+                    WHERE pcl5_score BETWEEN 20 AND 100
+                      AND NOT EXISTS (SELECT 1 FROM assessment_responses r
+                                      WHERE r.user_id = trauma_assessments.user_id
+                                        AND r.instrument = 'PCL-5'
+                                        AND r.date BETWEEN trauma_assessments.date - 60
+                                                       AND trauma_assessments.date + 60)''')
+
+
+# (version, description, function) -- append new migrations, never edit old ones
+MIGRATIONS = [
+    (1, "base schema", _migrate_base_schema),
+    (2, "integer unix-second dates on tracking tables", _migrate_integer_dates),
+    (3, "composite (user_id, date) indexes", _migrate_user_date_indexes),
+    (4, "daily mood, sentiment and self-care rollups", _migrate_daily_rollups),
+    (5, "chat sessions and per-session turn index", _migrate_chat_sessions),
+    (6, "item-level assessment responses", _migrate_assessment_responses),
+    (7, "full-text journal search", _migrate_journal_search),
+    (8, "journal term counts for themes", _migrate_journal_terms),
+    (9, "journal similarity index", _migrate_journal_similarity),
+    (10, "text features for journal entries and chat turns", _migrate_text_features),
+    (11, "resumable user data imports", _migrate_data_imports),
+    (12, "PCL-5 totals on the 0-4 item scale", _migrate_pcl5_scale),
+]
+
+
+def schema_version(conn):
+    """Highest applied migration, or 0 for a database that has never been migrated."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone()
+    if not exists:
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def pending_migrations(conn):
+    current = schema_version(conn)
+    return [m for m in MIGRATIONS if m[0] > current]
+
+
+def migrate(pool=None):
+    """Apply pending migrations, each in its own transaction. Returns versions applied."""
+    pool = pool or get_pool()
+    applied = []
+    with pool.connection() as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at INTEGER)''')
+        conn.commit()
+        for version, description, apply in pending_migrations(conn):
+            conn.execute('BEGIN IMMEDIATE')
+            # Another process may have applied it while we waited for the lock
+            if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                conn.rollback()
+                continue
+            try:
+                apply(conn)
+                conn.execute('INSERT INTO schema_version (version, description, applied_at) VALUES (?,?,?)',
+                             (version, description, now_ts()))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+    return applied
+
+
+def ensure_schema(pool=None):
+    """Cheap check used by the app: migrate only if the database is behind."""
+    pool = pool or get_pool()
+    with pool.connection() as conn:
+        if not pending_migrations(conn):
+            return []
+    return migrate(pool)
+
+
+# Daily rollups
+# Each record_* helper inserts the raw row and folds it into the matching
+# rollup on the same cursor, so both land in one transaction.
+def record_mood(c, user_id, ts, mood, note=None):
+    c.execute('INSERT INTO mood_entries (user_id, date, mood, note) VALUES (?,?,?,?)',
+              (user_id, ts, mood, note))
+    row_id = c.lastrowid
+    c.execute('''INSERT INTO daily_mood (user_id, day, mood_sum, mood_count, mood_min, mood_max)
+                 VALUES (?,?,?,1,?,?)
+                 ON CONFLICT (user_id, day) DO UPDATE SET
+                     mood_sum = mood_sum + excluded.mood_sum,
+                     mood_count = mood_count + 1,
+                     mood_min = MIN(mood_min, excluded.mood_min),
+                     mood_max = MAX(mood_max, excluded.mood_max)''',
+              (user_id, day_key(ts), mood, mood, mood))
+    return row_id
+
+
+def record_journal(c, user_id, ts, entry, sentiment):
+    c.execute('INSERT INTO journal_entries (user_id, date, entry, sentiment) VALUES (?,?,?,?)',
+              (user_id, ts, entry, sentiment))
+    row_id = c.lastrowid
+    c.execute('''INSERT INTO daily_sentiment (user_id, day, sentiment_sum, entry_count)
+                 VALUES (?,?,?,1)
+                 ON CONFLICT (user_id, day) DO UPDATE SET
+                     sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+                     entry_count = entry_count + 1''',
+              (user_id, day_key(ts), sentiment))
+    return row_id
+
+
+def record_self_care(c, user_id, ts, activity, category, duration):
+    c.execute('INSERT INTO self_care_activities (user_id, date, activity, category, duration) VALUES (?,?,?,?,?)',
+              (user_id, ts, activity, category, duration))
+    row_id = c.lastrowid
+    c.execute('''INSERT INTO daily_self_care (user_id, day, category, minutes, activity_count)
+                 VALUES (?,?,?,?,1)
+                 ON CONFLICT (user_id, day, category) DO UPDATE SET
+                     minutes = minutes + excluded.minutes,
+                     activity_count = activity_count + 1''',
+              (user_id, day_key(ts), category, duration))
+    return row_id
+
+
+def backfill_rollups(conn):
+    """Rebuild every rollup table from the raw tracking rows."""
+    conn.execute('DELETE FROM daily_mood')
+    conn.execute(f'''INSERT INTO daily_mood (user_id, day, mood_sum, mood_count, mood_min, mood_max)
+                     SELECT user_id, {DAY_KEY_SQL}, SUM(mood), COUNT(mood), MIN(mood), MAX(mood)
+                     FROM mood_entries WHERE mood IS NOT NULL
+                     GROUP BY user_id, {DAY_KEY_SQL}''')
+    conn.execute('DELETE FROM daily_sentiment')
+    conn.execute(f'''INSERT INTO daily_sentiment (user_id, day, sentiment_sum, entry_count)
+                     SELECT user_id, {DAY_KEY_SQL}, SUM(sentiment), COUNT(sentiment)
+                     FROM journal_entries WHERE sentiment IS NOT NULL
+                     GROUP BY user_id, {DAY_KEY_SQL}''')
+    conn.execute('DELETE FROM daily_self_care')
+    conn.execute(f'''INSERT INTO daily_self_care (user_id, day, category, minutes, activity_count)
+                     SELECT user_id, {DAY_KEY_SQL}, category, COALESCE(SUM(duration), 0), COUNT(*)
+                     FROM self_care_activities
+                     GROUP BY user_id, {DAY_KEY_SQL}, category''')
+
+
+def rebuild_journal_search(conn):
+    """Rebuild the journal full-text index from journal_entries."""
+    conn.execute("INSERT INTO journal_fts (journal_fts) VALUES ('rebuild')")
+
+
+# Process bootstrap
+_bootstrap = None
+
+
+def bootstrap(pool=None):
+    """Bring storage up to date once for this process and record how long it took."""
+    global _bootstrap
+    pool = pool or get_pool()
+    started = time.perf_counter()
+    applied = ensure_schema(pool)
+    with pool.connection() as conn:
+        version = schema_version(conn)
+    _bootstrap = {
+        'schema_version': version,
+        'applied': applied,
+        'seconds': time.perf_counter() - started,
+        'finished_at': now_ts(),
+    }
+    return _bootstrap
+
+
+def bootstrap_info():
+    return _bootstrap
+
+
+def is_ready():
+    """True once this process has bootstrapped storage to the latest schema."""
+    return _bootstrap is not None and _bootstrap['schema_version'] == MIGRATIONS[-1][0]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "migrate"
+    pool = get_pool()
+    if command == "migrate":
+        applied = migrate(pool)
+        print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+    elif command == "backfill-rollups":
+        with pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            backfill_rollups(conn)
+        print("Rebuilt daily rollups")
+    elif command == "rebuild-search":
+        with pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rebuild_journal_search(conn)
+        print("Rebuilt journal search index")
+    elif command == "status":
+        with pool.connection() as conn:
+            print(f"Schema version {schema_version(conn)} of {MIGRATIONS[-1][0]}")
+    else:
+        print("usage: python therabot_db.py [migrate|backfill-rollups|rebuild-search|status]")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
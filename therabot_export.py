@@ -0,0 +1,595 @@
+"""Export and import of one user's full record for In2Grative TheraBot.
+
+Everything a user has logged (moods, journal entries, self-care, assessments
+and AI Therapist turns) streams out as JSON Lines:
+
+    {"type": "header", "format": "therabot-export", "version": 1, "user_id": 7, ...}
+    {"type": "record", "table": "mood_entries", "id": 12, "data": {...}}
+    ...
+    {"type": "checkpoint", "table": "mood_entries", "after": 530, "rows": 500, "sha256": "..."}
+    ...
+    {"type": "end", "rows": 5321}
+
+Tables are read in EXPORT_TABLES order, by id, in ``fetchmany`` batches of
+BATCH_SIZE. Each batch ends with a checkpoint carrying the SHA-256 of that
+batch's record lines, so memory stays at one batch however long the
+history is, and a broken file is caught at the batch where it breaks.
+Checkpoints are also resume points:
+
+- an interrupted export resumes after its last checkpoint
+  (``export --resume``);
+- an import writes each verified batch in one transaction together with
+  its position in ``data_imports``, so re-running the same file skips the
+  batches already stored.
+
+CSV export writes one file per table plus a ``manifest.json`` with row
+counts and checksums, for spreadsheets and clinicians' tools; such a
+directory imports the same way. Text cells that a spreadsheet would read
+as a formula (starting with =, +, -, @, tab or CR) get a leading ``'``,
+as do cells already starting with one, and import strips it again.
+
+The app's download buttons hand Streamlit the whole export as bytes, so
+an in-app download holds the full file in memory; the CLI writes it a
+batch at a time.
+
+Usage::
+
+    python therabot_export.py export USER_ID FILE [--resume]
+    python therabot_export.py export-csv USER_ID DIRECTORY
+    python therabot_export.py import USER_ID FILE|DIRECTORY
+    python therabot_export.py bench
+"""
+import base64
+import binascii
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from therabot_db import db_cursor, now_ts, record_mood, record_self_care
+from therabot_features import record_features
+from therabot_repositories import RECORDS, record_journal_entry
+from therabot_writer import get_writer
+
+FORMAT = "therabot-export"
+FORMAT_VERSION = 1
+BATCH_SIZE = 500
+
+CHAT_COLUMNS = ('date', 'question', 'response', 'therapy_mode', 'session_id', 'turn')
+# table -> exported columns (besides id), in the order tables are exported
+EXPORT_TABLES = {table: RECORDS[table]._fields[1:-1] for table in RECORDS}
+EXPORT_TABLES['ai_therapist_questions'] = CHAT_COLUMNS
+# Columns stored as BLOBs, exported as base64 text
+BLOB_COLUMNS = {('assessment_responses', 'responses')}
+# Every other column but date (always set) holds a number or NULL
+_TEXT_COLUMNS = {'note', 'entry', 'activity', 'category', 'instrument', 'responses',
+                 'question', 'response', 'therapy_mode', 'session_id'}
+_ORDER = {table: i for i, table in enumerate(EXPORT_TABLES)}
+# Leading characters that make a spreadsheet treat a CSV cell as a formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class ExportFormatError(ValueError):
+    """Raised when an export file is malformed, truncated or fails its checksum."""
+
+
+def _line(obj):
+    # One canonical encoding, so checksums computed on either side agree
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(',', ':')) + "\n"
+
+
+def _encode(table, columns, row):
+    data = {}
+    for column, value in zip(columns, row):
+        if (table, column) in BLOB_COLUMNS and value is not None:
+            value = base64.b64encode(value).decode('ascii')
+        data[column] = value
+    return data
+
+
+def _decode(table, data):
+    """The table's columns from an exported ``data`` dict; missing columns are NULL."""
+    decoded = {}
+    for column in EXPORT_TABLES[table]:
+        value = data.get(column)
+        if column == 'date':
+            valid = isinstance(value, int)
+        elif column in _TEXT_COLUMNS:
+            valid = value is None or isinstance(value, str)
+        else:
+            valid = value is None or isinstance(value, (int, float))
+        if not valid or isinstance(value, bool):
+            raise ExportFormatError(f"Bad {column} value in {table}")
+        if (table, column) in BLOB_COLUMNS and value is not None:
+            try:
+                value = base64.b64decode(value, validate=True)
+            except (TypeError, binascii.Error) as e:
+                raise ExportFormatError(f"Bad {column} value in {table}") from e
+        decoded[column] = value
+    return decoded
+
+
+def iter_rows(user_id, table, after=0, batch=BATCH_SIZE, cursor=db_cursor):
+    """Yield lists of (id, *columns) rows for ``user_id`` from ``table`` with id > ``after``."""
+    columns = EXPORT_TABLES[table]
+    with cursor() as c:
+        c.execute(f'''SELECT id, {', '.join(columns)} FROM {table}
+                      WHERE user_id = ? AND id > ? ORDER BY id''', (user_id, after))
+        while True:
+            rows = c.fetchmany(batch)
+            if not rows:
+                return
+            yield rows
+
+
+def export_jsonl(user_id, resume=None, batch=BATCH_SIZE, cursor=db_cursor):
+    """Yield the lines of ``user_id``'s export.
+
+    ``resume`` is the (table, after, rows) of the last checkpoint already
+    written, with the rows written up to it; the header is then not repeated.
+    """
+    if resume is None:
+        yield _line({'type': 'header', 'format': FORMAT, 'version': FORMAT_VERSION, 'user_id': user_id,
+                     'exported_at': now_ts(), 'tables': list(EXPORT_TABLES)})
+        resume_table, resume_after, total = None, 0, 0
+    else:
+        resume_table, resume_after, total = resume
+    for table, columns in EXPORT_TABLES.items():
+        if resume_table is not None and _ORDER[table] < _ORDER[resume_table]:
+            continue
+        after = resume_after if table == resume_table else 0
+        for rows in iter_rows(user_id, table, after, batch, cursor):
+            digest = hashlib.sha256()
+            for row in rows:
+                line = _line({'type': 'record', 'table': table, 'id': row[0],
+                              'data': _encode(table, columns, row[1:])})
+                digest.update(line.encode('utf-8'))
+                yield line
+            total += len(rows)
+            yield _line({'type': 'checkpoint', 'table': table, 'after': rows[-1][0],
+                         'rows': len(rows), 'sha256': digest.hexdigest()})
+    yield _line({'type': 'end', 'rows': total})
+
+
+def resume_point(path):
+    """(resume, size): where to continue a partial export file, and the byte length to keep.
+
+    resume is None when nothing past the header was checkpointed, and
+    'done' when the file is already complete.
+    """
+    resume, keep, offset, rows = None, 0, 0, 0
+    with open(path, 'rb') as f:
+        for raw in f:
+            offset += len(raw)
+            if not raw.endswith(b"\n"):
+                break
+            entry = json.loads(raw)
+            if entry['type'] == 'header':
+                keep = offset
+            elif entry['type'] == 'checkpoint':
+                rows += entry['rows']
+                resume, keep = (entry['table'], entry['after'], rows), offset
+            elif entry['type'] == 'end':
+                return 'done', offset
+    return resume, keep
+
+
+def export_file(user_id, path, resume=False, cursor=db_cursor):
+    """Write ``user_id``'s export to ``path``, continuing a partial file if ``resume``. Returns bytes written."""
+    point, keep = None, 0
+    if resume and os.path.exists(path):
+        point, keep = resume_point(path)
+        if point == 'done':
+            return 0
+        if point is None:
+            # Nothing was checkpointed; start over with a fresh header
+            keep = 0
+    written = 0
+    with open(path, 'r+b' if keep else 'wb') as f:
+        f.seek(keep)
+        f.truncate()
+        for line in export_jsonl(user_id, point, cursor=cursor):
+            data = line.encode('utf-8')
+            f.write(data)
+            written += len(data)
+    return written
+
+
+def _csv_text(value):
+    # Quote would-be formulas with a leading ', and existing leading 's too so import can always strip one
+    if value and value.startswith(_FORMULA_PREFIXES + ("'",)):
+        return "'" + value
+    return value
+
+
+def _csv_unescape(value):
+    return value[1:] if value and value.startswith("'") else value
+
+
+def export_csv(user_id, table, cursor=db_cursor):
+    """Yield ``table`` for ``user_id`` as CSV text, a batch of rows per chunk."""
+    columns = EXPORT_TABLES[table]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('id',) + columns)
+    yield buffer.getvalue()
+    for rows in iter_rows(user_id, table, cursor=cursor):
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            data = _encode(table, columns, row[1:])
+            writer.writerow([row[0]] + [_csv_text(data[column]) if column in _TEXT_COLUMNS else data[column]
+                                        for column in columns])
+        yield buffer.getvalue()
+
+
+def export_csv_dir(user_id, directory, cursor=db_cursor):
+    """One CSV per table plus manifest.json (rows and SHA-256 per file). Returns the manifest."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {'format': FORMAT + "-csv", 'version': FORMAT_VERSION, 'user_id': user_id,
+                'exported_at': now_ts(), 'files': {}}
+    for table in EXPORT_TABLES:
+        digest = hashlib.sha256()
+        with open(os.path.join(directory, f"{table}.csv"), 'w', newline='', encoding='utf-8') as f:
+            for chunk in export_csv(user_id, table, cursor):
+                f.write(chunk)
+                digest.update(chunk.encode('utf-8'))
+        with open(os.path.join(directory, f"{table}.csv"), newline='', encoding='utf-8') as f:
+            rows = sum(1 for _ in csv.reader(f)) - 1
+        manifest['files'][table] = {'file': f"{table}.csv", 'rows': rows, 'sha256': digest.hexdigest()}
+    with open(os.path.join(directory, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def as_bytes(chunks):
+    """Join text ``chunks`` into one UTF-8 bytes object.
+
+    For APIs that need the whole export at once, such as the app's download
+    button. This holds the full export in memory; ``export_file`` is the
+    streaming path.
+    """
+    buffer = io.BytesIO()
+    for chunk in chunks:
+        buffer.write(chunk.encode('utf-8'))
+    return buffer.getvalue()
+
+
+# Import
+def _text_lines(lines):
+    """``lines`` as str; input that isn't UTF-8 raises ExportFormatError."""
+    lines = iter(lines)
+    while True:
+        try:
+            raw = next(lines)
+            line = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+        except StopIteration:
+            return
+        except UnicodeDecodeError as e:
+            raise ExportFormatError("Export is not UTF-8 text") from e
+        yield line
+
+
+def _parse(line):
+    try:
+        entry = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ExportFormatError(f"Not a TheraBot export: bad JSON ({e})") from e
+    if not isinstance(entry, dict):
+        raise ExportFormatError("Not a TheraBot export: expected a JSON object per line")
+    return entry
+
+
+def _fields(entry, what, **types):
+    """``entry``'s values for the keys in ``types``, each checked against its type."""
+    values = []
+    for key, kind in types.items():
+        value = entry.get(key)
+        if not isinstance(value, kind) or isinstance(value, bool):
+            raise ExportFormatError(f"Malformed {what}: missing or invalid {key!r}")
+        values.append(value)
+    return values
+
+
+def _session_id(import_key, user_id, session_id):
+    # Imported chat sessions get fresh ids, stable across resumed runs
+    return hashlib.sha1(f"{import_key}:{user_id}:{session_id}".encode()).hexdigest()[:32]
+
+
+def _insert_turns(c, user_id, import_key, rows):
+    for data in rows:
+        session_id = _session_id(import_key, user_id, data['session_id'])
+        c.execute('''INSERT INTO ai_therapist_questions
+                     (user_id, date, question, response, therapy_mode, session_id, turn)
+                     VALUES (?,?,?,?,?,?,?)''',
+                  (user_id, data['date'], data['question'], data['response'], data['therapy_mode'],
+                   session_id, data['turn']))
+        record_features(c, 'chat', c.lastrowid, user_id, data['date'], data['question'])
+        c.execute('''INSERT INTO chat_sessions (session_id, user_id, started_at, last_active_at, turn_count)
+                     VALUES (?,?,?,?,?)
+                     ON CONFLICT (session_id) DO UPDATE SET
+                         started_at = MIN(started_at, excluded.started_at),
+                         last_active_at = MAX(last_active_at, excluded.last_active_at),
+                         turn_count = MAX(turn_count, excluded.turn_count)''',
+                  (session_id, user_id, data['date'], data['date'], data['turn'] or 0))
+
+
+# Tables whose derived data (rollups, features, themes...) must be kept in step
+IMPORT_WRITERS = {
+    'mood_entries': record_mood,
+    'journal_entries': record_journal_entry,
+    'self_care_activities': record_self_care,
+}
+
+
+def _apply_batch(c, import_key, user_id, table, rows, after):
+    """Insert one verified batch and record how far the import has got, in one transaction."""
+    if table == 'ai_therapist_questions':
+        _insert_turns(c, user_id, import_key, rows)
+    else:
+        columns = EXPORT_TABLES[table]
+        writer = IMPORT_WRITERS.get(table)
+        for data in rows:
+            values = [data.get(column) for column in columns]
+            if writer:
+                writer(c, user_id, *values)
+            else:
+                c.execute(f'''INSERT INTO {table} (user_id, {', '.join(columns)})
+                              VALUES (?, {','.join('?' * len(columns))})''', [user_id] + values)
+    c.execute('''UPDATE data_imports SET position_table = ?, position_id = ?, rows = rows + ?, updated_at = ?
+                 WHERE import_key = ? AND user_id = ?''',
+              (table, after, len(rows), now_ts(), import_key, user_id))
+
+
+def _start_import(import_key, user_id, cursor=db_cursor):
+    """The (table, id) position an import already reached, None if it is new, or 'done'."""
+    with cursor() as c:
+        c.execute('''INSERT OR IGNORE INTO data_imports (import_key, user_id, rows, completed, started_at, updated_at)
+                     VALUES (?,?,0,0,?,?)''', (import_key, user_id, now_ts(), now_ts()))
+        c.execute('SELECT position_table, position_id, completed FROM data_imports WHERE import_key = ? AND user_id = ?',
+                  (import_key, user_id))
+        table, after, completed = c.fetchone()
+    if completed:
+        return 'done'
+    return (table, after) if table is not None else None
+
+
+def _finish_import(c, import_key, user_id):
+    c.execute('UPDATE data_imports SET completed = 1, updated_at = ? WHERE import_key = ? AND user_id = ?',
+              (now_ts(), import_key, user_id))
+
+
+def _is_done(position, table, after):
+    return position is not None and (_ORDER[table], after) <= (_ORDER[position[0]], position[1])
+
+
+def import_jsonl(lines, user_id, writer=None, cursor=db_cursor):
+    """Import an export into ``user_id``'s record, one verified batch at a time.
+
+    ``lines`` is any iterable of lines (str or bytes), such as an open file.
+    Returns the number of rows imported by this call; batches a previous
+    run already stored are skipped.
+    """
+    writer = writer or get_writer()
+    lines = _text_lines(lines)
+    first = next(lines, None)
+    if first is None:
+        raise ExportFormatError("Empty export")
+    header = _parse(first)
+    if header.get('type') != 'header' or header.get('format') != FORMAT:
+        raise ExportFormatError("Not a TheraBot export")
+    if header.get('version') != FORMAT_VERSION:
+        raise ExportFormatError(f"Unsupported export version {header.get('version')}")
+    import_key = hashlib.sha256(first.encode('utf-8')).hexdigest()[:32]
+    position = _start_import(import_key, user_id, cursor)
+    if position == 'done':
+        return 0
+
+    imported = seen = 0
+    pending = []
+    digest = hashlib.sha256()
+    for line in lines:
+        if not line.strip():
+            continue
+        if not line.endswith("\n"):
+            raise ExportFormatError("Export ends mid-line; it was cut off")
+        entry = _parse(line)
+        kind = entry.get('type')
+        if kind == 'record':
+            table, data = _fields(entry, "record", table=str, data=dict)
+            if table not in EXPORT_TABLES:
+                raise ExportFormatError(f"Unknown table {table!r}")
+            digest.update(line.encode('utf-8'))
+            pending.append((table, data))
+        elif kind == 'checkpoint':
+            table, after, rows, sha256 = _fields(entry, "checkpoint", table=str, after=int, rows=int, sha256=str)
+            if table not in EXPORT_TABLES:
+                raise ExportFormatError(f"Unknown table {table!r}")
+            if digest.hexdigest() != sha256 or len(pending) != rows:
+                raise ExportFormatError(f"Checksum mismatch in {table} batch ending at id {after}")
+            if any(record_table != table for record_table, _ in pending):
+                raise ExportFormatError(f"Batch ending at {table} id {after} mixes tables")
+            seen += len(pending)
+            if not _is_done(position, table, after):
+                rows = [_decode(table, data) for _, data in pending]
+                writer.write(_apply_batch, import_key, user_id, table, rows, after, wait=True)
+                imported += len(rows)
+            pending = []
+            digest = hashlib.sha256()
+        elif kind == 'end':
+            rows, = _fields(entry, "end line", rows=int)
+            if pending:
+                raise ExportFormatError("Records after the last checkpoint")
+            if rows != seen:
+                raise ExportFormatError(f"Export lists {rows} rows but contains {seen}")
+            writer.write(_finish_import, import_key, user_id, wait=True)
+            return imported
+        else:
+            raise ExportFormatError(f"Unknown line type {kind!r}")
+    raise ExportFormatError(f"Export is truncated; {imported} rows were imported and a re-run will resume")
+
+
+def import_csv_dir(directory, user_id, writer=None, cursor=db_cursor, batch=BATCH_SIZE):
+    """Import a directory written by export_csv_dir. Returns the number of rows imported."""
+    writer = writer or get_writer()
+    path = os.path.join(directory, "manifest.json")
+    try:
+        with open(path, 'rb') as f:
+            manifest_bytes = f.read()
+    except FileNotFoundError as e:
+        raise ExportFormatError("Not a TheraBot CSV export: no manifest.json") from e
+    try:
+        manifest = _parse(manifest_bytes.decode('utf-8'))
+    except UnicodeDecodeError as e:
+        raise ExportFormatError("manifest.json is not UTF-8 text") from e
+    if manifest.get('format') != FORMAT + "-csv":
+        raise ExportFormatError("Not a TheraBot CSV export")
+    files, = _fields(manifest, "manifest", files=dict)
+    # Verify every file before writing anything
+    for table, info in files.items():
+        if table not in EXPORT_TABLES or not isinstance(info, dict):
+            raise ExportFormatError(f"Unknown table {table!r} in manifest")
+        name, sha256 = _fields(info, f"manifest entry for {table}", file=str, sha256=str)
+        # Only plain file names, so a manifest can't point outside the export
+        if os.path.basename(name) != name:
+            raise ExportFormatError(f"Bad file name {name!r} in manifest")
+        digest = hashlib.sha256()
+        try:
+            with open(os.path.join(directory, name), 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 16), b''):
+                    digest.update(chunk)
+        except FileNotFoundError as e:
+            raise ExportFormatError(f"{name} is listed in the manifest but missing") from e
+        if digest.hexdigest() != sha256:
+            raise ExportFormatError(f"Checksum mismatch in {name}")
+
+    import_key = hashlib.sha256(manifest_bytes).hexdigest()[:32]
+    position = _start_import(import_key, user_id, cursor)
+    if position == 'done':
+        return 0
+    imported = 0
+    for table in EXPORT_TABLES:
+        info = files.get(table)
+        if info is None:
+            continue
+        columns = EXPORT_TABLES[table]
+        with open(os.path.join(directory, info['file']), newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            pending = []
+            try:
+                for row in reader:
+                    pending.append(row)
+                    if len(pending) == batch:
+                        imported += _import_csv_batch(writer, import_key, user_id, table, columns, pending, position)
+                        pending = []
+            except (UnicodeDecodeError, csv.Error) as e:
+                raise ExportFormatError(f"{info['file']} is not a readable CSV file") from e
+            if pending:
+                imported += _import_csv_batch(writer, import_key, user_id, table, columns, pending, position)
+    writer.write(_finish_import, import_key, user_id, wait=True)
+    return imported
+
+
+def _csv_value(value):
+    # CSV has no types: empty is NULL, and numbers come back as numbers
+    if value == '':
+        return None
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _import_csv_batch(writer, import_key, user_id, table, columns, rows, position):
+    try:
+        after = int(rows[-1]['id'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ExportFormatError(f"Bad or missing id in {table}.csv") from e
+    if _is_done(position, table, after):
+        return 0
+    records = [_decode(table, {column: _csv_unescape(row.get(column) or None) if column in _TEXT_COLUMNS
+                                       else _csv_value(row.get(column) or '')
+                               for column in columns})
+               for row in rows]
+    writer.write(_apply_batch, import_key, user_id, table, records, after, wait=True)
+    return len(records)
+
+
+def benchmark(sizes=(10000, 100000)):
+    """Export and re-import synthetic users of growing size; reports throughput and peak Python memory."""
+    import tracemalloc
+
+    from therabot_db import ConnectionPool, migrate
+    from therabot_writer import GroupCommitWriter
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"))
+        migrate(pool)
+        writer = GroupCommitWriter(pool)
+        for user_id, size in enumerate(sizes, 1):
+            with pool.connection() as conn:
+                conn.executemany('INSERT INTO mood_entries (user_id, date, mood, note) VALUES (?,?,?,?)',
+                                 [(user_id, 1_600_000_000 + i * 60, i % 11, f"note {i}") for i in range(size)])
+            path = os.path.join(tmp, f"user{user_id}.jsonl")
+            tracemalloc.start()
+            started = time.perf_counter()
+            export_file(user_id, path, cursor=pool.cursor)
+            export_s = time.perf_counter() - started
+            export_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            with open(path, encoding='utf-8') as f:
+                imported = import_jsonl(f, 1000 + user_id, writer=writer, cursor=pool.cursor)
+            import_s = time.perf_counter() - started
+            import_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append({'rows': size, 'imported': imported, 'bytes': os.path.getsize(path),
+                            'export_rows_s': size / export_s, 'import_rows_s': size / import_s,
+                            'export_peak_kb': export_peak / 1024, 'import_peak_kb': import_peak / 1024})
+        writer.stop()
+        pool.close()
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else None
+    if command == "export" and len(argv) >= 3:
+        written = export_file(int(argv[1]), argv[2], resume="--resume" in argv)
+        print(f"Wrote {written} bytes to {argv[2]}" if written else f"{argv[2]} is already complete")
+        return 0
+    if command == "export-csv" and len(argv) == 3:
+        manifest = export_csv_dir(int(argv[1]), argv[2])
+        print(f"Wrote {sum(f['rows'] for f in manifest['files'].values())} rows to {argv[2]}")
+        return 0
+    if command == "import" and len(argv) == 3:
+        if os.path.isdir(argv[2]):
+            imported = import_csv_dir(argv[2], int(argv[1]))
+        else:
+            with open(argv[2], encoding='utf-8', newline='') as f:
+                imported = import_jsonl(f, int(argv[1]))
+        get_writer().stop()
+        print(f"Imported {imported} rows")
+        return 0
+    if command == "bench":
+        for r in benchmark():
+            print(f"{r['rows']} rows ({r['bytes'] / 1e6:.1f} MB): export {r['export_rows_s']:.0f} rows/s "
+                  f"(peak {r['export_peak_kb']:.0f} KB), import {r['import_rows_s']:.0f} rows/s "
+                  f"(peak {r['import_peak_kb']:.0f} KB)")
+        return 0
+    print("usage: python therabot_export.py [export USER_ID FILE [--resume] | export-csv USER_ID DIRECTORY"
+          " | import USER_ID FILE|DIRECTORY | bench]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""Precomputed text features for journal entries and chat turns.
+
+Pages used to re-read raw journal text and re-derive sentiment and keyword
+themes on every render. Now each journal entry and each chat question gets
+one ``text_features`` row when it is saved, in the same transaction:
+
+- ``token_count``: words, as the sentiment engine counts them,
+- ``sentiment``: the sentiment engine's score,
+- ``theme_mask``: one bit per label in FEATURE_GROUPS (see LABELS),
+- ``crisis`` / ``trauma``: whether any crisis or trauma keyword matched,
+- ``version``: the sentiment lexicon and keyword sets the row was built with.
+
+Read paths use ``recent_features`` and the helpers below instead of the
+text. When the lexicon or keywords change, ``python therabot_features.py
+backfill`` recomputes the rows whose version is out of date, a chunk at a
+time with vectorized pandas string operations.
+"""
+import hashlib
+import random
+import re
+import sys
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from therabot_db import db_cursor
+from therabot_keywords import KEYWORD_SETS, keyword_matcher
+from therabot_sentiment import sentiment_engine
+
+SOURCES = ('journal', 'chat')
+# source -> (table, text column)
+SOURCE_TABLES = {
+    'journal': ('journal_entries', 'entry'),
+    'chat': ('ai_therapist_questions', 'question'),
+}
+# Keyword groups packed into theme_mask. Topic labels come from the response
+# catalog and can grow without bound, so they are matched live instead
+FEATURE_GROUPS = ('theme', 'journal')
+LABELS = [(group, name) for group in FEATURE_GROUPS for name in KEYWORD_SETS[group]]
+_BITS = {label: 1 << i for i, label in enumerate(LABELS)}
+# Labels that set the trauma flag besides the 'trauma' group itself
+TRAUMA_LABELS = [label for label in LABELS if label[1] == 'trauma']
+
+KEYWORDS_VERSION = "kw-" + hashlib.sha1(repr(sorted(
+    (group, name, sorted(KEYWORD_SETS[group][name]))
+    for group in (*FEATURE_GROUPS, 'crisis', 'trauma') for name in KEYWORD_SETS[group]
+)).encode()).hexdigest()[:8]
+VERSION = f"{sentiment_engine.version}/{KEYWORDS_VERSION}"
+
+TextFeatures = namedtuple('TextFeatures', 'source source_id user_id date token_count sentiment theme_mask crisis trauma version')
+
+_WORD_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+def extract_features(text, sentiment=None):
+    """(token_count, sentiment, theme_mask, crisis, trauma) for one text.
+
+    Pass ``sentiment`` when the caller already scored the text.
+    """
+    text = text or ""
+    hits = keyword_matcher.scan(text)
+    mask = 0
+    for group in FEATURE_GROUPS:
+        for name in hits.names(group):
+            mask |= _BITS[group, name]
+    trauma = hits.has('trauma') or any(hits.has(*label) for label in TRAUMA_LABELS)
+    score = sentiment_engine.score(text) if sentiment is None else sentiment
+    return len(_WORD_RE.findall(text.lower())), score, mask, int(hits.has('crisis')), int(trauma)
+
+
+def record_features(c, source, source_id, user_id, ts, text, sentiment=None):
+    """Store the features of one saved journal entry or chat question."""
+    c.execute('''INSERT OR REPLACE INTO text_features
+                 (source, source_id, user_id, date, token_count, sentiment, theme_mask, crisis, trauma, version)
+                 VALUES (?,?,?,?,?,?,?,?,?,?)''',
+              (source, source_id, user_id, ts, *extract_features(text, sentiment), VERSION))
+
+
+def recent_features(user_id, source='journal', limit=5, cursor=db_cursor):
+    """Features of ``user_id``'s newest ``limit`` items from ``source``, newest first."""
+    with cursor() as c:
+        c.execute(f'''SELECT {', '.join(TextFeatures._fields)} FROM text_features
+                      WHERE user_id = ? AND source = ? ORDER BY date DESC, source_id DESC LIMIT ?''',
+                  (user_id, source, limit))
+        return [TextFeatures(*row) for row in c.fetchall()]
+
+
+def stored_features(source, source_id, cursor=db_cursor):
+    """The features row saved with one journal entry or chat question, or None."""
+    with cursor() as c:
+        c.execute(f'''SELECT {', '.join(TextFeatures._fields)} FROM text_features
+                      WHERE source = ? AND source_id = ?''', (source, source_id))
+        row = c.fetchone()
+    return TextFeatures(*row) if row else None
+
+
+def label_names(mask, group):
+    """Names in ``group`` whose bit is set in ``mask``."""
+    return {name for (g, name), bit in _BITS.items() if g == group and mask & bit}
+
+
+def has_label(mask, group, name):
+    return bool(mask & _BITS[group, name])
+
+
+def combined_mask(features):
+    mask = 0
+    for f in features:
+        mask |= f.theme_mask
+    return mask
+
+
+def combined_sentiment(features):
+    """Sentiment of several texts taken together: their scores weighted by length."""
+    words = sum(f.token_count for f in features)
+    if not words:
+        return 0.0
+    return sum(f.sentiment * f.token_count for f in features) / words
+
+
+# Backfill
+def _phrase_pattern(phrases):
+    # Same rule as the keyword matcher: a phrase only matches where a word starts
+    return r"(?<![^\W_])(?:" + "|".join(re.escape(p.lower()) for p in phrases) + ")"
+
+
+def extract_frame(texts, sentiments=None):
+    """Vectorized ``extract_features`` over a Series of texts; returns a DataFrame of feature columns."""
+    lowered = texts.fillna("").str.lower()
+    frame = pd.DataFrame(index=texts.index)
+    frame['token_count'] = lowered.str.count(_WORD_RE.pattern)
+    frame['sentiment'] = (sentiment_engine.score_many(texts.fillna("")) if sentiments is None
+                          else sentiments)
+    mask = pd.Series(0, index=texts.index, dtype='int64')
+    trauma = lowered.str.contains(_phrase_pattern(
+        [p for phrases in KEYWORD_SETS['trauma'].values() for p in phrases]))
+    for (group, name), bit in _BITS.items():
+        matched = lowered.str.contains(_phrase_pattern(KEYWORD_SETS[group][name]))
+        mask = mask | (matched.astype('int64') * bit)
+        if (group, name) in TRAUMA_LABELS:
+            trauma = trauma | matched
+    frame['theme_mask'] = mask
+    frame['crisis'] = lowered.str.contains(_phrase_pattern(
+        [p for phrases in KEYWORD_SETS['crisis'].values() for p in phrases])).astype(int)
+    frame['trauma'] = trauma.astype(int)
+    return frame
+
+
+def backfill_features(conn, sources=SOURCES, stale_only=True, batch=5000):
+    """Recompute feature rows, by default only missing ones or ones built with another VERSION.
+
+    Returns the number of rows written.
+    """
+    written = 0
+    for source in sources:
+        table, column = SOURCE_TABLES[source]
+        sql = f'''SELECT t.id, t.user_id, t.date, t.{column} FROM {table} t
+                  LEFT JOIN text_features f ON f.source = ? AND f.source_id = t.id'''
+        if stale_only:
+            sql += " WHERE f.version IS NULL OR f.version != ?"
+        rows = conn.execute(sql, (source, VERSION) if stale_only else (source,))
+        while True:
+            chunk = rows.fetchmany(batch)
+            if not chunk:
+                break
+            frame = pd.DataFrame(chunk, columns=['source_id', 'user_id', 'date', 'text'])
+            frame = frame.join(extract_frame(frame['text']))
+            frame['source'] = source
+            frame['version'] = VERSION
+            conn.executemany(f'''INSERT OR REPLACE INTO text_features ({', '.join(TextFeatures._fields)})
+                                 VALUES ({','.join('?' * len(TextFeatures._fields))})''',
+                             frame[list(TextFeatures._fields)].itertuples(index=False, name=None))
+            written += len(frame)
+    return written
+
+
+def benchmark(entries=20000, words_per_entry=120, reads=2000, seed=7):
+    """Time the backfill against a per-row loop, and precomputed reads against re-deriving."""
+    import os
+    import tempfile
+
+    from therabot_db import ConnectionPool, migrate, record_journal
+
+    rng = random.Random(seed)
+    vocabulary = [p for group in KEYWORD_SETS.values() for phrases in group.values() for p in phrases]
+    vocabulary += ["today", "walk", "slept", "not", "very", "good", "bad", "work", "friend", "the", "and"] * 20
+    texts = [" ".join(rng.choice(vocabulary) for _ in range(words_per_entry)) for _ in range(entries)]
+    results = {'entries': entries}
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"))
+        migrate(pool)
+        with pool.connection() as conn:
+            for i, text in enumerate(texts):
+                record_journal(conn.cursor(), i % 100, 1_600_000_000 + i * 60, text, 0.0)
+
+        started = time.perf_counter()
+        with pool.connection() as conn:
+            c = conn.cursor()
+            for entry_id, user_id, ts, text in conn.execute('SELECT id, user_id, date, entry FROM journal_entries').fetchall():
+                record_features(c, 'journal', entry_id, user_id, ts, text)
+        results['loop_s'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with pool.connection() as conn:
+            backfill_features(conn, ('journal',), stale_only=False)
+        results['vectorized_s'] = time.perf_counter() - started
+
+        with pool.connection() as conn:
+            stored = {row[0]: row[1:] for row in conn.execute(
+                "SELECT source_id, token_count, sentiment, theme_mask, crisis, trauma FROM text_features")}
+        results['mismatches'] = sum(stored[i + 1] != extract_features(text) for i, text in enumerate(texts))
+
+        started = time.perf_counter()
+        for i in range(reads):
+            combined_sentiment(recent_features(i % 100, limit=5, cursor=pool.cursor))
+        results['features_read_us'] = (time.perf_counter() - started) / reads * 1e6
+
+        started = time.perf_counter()
+        for i in range(reads):
+            with pool.cursor() as c:
+                c.execute('SELECT entry FROM journal_entries WHERE user_id = ? ORDER BY date DESC LIMIT 5', (i % 100,))
+                text = " ".join(row[0] for row in c.fetchall())
+            sentiment_engine.score(text)
+            keyword_matcher.scan(text)
+        results['rederive_read_us'] = (time.perf_counter() - started) / reads * 1e6
+        pool.close()
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["backfill"]:
+        from therabot_db import get_pool
+
+        with get_pool().connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            written = backfill_features(conn, stale_only="--all" not in argv)
+        print(f"Recomputed features for {written} rows (version {VERSION})")
+        return 0
+    if argv[:1] == ["bench"]:
+        r = benchmark()
+        print(f"{r['entries']} entries: backfill {r['vectorized_s']:.2f} s vectorized vs {r['loop_s']:.2f} s "
+              f"row by row ({r['mismatches']} mismatches); last-5 sentiment {r['features_read_us']:.0f} us "
+              f"from features vs {r['rederive_read_us']:.0f} us re-deriving")
+        return 0
+    print("usage: python therabot_features.py [backfill [--all]|bench]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
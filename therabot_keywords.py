@@ -0,0 +1,125 @@
+"""Keyword detection shared by the AI Therapist and the journal.
+
+All crisis, trauma, topic and theme phrases are compiled once at import into
+a single Aho-Corasick automaton, so a message is scanned in one pass no
+matter how many phrases are registered. A phrase only matches where a word
+starts ("trigger" matches "triggered", "love" does not match "glove").
+"""
+from collections import deque, namedtuple
+
+from therabot_responses import response_catalog
+
+Match = namedtuple('Match', 'group name keyword start end')
+
+# group -> name -> phrases
+KEYWORD_SETS = {
+    'crisis': {
+        'crisis': ["suicide", "kill myself", "end my life", "self-harm", "hurting myself"],
+    },
+    'trauma': {
+        'trauma': ["trauma", "ptsd", "flashback", "trigger", "memory"],
+    },
+    # Every topic in the response catalog, so new catalog topics are detected too
+    'topic': {
+        topic: sorted({topic, topic.replace('_', ' ')}) for topic in response_catalog.topics()
+    },
+    'theme': {
+        'relationships': ['friend', 'partner', 'family', 'relationship', 'love', 'argue'],
+        'work': ['work', 'job', 'career', 'boss', 'colleague'],
+        'trauma': ['trauma', 'trigger', 'memory', 'flashback', 'ptsd'],
+        'anxiety': ['anxious', 'worry', 'fear', 'panic', 'nervous'],
+        'achievement': ['accomplish', 'proud', 'success', 'achievement', 'goal'],
+    },
+    'journal': {
+        'military': ['service', 'military'],
+        'first_response': ['shift', 'call'],
+        'trauma': ['trauma', 'ptsd', 'trigger'],
+    },
+}
+
+
+class KeywordHits:
+    """Result of one scan: every match plus a group -> matched names index."""
+
+    def __init__(self, matches):
+        self.matches = matches
+        self._names = {}
+        for match in matches:
+            self._names.setdefault(match.group, set()).add(match.name)
+
+    def has(self, group, name=None):
+        names = self._names.get(group, ())
+        return bool(names) if name is None else name in names
+
+    def names(self, group):
+        return self._names.get(group, set())
+
+    def __bool__(self):
+        return bool(self.matches)
+
+    def __repr__(self):
+        return f"KeywordHits({self._names!r})"
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over every phrase in ``keyword_sets``."""
+
+    def __init__(self, keyword_sets=KEYWORD_SETS):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._patterns = []
+        for group, names in keyword_sets.items():
+            for name, phrases in names.items():
+                for phrase in phrases:
+                    self._add(phrase.lower(), (group, name, phrase))
+        self._link()
+
+    def _add(self, phrase, label):
+        state = 0
+        for ch in phrase:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state].append(len(self._patterns))
+        self._patterns.append((len(phrase), label))
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Every word-start match in ``text``, as Match tuples with offsets into ``text.lower()``."""
+        text = text.lower()
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern_id in out[state]:
+                length, (group, name, keyword) = patterns[pattern_id]
+                start = i - length + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    matches.append(Match(group, name, keyword, start, i + 1))
+        return matches
+
+    def scan(self, text):
+        return KeywordHits(self.find(text))
+
+
+keyword_matcher = KeywordMatcher()
@@ -0,0 +1,275 @@
+"""Self-care recommendations for In2Grative TheraBot.
+
+The model has two parts:
+
+- a global item-item co-occurrence matrix: how often two activities were
+  done by the same user on the same day, and
+- a per-user affinity row: how often each user has done each activity.
+
+A user's scores are their affinity row projected through the
+cosine-normalized co-occurrence matrix, blended with global popularity so
+new users still get suggestions. The model is built from the full history
+in one vectorized pass with pandas/NumPy, then updated in place as
+activities are logged. User rows are loaded on first use and kept in an
+LRU. Top-k results are cached per user until that user logs something or
+the global model has moved on by STALE_AFTER_UPDATES logs.
+
+Run ``python therabot_recommend.py bench`` for an offline benchmark over
+synthetic users.
+"""
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from therabot_cache import LRUCache
+
+TOP_K = 3
+USER_CACHE_SIZE = 4096
+# Weight of global popularity next to the personal score, both scaled to [0, 1]
+POPULARITY_WEIGHT = 0.15
+# A user's cached top-k is reused until they log something themselves or
+# this many activities have been logged by anyone
+STALE_AFTER_UPDATES = 256
+
+
+def day_number(ts):
+    """Local calendar day of Unix timestamps (scalar or array), for grouping baskets."""
+    return (ts + time.localtime().tm_gmtoff) // 86400
+
+
+class _UserState:
+    __slots__ = ('affinity', 'day', 'basket', 'version')
+
+    def __init__(self, capacity):
+        self.version = 0
+        self.affinity = np.zeros(capacity, np.float32)
+        self.day = None
+        # activity index -> times done on ``day``
+        self.basket = {}
+
+
+class Recommender:
+    """Co-occurrence recommender over activity names.
+
+    ``load_user(user_id)`` returns that user's history as (timestamp, name)
+    pairs; it is called the first time a user is seen.
+    """
+
+    def __init__(self, vocabulary=(), load_user=None, capacity=64):
+        capacity = max(capacity, len(vocabulary))
+        self._names = []
+        self._index = {}
+        self._cooc = np.zeros((capacity, capacity), np.float32)
+        self._popularity = np.zeros(capacity, np.float32)
+        self._allowed = np.zeros(capacity, bool)
+        self._users = LRUCache(USER_CACHE_SIZE)
+        self._results = LRUCache(USER_CACHE_SIZE)
+        self._load_user = load_user
+        self._lock = threading.RLock()
+        self.version = 0
+        for name in vocabulary:
+            self._allowed[self._item(name)] = True
+
+    def _item(self, name):
+        idx = self._index.get(name)
+        if idx is None:
+            idx = len(self._names)
+            if idx >= len(self._popularity):
+                self._grow(idx + 1)
+            self._names.append(name)
+            self._index[name] = idx
+        return idx
+
+    def _grow(self, need):
+        capacity = max(need, 2 * len(self._popularity))
+        extra = capacity - len(self._popularity)
+        self._cooc = np.pad(self._cooc, ((0, extra), (0, extra)))
+        self._popularity = np.pad(self._popularity, (0, extra))
+        self._allowed = np.pad(self._allowed, (0, extra))
+
+    @classmethod
+    def from_history(cls, history, vocabulary=(), load_user=None):
+        """Build the global model from a DataFrame with user_id, date and activity columns."""
+        model = cls(vocabulary, load_user)
+        if history.empty:
+            return model
+        codes = np.fromiter((model._item(name) for name in history['activity']), np.int64, len(history))
+        np.add.at(model._popularity, codes, 1)
+        # A basket is one user's activities on one day
+        baskets = pd.DataFrame({
+            'basket': history.groupby(['user_id', day_number(history['date'])], sort=False).ngroup().to_numpy(),
+            'item': codes,
+        }).drop_duplicates()
+        pairs = baskets.merge(baskets, on='basket')
+        np.add.at(model._cooc, (pairs['item_x'].to_numpy(), pairs['item_y'].to_numpy()), 1)
+        return model
+
+    def _user(self, user_id):
+        state = self._users.get(user_id)
+        if state is None:
+            state = _UserState(len(self._popularity))
+            history = self._load_user(user_id) if self._load_user else ()
+            for ts, name in sorted(history):
+                self._observe_user(state, self._item(name), day_number(ts))
+            self._users.put(user_id, state)
+        elif len(state.affinity) < len(self._popularity):
+            state.affinity = np.pad(state.affinity, (0, len(self._popularity) - len(state.affinity)))
+        return state
+
+    def _observe_user(self, state, idx, day):
+        if len(state.affinity) <= idx:
+            state.affinity = np.pad(state.affinity, (0, len(self._popularity) - len(state.affinity)))
+        state.affinity[idx] += 1
+        state.version += 1
+        if day != state.day:
+            state.day = day
+            state.basket = {}
+        state.basket[idx] = state.basket.get(idx, 0) + 1
+
+    def observe(self, user_id, name, ts):
+        """Fold one logged activity into the model."""
+        with self._lock:
+            idx = self._item(name)
+            day = day_number(ts)
+            self._popularity[idx] += 1
+            loaded = user_id in self._users
+            state = self._user(user_id)
+            # A user loaded just now already has this row from their history
+            if loaded:
+                self._observe_user(state, idx, day)
+            basket = state.basket if state.day == day else {}
+            if basket.get(idx) == 1:
+                others = np.fromiter((i for i in basket if i != idx), np.int64)
+                self._cooc[idx, idx] += 1
+                self._cooc[idx, others] += 1
+                self._cooc[others, idx] += 1
+            self.version += 1
+
+    def scores(self, user_id, ts=None):
+        """Score every known activity for ``user_id``; -inf marks ones not to suggest."""
+        with self._lock:
+            n = len(self._names)
+            state = self._user(user_id)
+            weights = state.affinity[:n]
+            diag = np.sqrt(np.maximum(np.diagonal(self._cooc)[:n], 1))
+            popularity = self._popularity[:n]
+            scores = np.zeros(n, np.float32)
+            done = np.flatnonzero(weights)
+            if done.size:
+                scores = (self._cooc[:n, done] / diag[done]) @ weights[done] / diag
+                if scores.max() > 0:
+                    scores = scores / scores.max()
+            if popularity.max() > 0:
+                scores = scores + POPULARITY_WEIGHT * popularity / popularity.max()
+            scores[~self._allowed[:n]] = -np.inf
+            if ts is not None and state.day == day_number(ts):
+                scores[list(state.basket)] = -np.inf
+            return scores
+
+    def recommend(self, user_id, k=TOP_K, ts=None):
+        """The top ``k`` activity names for ``user_id`` with their scores."""
+        ts = int(time.time()) if ts is None else ts
+        key = (user_id, day_number(ts), k)
+        with self._lock:
+            user_version = self._user(user_id).version
+            cached = self._results.get(key)
+            if (cached is not None and cached[0] == user_version
+                    and self.version - cached[1] < STALE_AFTER_UPDATES):
+                return cached[2]
+            scores = self.scores(user_id, ts)
+            k = min(k, len(scores))
+            if not k:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            result = [(self._names[i], float(scores[i])) for i in top if np.isfinite(scores[i]) and scores[i] > 0]
+            self._results.put(key, (user_version, self.version, result))
+            return result
+
+    def __len__(self):
+        return len(self._names)
+
+
+def synthetic_history(users=2000, activities=300, clusters=12, days=60, seed=7):
+    """Logged activities for users who each favour one cluster of activities."""
+    rng = np.random.default_rng(seed)
+    cluster_of = rng.integers(0, clusters, activities)
+    members = [np.flatnonzero(cluster_of == c) for c in range(clusters)]
+    rows = []
+    start = 1_700_000_000
+    for user in range(users):
+        favourite = members[rng.integers(clusters)]
+        for day in rng.choice(days, size=rng.integers(3, 15), replace=False):
+            for _ in range(rng.integers(1, 4)):
+                pool = favourite if rng.random() < 0.8 else np.arange(activities)
+                rows.append((user, start + int(day) * 86400 + int(rng.integers(0, 3600)), f"activity {rng.choice(pool)}"))
+    return pd.DataFrame(rows, columns=['user_id', 'date', 'activity']).sort_values('date', kind='stable')
+
+
+def benchmark(users=2000, activities=300, k=TOP_K):
+    """Build, update and query a model over synthetic users.
+
+    Holds out each user's last activity and reports hit rate at ``k`` for the
+    model and for a popularity-only baseline.
+    """
+    history = synthetic_history(users, activities)
+    last = history.groupby('user_id').tail(1)
+    train = history.drop(last.index)
+    by_user = {user: list(zip(rows['date'], rows['activity'])) for user, rows in train.groupby('user_id')}
+    vocabulary = [f"activity {i}" for i in range(activities)]
+
+    started = time.perf_counter()
+    model = Recommender.from_history(train, vocabulary, load_user=lambda u: by_user.get(u, ()))
+    build = time.perf_counter() - started
+
+    popular = set(train['activity'].value_counts().index[:k])
+    hits = baseline = 0
+    started = time.perf_counter()
+    for user, ts, activity in last.itertuples(index=False):
+        names = [name for name, _ in model.recommend(user, k, ts=ts + 86400)]
+        hits += activity in names
+        baseline += activity in popular
+    cold = (time.perf_counter() - started) / len(last)
+
+    started = time.perf_counter()
+    for user, ts, _ in last.itertuples(index=False):
+        model.recommend(user, k, ts=ts + 86400)
+    cached = (time.perf_counter() - started) / len(last)
+
+    started = time.perf_counter()
+    for user, ts, activity in last.itertuples(index=False):
+        model.observe(user, activity, ts)
+    observe = (time.perf_counter() - started) / len(last)
+
+    # Each user just logged something, so this recomputes every top-k
+    started = time.perf_counter()
+    for user, ts, _ in last.itertuples(index=False):
+        model.recommend(user, k, ts=ts + 86400)
+    recommend = (time.perf_counter() - started) / len(last)
+    return {
+        'rows': len(history), 'users': users, 'activities': activities, 'build_ms': build * 1000,
+        'cold_us': cold * 1e6, 'recommend_us': recommend * 1e6, 'cached_us': cached * 1e6,
+        'observe_us': observe * 1e6, 'hit_rate': hits / len(last), 'popularity_hit_rate': baseline / len(last),
+    }
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["bench"]:
+        for users, activities in ((500, 50), (2000, 300), (4000, 1000)):
+            r = benchmark(users, activities)
+            print(f"{r['users']} users, {r['activities']} activities, {r['rows']} logs: "
+                  f"build {r['build_ms']:.0f} ms, first recommend {r['cold_us']:.0f} us, "
+                  f"recommend {r['recommend_us']:.0f} us (cached {r['cached_us']:.1f} us), "
+                  f"observe {r['observe_us']:.0f} us, "
+                  f"hit@{TOP_K} {r['hit_rate']:.1%} vs popularity {r['popularity_hit_rate']:.1%}")
+        return 0
+    print("usage: python therabot_recommend.py bench")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
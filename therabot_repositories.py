@@ -0,0 +1,357 @@
+"""Repositories for the tracking data: moods, journal entries, self-care and assessments.
+
+UI code talks to a repository and never to SQL directly. Each repository
+delegates storage to a backend with two operations, ``insert_many(table,
+records)`` and ``query(table, user_id, ...)``, so the same data path runs
+against:
+
+- ``SQLiteBackend``: the app database, keeping the daily rollups, text
+  features, journal theme counts and similarity index in step through the ``record_*``
+  helpers. Writes go through the group-commit writer, and a batch is
+  written in one transaction.
+- ``MemoryBackend``: per-user lists sorted by date, for tests and benchmarks.
+- ``SheetsMirrorBackend``: any primary backend, with the moods and journal
+  entries of the users in ``THERABOT_SHEETS_USERS`` also queued to the
+  Google Sheets outbox.
+
+``THERABOT_STORAGE`` (sqlite or sheets-mirror) picks the app's backend.
+Dashboards, search, themes and related entries read tables only the SQLite
+backend maintains, so MemoryBackend is not offered there. Run ``python
+therabot_repositories.py bench`` to compare the backends.
+"""
+import bisect
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from therabot_db import db_cursor, format_ts, now_ts, record_journal, record_mood, record_self_care
+from therabot_features import record_features
+from therabot_similarity import record_signature
+from therabot_themes import record_terms, tokenize
+from therabot_writer import get_writer
+
+STORAGE_BACKEND = os.environ.get("THERABOT_STORAGE", "sqlite")
+# Comma-separated user ids whose rows the Sheets mirror copies; nobody else's
+# data leaves the database
+SHEETS_USERS = frozenset(int(u) for u in os.environ.get("THERABOT_SHEETS_USERS", "").split(",") if u.strip())
+
+MoodEntry = namedtuple('MoodEntry', 'user_id date mood note id', defaults=(None, None))
+JournalEntry = namedtuple('JournalEntry', 'user_id date entry sentiment id', defaults=(None,))
+SelfCareActivity = namedtuple('SelfCareActivity', 'user_id date activity category duration id', defaults=(None,))
+Assessment = namedtuple('Assessment', 'user_id date pcl5_score ptsdi_score id', defaults=(None, None, None))
+AssessmentResponse = namedtuple('AssessmentResponse', 'user_id date instrument responses total band id',
+                                defaults=(None,))
+
+# table -> record type; record fields before ``id`` are the table's columns
+RECORDS = {
+    'mood_entries': MoodEntry,
+    'journal_entries': JournalEntry,
+    'self_care_activities': SelfCareActivity,
+    'trauma_assessments': Assessment,
+    'assessment_responses': AssessmentResponse,
+}
+
+
+def record_journal_entry(c, user_id, ts, entry, sentiment):
+    """record_journal plus the entry's features, theme counts and similarity signature.
+
+    The entry is tokenized once for the theme counts and the signature.
+    """
+    row_id = record_journal(c, user_id, ts, entry, sentiment)
+    record_features(c, 'journal', row_id, user_id, ts, entry, sentiment)
+    terms = tokenize(entry or "")
+    record_terms(c, user_id, ts, terms)
+    record_signature(c, row_id, user_id, terms)
+    return row_id
+
+
+# Tables with derived data are written through their record_* helper
+SQLITE_WRITERS = {
+    'mood_entries': record_mood,
+    'journal_entries': record_journal_entry,
+    'self_care_activities': record_self_care,
+}
+
+
+class SQLiteBackend:
+    """Reads through the connection pool; writes through the group-commit writer."""
+
+    name = "sqlite"
+
+    def __init__(self, cursor=db_cursor, writer=None):
+        self._cursor = cursor
+        self._writer = writer
+
+    @staticmethod
+    def _insert(c, table, records):
+        writer = SQLITE_WRITERS.get(table)
+        columns = RECORDS[table]._fields[:-1]
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({','.join('?' * len(columns))})"
+        ids = []
+        for record in records:
+            if writer:
+                ids.append(writer(c, *record[:-1]))
+            else:
+                c.execute(sql, record[:-1])
+                ids.append(c.lastrowid)
+        return ids
+
+    def insert_many(self, table, records, on_commit=None, wait=None):
+        """Insert ``records`` in one transaction and return their new ids.
+
+        In async durability mode the ids are None unless ``wait`` is true;
+        ``on_commit(ids)`` still runs once the rows are committed.
+        """
+        ids = (self._writer or get_writer()).write(self._insert, table, records, on_commit=on_commit, wait=wait)
+        return ids if ids is not None else [None] * len(records)
+
+    def query(self, table, user_id, start=None, end=None, limit=None, newest_first=True):
+        """Records for ``user_id`` with ``start <= date <= end``, by date."""
+        record = RECORDS[table]
+        sql = f"SELECT {', '.join(record._fields)} FROM {table} WHERE user_id = ?"
+        params = [user_id]
+        if start is not None:
+            sql += " AND date >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND date <= ?"
+            params.append(end)
+        sql += " ORDER BY date DESC, id DESC" if newest_first else " ORDER BY date, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._cursor() as c:
+            c.execute(sql, params)
+            return [record(*row) for row in c.fetchall()]
+
+
+class MemoryBackend:
+    """Keeps every record in process memory, per user and sorted by date."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._rows = {}
+        self._ids = {table: itertools.count(1) for table in RECORDS}
+        self._lock = threading.Lock()
+
+    def insert_many(self, table, records, on_commit=None, wait=None):
+        ids = []
+        with self._lock:
+            for record in records:
+                record = record._replace(id=next(self._ids[table]))
+                keys, rows = self._rows.setdefault((table, record.user_id), ([], []))
+                key = (record.date, record.id)
+                at = bisect.bisect(keys, key)
+                keys.insert(at, key)
+                rows.insert(at, record)
+                ids.append(record.id)
+        if on_commit is not None:
+            on_commit(ids)
+        return ids
+
+    def query(self, table, user_id, start=None, end=None, limit=None, newest_first=True):
+        with self._lock:
+            keys, rows = self._rows.get((table, user_id), ([], []))
+            lo = 0 if start is None else bisect.bisect_left(keys, (start,))
+            hi = len(keys) if end is None else bisect.bisect_left(keys, (end + 1,))
+            found = rows[lo:hi]
+        if newest_first:
+            found.reverse()
+        return found[:limit] if limit is not None else found
+
+
+# table -> (worksheet, row builder) for the tables the Sheets mirror copies.
+# The first column is the user id, so rows from different users stay apart
+SHEETS_MIRRORS = {
+    'mood_entries': ("Mood Logs", lambda r: [r.user_id, format_ts(r.date, "%Y-%m-%d %H:%M"), r.mood, r.note or ""]),
+    'journal_entries': ("Journal History", lambda r: [r.user_id, format_ts(r.date, "%Y-%m-%d %H:%M"), r.entry]),
+}
+
+
+class SheetsMirrorBackend:
+    """Writes to ``primary`` and queues mirrored tables to the Sheets outbox; reads from ``primary``.
+
+    Only records of the user ids in ``users`` are mirrored.
+    """
+
+    name = "sheets-mirror"
+
+    def __init__(self, primary, sync, users=SHEETS_USERS, mirrors=SHEETS_MIRRORS):
+        self.primary = primary
+        self.sync = sync
+        self.users = frozenset(users)
+        self.mirrors = mirrors
+
+    def insert_many(self, table, records, on_commit=None, wait=None):
+        ids = self.primary.insert_many(table, records, on_commit, wait)
+        if table in self.mirrors:
+            worksheet, to_row = self.mirrors[table]
+            rows = [to_row(record) for record in records if record.user_id in self.users]
+            if rows:
+                self.sync.enqueue_many(worksheet, rows)
+        return ids
+
+    def query(self, table, user_id, start=None, end=None, limit=None, newest_first=True):
+        return self.primary.query(table, user_id, start, end, limit, newest_first)
+
+
+def make_backend(kind=STORAGE_BACKEND):
+    if kind == "sqlite":
+        return SQLiteBackend()
+    if kind == "sheets-mirror":
+        from therabot_sheets_client import SheetsClient
+        from therabot_sheets_sync import GspreadTransport, SheetsOutbox, SheetsSyncWorker
+
+        client = SheetsClient()
+        sync = SheetsSyncWorker(SheetsOutbox(), GspreadTransport(client.worksheet, client.reset)).start()
+        return SheetsMirrorBackend(SQLiteBackend(), sync)
+    raise ValueError(f"Unknown storage backend: {kind!r}")
+
+
+class Repository:
+    """Batch insert and date-range queries for one table.
+
+    ``on_write(user_id)`` is called for each user a batch touched, once the
+    batch is stored.
+    """
+
+    table = None
+
+    def __init__(self, backend, on_write=None):
+        self.backend = backend
+        self.on_write = on_write
+
+    def add_many(self, records, wait=None):
+        """Store ``records`` in one batch; returns them with their ids filled in.
+
+        Pass ``wait=True`` when the ids are needed even in async durability mode.
+        """
+        records = list(records)
+        on_commit = None
+        if self.on_write is not None:
+            users = {record.user_id for record in records}
+
+            def on_commit(ids):
+                for user_id in users:
+                    self.on_write(user_id)
+        ids = self.backend.insert_many(self.table, records, on_commit, wait)
+        return [record._replace(id=row_id) for record, row_id in zip(records, ids)]
+
+    def recent(self, user_id, limit=5):
+        return self.backend.query(self.table, user_id, limit=limit)
+
+    def between(self, user_id, start, end, newest_first=True):
+        return self.backend.query(self.table, user_id, start, end, newest_first=newest_first)
+
+    def before(self, user_id, ts, limit=1):
+        """The newest records dated strictly before ``ts``."""
+        return self.backend.query(self.table, user_id, end=ts - 1, limit=limit)
+
+
+class MoodRepository(Repository):
+    table = 'mood_entries'
+
+    def add(self, user_id, mood, note=None, ts=None):
+        return self.add_many([MoodEntry(user_id, ts or now_ts(), mood, note)])[0]
+
+
+class JournalRepository(Repository):
+    table = 'journal_entries'
+
+    def add(self, user_id, entry, sentiment, ts=None, wait=None):
+        return self.add_many([JournalEntry(user_id, ts or now_ts(), entry, sentiment)], wait)[0]
+
+
+class SelfCareRepository(Repository):
+    table = 'self_care_activities'
+
+    def add(self, user_id, activity, category, duration, ts=None):
+        return self.add_many([SelfCareActivity(user_id, ts or now_ts(), activity, category, duration)])[0]
+
+
+class AssessmentRepository(Repository):
+    table = 'trauma_assessments'
+
+    def add(self, user_id, pcl5_score=None, ptsdi_score=None, ts=None):
+        return self.add_many([Assessment(user_id, ts or now_ts(), pcl5_score, ptsdi_score)])[0]
+
+
+class AssessmentResponseRepository(Repository):
+    """Item-level answers for any registered instrument, with their score and band.
+
+    ``responses`` is the blob from therabot_assessments.pack_responses.
+    """
+
+    table = 'assessment_responses'
+
+    def add(self, user_id, instrument, responses, total, band, ts=None):
+        record = AssessmentResponse(user_id, ts or now_ts(), instrument, responses, int(total), int(band))
+        return self.add_many([record])[0]
+
+
+class Repositories:
+    """One of each repository over a shared backend."""
+
+    def __init__(self, backend, on_write=None):
+        self.backend = backend
+        self.moods = MoodRepository(backend, on_write)
+        self.journal = JournalRepository(backend, on_write)
+        self.self_care = SelfCareRepository(backend, on_write)
+        self.assessments = AssessmentRepository(backend, on_write)
+        self.assessment_responses = AssessmentResponseRepository(backend, on_write)
+
+
+def benchmark(rows=2000, users=20, batch=100):
+    """Insert ``rows`` moods one at a time and in batches, then query, on each backend.
+
+    Returns [(backend, single_us, batch_us, query_us)] in microseconds per row/query.
+    """
+    import tempfile
+
+    from therabot_db import ConnectionPool, migrate
+    from therabot_writer import GroupCommitWriter
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"))
+        migrate(pool)
+        writer = GroupCommitWriter(pool)
+        for backend in (MemoryBackend(), SQLiteBackend(pool.cursor, writer)):
+            moods = MoodRepository(backend)
+            base = now_ts() - rows
+            started = time.perf_counter()
+            for i in range(rows):
+                moods.add(i % users, i % 11, ts=base + i)
+            single = (time.perf_counter() - started) / rows * 1e6
+            records = [MoodEntry(i % users, base + i, i % 11) for i in range(rows)]
+            started = time.perf_counter()
+            for i in range(0, rows, batch):
+                moods.add_many(records[i:i + batch])
+            batched = (time.perf_counter() - started) / rows * 1e6
+            started = time.perf_counter()
+            for i in range(rows):
+                moods.between(i % users, base + i, base + i + 600)
+            query = (time.perf_counter() - started) / rows * 1e6
+            results.append((backend.name, single, batched, query))
+        writer.stop()
+        pool.close()
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["bench"]:
+        print(f"{'backend':>8} {'single us/row':>14} {'batch us/row':>13} {'query us':>9}")
+        for name, single, batched, query in benchmark():
+            print(f"{name:>8} {single:>14.1f} {batched:>13.1f} {query:>9.1f}")
+        return 0
+    print("usage: python therabot_repositories.py bench")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
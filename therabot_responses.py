@@ -0,0 +1,249 @@
+"""Response catalog for the AI Therapist.
+
+The response texts used to be rebuilt from literals on every call to
+``answer_ai_therapist_question``. They now live here, are indexed once at
+import by (therapy_mode, user_type, topic), and are looked up in O(1) no
+matter how large the catalog grows. Selection takes an explicit
+``random.Random`` so a seeded conversation replays the same responses.
+
+Run ``python therabot_responses.py bench`` to time lookups as the catalog grows.
+"""
+import json
+import random
+import sys
+import time
+
+THERAPY_RESPONSES = {
+    'CBT': {
+        "anxiety": [
+            "I hear how anxious you're feeling about this. What evidence do you have that supports or contradicts these worries?",
+            "Anxiety often makes us overestimate danger. What would you say to a friend who had this worry?",
+            "That sounds really stressful. Can we examine the thoughts behind this anxiety together?"
+        ],
+        "depression": [
+            "I'm sorry you're feeling this way. What negative thoughts come up most often for you?",
+            "Depression can really distort our thinking. Can you identify any patterns in these thoughts?",
+            "That sounds really hard. What would a slightly kinder perspective on this look like?"
+        ],
+        "stress": [
+            "Stress can feel overwhelming. How are you interpreting this situation?",
+            "I hear how stressed you are. What's one small way you might reframe this?",
+            "That sounds like a lot to handle. What thoughts make this feel most stressful?"
+        ]
+    },
+    'ACT': {
+        "anxiety": [
+            "Anxiety is tough. Rather than fighting it, what would it look like to make space for it while still doing what matters?",
+            "I hear that anxiety is present. What valued action could you take even with anxiety coming along?",
+            "What would it feel like to say 'I'm noticing anxiety' rather than 'I am anxious'?"
+        ],
+        "depression": [
+            "Depression can feel heavy. What small step toward something meaningful could you take today?",
+            "Even with depression present, what matters enough to you that you'd do it anyway?",
+            "What would acceptance of these feelings look like right now?"
+        ]
+    },
+    'DBT': {
+        "emotion": [
+            "Emotions can feel intense. What skills might help you ride this wave?",
+            "I hear the emotion in what you're sharing. Would a distress tolerance skill help right now?",
+            "What would wise mind say about this situation?"
+        ]
+    },
+    'IFS': {
+        "part": [
+            "I hear that part of you speaking. Can you describe it with curiosity?",
+            "What does this part need you to know?",
+            "How old does this part feel?"
+        ]
+    },
+    'CPT': {
+        "trauma": [
+            "Trauma memories can feel so present. What stuck points come up when you think about this?",
+            "How has your understanding of this experience changed over time?",
+            "What would challenge the most distressing thought about this memory?"
+        ]
+    },
+    'Somatic': {
+        "body": [
+            "Where do you feel that in your body right now?",
+            "Let's check in with your body. What sensations do you notice?",
+            "How does your body respond when you recall that experience?"
+        ]
+    }
+}
+
+# Specialized responses for different user types
+SPECIALIZED_RESPONSES = {
+    'veteran': {
+        "combat": [
+            "Your service experiences stay with you. How are these memories affecting you today?",
+            "That sounds like it was really difficult. How does it show up for you now?",
+            "Combat leaves deep impressions. What helps you when these memories come up?"
+        ],
+        "transition": [
+            "Transitioning to civilian life brings unique challenges. What aspect feels hardest right now?",
+            "That shift from military to civilian life can be tough. What support do you wish you had?",
+            "What strengths from your service help you navigate this transition?"
+        ]
+    },
+    'first_responder': {
+        "critical_incident": [
+            "The things you see on the job can really stick with you. How is this affecting you?",
+            "That sounds like it was really intense. How are you taking care of yourself after that?",
+            "First responders see so much. What helps you process these experiences?"
+        ],
+        "shift": [
+            "The demands of shift work are real. How are you protecting your sleep and recovery?",
+            "What helps you transition between work mode and home mode?",
+            "How do you decompress after a tough shift?"
+        ]
+    }
+}
+
+# Phrase pools that don't depend on mode or user type
+PHRASES = {
+    'transition': [
+        "I hear you...",
+        "That makes sense...",
+        "I can understand why you'd feel that way...",
+        "Thank you for sharing that...",
+        "Let's explore that together..."
+    ],
+    'specialized_approach': [
+        "how this shows up in your thoughts and feelings",
+        "what values are involved here",
+        "how your body responds when this comes up",
+        "what parts of you get activated"
+    ],
+    'trauma': [
+        "Trauma can affect us in so many ways. How is this showing up for you?",
+        "That sounds really difficult. What helps you feel safe when this comes up?",
+        "I hear the pain in what you're sharing. How does this affect you now?"
+    ],
+    'trauma_approach': [
+        "explore how this memory affects you now",
+        "look at thoughts that keep coming up about this",
+        "notice how your body responds when remembering",
+        "identify parts that hold this experience"
+    ],
+    'general': [
+        "Thank you for sharing that with me. What else comes up as you talk about this?",
+        "I hear what you're saying. How does this make you feel in your body?",
+        "That sounds important. Would you like to explore this further?",
+        "Tell me more about what that's like for you.",
+        "I'm listening. What would be most helpful to focus on right now?"
+    ],
+    'general_approach': [
+        "we might explore your thoughts about this",
+        "it could help to notice how your body responds",
+        "we could examine what values are involved",
+        "we might look at which parts of you are present"
+    ],
+}
+
+
+class ResponseCatalog:
+    """Candidate responses indexed by (therapy_mode, user_type, topic).
+
+    Mode-specific entries use ``user_type=None``, user-type entries use
+    ``therapy_mode=None`` and phrase pools use both as None. Each entry keeps
+    the position it was added in, which breaks ties when several topics in
+    one message match.
+    """
+
+    def __init__(self):
+        self._index = {}
+        self._topics = {}
+
+    def add(self, therapy_mode, user_type, topic, candidates):
+        key = (therapy_mode, user_type, topic)
+        if therapy_mode is not None or user_type is not None:
+            self._topics.setdefault(topic, None)
+        priority = self._index[key][0] if key in self._index else len(self._index)
+        self._index[key] = (priority, tuple(candidates))
+
+    def load(self, therapy_responses=(), specialized_responses=(), phrases=()):
+        for mode, topics in dict(therapy_responses).items():
+            for topic, candidates in topics.items():
+                self.add(mode, None, topic, candidates)
+        for user_type, topics in dict(specialized_responses).items():
+            for topic, candidates in topics.items():
+                self.add(None, user_type, topic, candidates)
+        for kind, candidates in dict(phrases).items():
+            self.add(None, None, kind, candidates)
+        return self
+
+    def load_file(self, path):
+        """Merge a JSON file with optional therapy/specialized/phrases sections."""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return self.load(data.get('therapy', {}), data.get('specialized', {}), data.get('phrases', {}))
+
+    def candidates(self, therapy_mode=None, user_type=None, topic=None):
+        entry = self._index.get((therapy_mode, user_type, topic))
+        return entry[1] if entry else ()
+
+    def phrases(self, kind):
+        return self.candidates(None, None, kind)
+
+    def match_topic(self, topics, therapy_mode=None, user_type=None):
+        """Of the detected ``topics``, the first-registered one with an entry for this mode/user type."""
+        best = None
+        for topic in topics:
+            entry = self._index.get((therapy_mode, user_type, topic))
+            if entry and (best is None or entry[0] < best[0]):
+                best = (entry[0], topic)
+        return best[1] if best else None
+
+    def topics(self):
+        """Every topic name in the catalog, for building keyword detectors."""
+        return list(self._topics)
+
+    def pick(self, candidates, rng=random):
+        return rng.choice(candidates)
+
+    def __len__(self):
+        return len(self._index)
+
+
+def build_default_catalog():
+    return ResponseCatalog().load(THERAPY_RESPONSES, SPECIALIZED_RESPONSES, PHRASES)
+
+
+response_catalog = build_default_catalog()
+
+
+def benchmark(sizes=(10, 1000, 10000, 100000), lookups=20000, seed=7):
+    """Time topic matching plus selection as the catalog grows. Returns [(entries, us_per_lookup)]."""
+    results = []
+    for size in sizes:
+        catalog = build_default_catalog()
+        modes = list(THERAPY_RESPONSES)
+        for i in range(size):
+            catalog.add(modes[i % len(modes)], None, f"topic{i}", [f"response {i}.{j}" for j in range(3)])
+        rng = random.Random(seed)
+        queries = [(rng.choice(modes), [f"topic{rng.randrange(size)}", "anxiety"]) for _ in range(lookups)]
+        started = time.perf_counter()
+        for mode, topics in queries:
+            topic = catalog.match_topic(topics, therapy_mode=mode)
+            if topic:
+                catalog.pick(catalog.candidates(mode, None, topic), rng)
+            catalog.pick(catalog.phrases('transition'), rng)
+        results.append((len(catalog), (time.perf_counter() - started) / lookups * 1e6))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['bench']:
+        print(f"{'catalog entries':>16} {'us/response':>12}")
+        for entries, us in benchmark():
+            print(f"{entries:>16} {us:>12.2f}")
+        return 0
+    print("usage: python therabot_responses.py bench")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
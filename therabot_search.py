@@ -0,0 +1,168 @@
+"""Full-text search over journal entries for In2Grative TheraBot.
+
+Searches run against the ``journal_fts`` FTS5 index (migration 7), which
+triggers keep in step with journal_entries. SQLite does the matching, the
+BM25 ranking and the snippets, so only one page of results ever reaches
+Python, however many entries a user has written.
+
+Pages are fetched with keyset pagination: each page hands back the sort
+key of its last hit, and the next page starts strictly after it, so a
+deep page costs the same as the first.
+
+Run ``python therabot_search.py bench`` to compare the index with loading a
+user's entries and scanning them in Python.
+"""
+import os
+import random
+import re
+import sys
+import time
+from collections import namedtuple
+
+from therabot_db import db_cursor
+
+PAGE_SIZE = 20
+SNIPPET_TOKENS = 16
+HIGHLIGHT = ("**", "**")
+
+SearchHit = namedtuple('SearchHit', 'id date snippet rank')
+# ``next`` is the ``after`` key for the following page, or None on the last page
+SearchPage = namedtuple('SearchPage', 'hits next')
+
+# order -> (sort key, ORDER BY, keyset comparison)
+ORDERS = {
+    'relevance': ("f.rank", "f.rank, j.id", ">"),
+    'newest': ("j.date", "j.date DESC, j.id DESC", "<"),
+    'oldest': ("j.date", "j.date, j.id", ">"),
+}
+
+_TERMS = re.compile(r'"([^"]*)"|(\w+)(\*?)')
+
+
+def fts_query(text):
+    """Turn what a user typed into a safe FTS5 expression, or '' if nothing is searchable.
+
+    Words must all appear (in any form the stemmer folds together),
+    "quoted phrases" must appear as written, and a trailing * matches a prefix.
+    Everything else, including FTS5 operators, is treated as plain text.
+    """
+    parts = []
+    for phrase, word, star in _TERMS.findall(text):
+        if word:
+            parts.append(f'"{word}"{star}')
+        else:
+            words = re.findall(r'\w+', phrase)
+            if words:
+                parts.append('"' + " ".join(words) + '"')
+    return " ".join(parts)
+
+
+def search_journal(user_id, text, start=None, end=None, order='relevance', after=None,
+                   limit=PAGE_SIZE, cursor=db_cursor):
+    """One page of ``user_id``'s journal entries matching ``text``.
+
+    ``start``/``end`` bound the entry date (Unix seconds, inclusive).
+    Pass the previous page's ``next`` as ``after`` to continue.
+    """
+    query = fts_query(text)
+    if not query:
+        return SearchPage([], None)
+    key, order_by, compare = ORDERS[order]
+    sql = f'''SELECT j.id, j.date,
+                     snippet(journal_fts, 0, ?, ?, ' … ', ?),
+                     f.rank, {key}
+              FROM journal_fts f JOIN journal_entries j ON j.id = f.rowid
+              WHERE journal_fts MATCH ?'''
+    params = [*HIGHLIGHT, SNIPPET_TOKENS, f'user_id:"{int(user_id)}" AND entry:({query})']
+    if start is not None:
+        sql += " AND j.date >= ?"
+        params.append(start)
+    if end is not None:
+        sql += " AND j.date <= ?"
+        params.append(end)
+    if after is not None:
+        sql += f" AND ({key}, j.id) {compare} (?, ?)"
+        params.extend(after)
+    sql += f" ORDER BY {order_by} LIMIT ?"
+    # One extra row tells us whether there is another page
+    params.append(limit + 1)
+    with cursor() as c:
+        c.execute(sql, params)
+        rows = c.fetchall()
+    hits = [SearchHit(*row[:4]) for row in rows[:limit]]
+    more = len(rows) > limit
+    return SearchPage(hits, (rows[limit - 1][4], rows[limit - 1][0]) if more else None)
+
+
+WORDS = ("sleep work family anxious calm walk therapy panic friend grateful tired angry hope run "
+         "shift team nightmare coffee morning evening breathing meditation trigger memory service "
+         "deployment call partner kids doctor medication appointment weekend garden music").split()
+
+
+def benchmark(users=50, entries_per_user=2000, words_per_entry=80, queries=200, seed=7):
+    """Build a synthetic journal and time index search against a Python scan.
+
+    Returns a dict of timings; searches are for one user's entries.
+    """
+    import tempfile
+
+    from therabot_db import ConnectionPool, migrate
+
+    rng = random.Random(seed)
+    filler = [f"word{i}" for i in range(5000)]
+    results = {'entries': users * entries_per_user}
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"))
+        migrate(pool)
+        rows = []
+        base = 1_600_000_000
+        for user in range(users):
+            for i in range(entries_per_user):
+                words = [rng.choice(WORDS) if rng.random() < 0.1 else rng.choice(filler)
+                         for _ in range(words_per_entry)]
+                rows.append((user, base + i * 3600, " ".join(words), 0.0))
+        started = time.perf_counter()
+        with pool.connection() as conn:
+            conn.executemany('INSERT INTO journal_entries (user_id, date, entry, sentiment) VALUES (?,?,?,?)', rows)
+        results['insert_us_per_entry'] = (time.perf_counter() - started) / len(rows) * 1e6
+
+        asks = [(rng.randrange(users), " ".join(rng.sample(WORDS, 2))) for _ in range(queries)]
+        started = time.perf_counter()
+        for user, text in asks:
+            page = search_journal(user, text, cursor=pool.cursor)
+        results['search_ms'] = (time.perf_counter() - started) / queries * 1000
+
+        started = time.perf_counter()
+        for user, text in asks:
+            page = search_journal(user, text, cursor=pool.cursor)
+            for _ in range(4):
+                if page.next is None:
+                    break
+                page = search_journal(user, text, after=page.next, cursor=pool.cursor)
+        results['five_pages_ms'] = (time.perf_counter() - started) / queries * 1000
+
+        started = time.perf_counter()
+        for user, text in asks:
+            terms = text.split()
+            with pool.cursor() as c:
+                c.execute('SELECT id, date, entry FROM journal_entries WHERE user_id = ?', (user,))
+                [row for row in c.fetchall() if all(t in row[2].lower().split() for t in terms)]
+        results['scan_ms'] = (time.perf_counter() - started) / queries * 1000
+        pool.close()
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["bench"]:
+        r = benchmark()
+        print(f"{r['entries']} entries, insert with index {r['insert_us_per_entry']:.0f} us/entry")
+        print(f"first page {r['search_ms']:.2f} ms, five pages {r['five_pages_ms']:.2f} ms, "
+              f"load-and-scan {r['scan_ms']:.2f} ms")
+        return 0
+    print("usage: python therabot_search.py bench")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Self-care activity catalog for In2Grative TheraBot.
+
+Activities and guidance text live in ``self_care_catalog.json`` (override
+with THERABOT_SELF_CARE_CATALOG). They are loaded once per process and
+indexed by category, duration bucket and tag, so a filtered query like
+"5 minutes or less, Emotional Care" only touches matching activities,
+however large the catalog gets.
+
+Run ``python therabot_selfcare.py bench`` to time queries against a linear
+scan as the catalog grows.
+"""
+import bisect
+import json
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+CATALOG_PATH = os.environ.get(
+    "THERABOT_SELF_CARE_CATALOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "self_care_catalog.json"))
+
+# (upper bound in minutes, label); None means no upper bound
+DURATION_BUCKETS = ((2, "2 min or less"), (5, "5 min or less"), (15, "15 min or less"),
+                    (30, "30 min or less"), (None, "Over 30 min"))
+
+Activity = namedtuple('Activity', 'id name category tag minutes')
+
+
+def duration_bucket(minutes):
+    for bound, label in DURATION_BUCKETS:
+        if bound is None or minutes <= bound:
+            return label
+
+
+class SelfCareCatalog:
+    """Activities indexed by category, duration bucket and tag, plus guidance text.
+
+    Query results keep catalog order, which is the order activities appear
+    in the data file.
+    """
+
+    def __init__(self, guidance=None):
+        self.activities = []
+        self.guidance = guidance or {}
+        self._by_name = {}
+        self._by_category = {}
+        self._by_bucket = {}
+        self._by_tag = {}
+        # category -> (sorted minutes, ids in the same order), for "at most N minutes"
+        self._by_minutes = {}
+
+    def add(self, name, category, tag, minutes):
+        activity = Activity(len(self.activities), name, category, tag, minutes)
+        self.activities.append(activity)
+        self._by_name.setdefault(name, activity)
+        self._by_category.setdefault(category, []).append(activity.id)
+        self._by_bucket.setdefault(duration_bucket(minutes), set()).add(activity.id)
+        self._by_tag.setdefault(tag, set()).add(activity.id)
+        for key in (category, None):
+            durations, ids = self._by_minutes.setdefault(key, ([], []))
+            at = bisect.bisect(durations, minutes)
+            durations.insert(at, minutes)
+            ids.insert(at, activity.id)
+        return activity
+
+    @classmethod
+    def load_file(cls, path=CATALOG_PATH):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        catalog = cls(data.get('guidance', {}))
+        for category in data.get('categories', []):
+            for activity in category['activities']:
+                catalog.add(activity['name'], category['name'], activity['tag'], activity['minutes'])
+        return catalog
+
+    def named(self, name):
+        """The first activity called ``name``, or None."""
+        return self._by_name.get(name)
+
+    def categories(self):
+        return list(self._by_category)
+
+    def tags(self):
+        return sorted(self._by_tag)
+
+    def query(self, category=None, max_minutes=None, bucket=None, tag=None, limit=None):
+        """Activities matching every given filter."""
+        if max_minutes is not None:
+            durations, ids = self._by_minutes.get(category, ((), ()))
+            selected = set(ids[:bisect.bisect(durations, max_minutes)])
+        elif category is not None:
+            selected = set(self._by_category.get(category, ()))
+        else:
+            selected = None
+        for index, key in ((self._by_bucket, bucket), (self._by_tag, tag)):
+            if key is not None:
+                ids = index.get(key, set())
+                selected = ids.copy() if selected is None else selected & ids
+        if selected is None:
+            found = self.activities
+        else:
+            found = [self.activities[i] for i in sorted(selected)]
+        return found[:limit] if limit is not None else found
+
+    @lru_cache(maxsize=16)
+    def guidance_for(self, user_type, trauma_history):
+        """Guidance blocks shown to this kind of user: {tab: [(kind, text)]}.
+
+        Adjacent text blocks are joined so each one renders with a single call.
+        """
+        audiences = {None, user_type}
+        if user_type == 'veteran' or trauma_history:
+            audiences.add('trauma')
+        tabs = {}
+        for tab, blocks in self.guidance.items():
+            shown = []
+            for block in blocks:
+                if 'subheader' in block:
+                    shown.append(('subheader', block['subheader']))
+                elif block.get('audience') in audiences:
+                    if shown and shown[-1][0] == 'text':
+                        shown[-1] = ('text', shown[-1][1] + "\n\n" + block['text'])
+                    else:
+                        shown.append(('text', block['text']))
+            tabs[tab] = shown
+        return tabs
+
+    def __len__(self):
+        return len(self.activities)
+
+
+self_care_catalog = SelfCareCatalog.load_file()
+
+
+def benchmark(sizes=(30, 1000, 10000, 100000), queries=2000, seed=7):
+    """Time "at most N minutes in a category" queries against a linear scan.
+
+    Returns [(activities, indexed_us, scan_us)] per query.
+    """
+    rng = random.Random(seed)
+    categories = [f"Category {i}" for i in range(20)]
+    results = []
+    for size in sizes:
+        catalog = SelfCareCatalog()
+        for i in range(size):
+            catalog.add(f"Activity {i}", rng.choice(categories), f"tag{i % 50}", rng.randint(1, 60))
+        asks = [(rng.choice(categories), rng.choice((2, 5, 15))) for _ in range(queries)]
+        started = time.perf_counter()
+        for category, minutes in asks:
+            catalog.query(category=category, max_minutes=minutes, limit=50)
+        indexed = (time.perf_counter() - started) / queries * 1e6
+        started = time.perf_counter()
+        for category, minutes in asks:
+            [a for a in catalog.activities if a.category == category and a.minutes <= minutes][:50]
+        scan = (time.perf_counter() - started) / queries * 1e6
+        results.append((size, indexed, scan))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["bench"]:
+        print(f"{'activities':>10} {'indexed us':>11} {'scan us':>9}")
+        for size, indexed, scan in benchmark():
+            print(f"{size:>10} {indexed:>11.1f} {scan:>9.1f}")
+        return 0
+    print("usage: python therabot_selfcare.py bench")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Lexicon-based sentiment scoring for journal entries and chat messages.
+
+Text is tokenized once with a single regex pass and every token is looked up
+in a hash table built when the lexicon is compiled, so the cost per entry
+depends on the entry length, not on the number of lexicon terms. Whole-word
+matching means "badge" no longer counts as "bad".
+
+Scores keep the original scale: summed term weights divided by word count,
+so the +/-0.2 and +/-0.3 thresholds used by the pages still apply.
+
+Run ``python therabot_sentiment.py bench`` to time scoring as the lexicon grows.
+"""
+import csv
+import hashlib
+import os
+import random
+import re
+import sys
+import time
+
+POSITIVE_WORDS = ['happy', 'good', 'great', 'joy', 'excited', 'calm', 'peaceful', 'proud', 'grateful']
+NEGATIVE_WORDS = ['sad', 'bad', 'angry', 'anxious', 'stress', 'depressed', 'trauma', 'triggered', 'fear']
+
+NEGATORS = {'not', 'no', 'never', 'nothing', 'nobody', 'without', 'hardly', 'barely', 'neither', 'nor'}
+NEGATION_WINDOW = 3
+NEGATION_FACTOR = -0.75
+
+INTENSIFIERS = {
+    'very': 1.5, 'really': 1.5, 'so': 1.3, 'extremely': 2.0, 'incredibly': 2.0, 'totally': 1.5,
+    'deeply': 1.5, 'super': 1.5, 'slightly': 0.5, 'somewhat': 0.7, 'little': 0.7, 'kinda': 0.7,
+}
+
+# Inflections added for every lexicon term when it is compiled, so "stressed"
+# and "stressful" match "stress" with a single dictionary lookup
+SUFFIXES = ('s', 'es', 'ed', 'd', 'ing', 'ful', 'ness', 'ly')
+
+# Words and clause boundaries; punctuation ends a negation window
+TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?|[.!?;]")
+BOUNDARIES = frozenset('.!?;')
+
+
+class SentimentEngine:
+    """Compiled lexicon with negation and intensifier handling."""
+
+    def __init__(self, lexicon):
+        self.lexicon = {term.lower(): float(weight) for term, weight in lexicon.items()}
+        self._weights = self._compile(self.lexicon)
+        digest = hashlib.sha1(repr(sorted(self.lexicon.items())).encode()).hexdigest()[:8]
+        self.version = f"lex-{len(self.lexicon)}-{digest}"
+
+    @staticmethod
+    def _compile(lexicon):
+        weights = {}
+        for term, weight in lexicon.items():
+            for suffix in SUFFIXES:
+                weights.setdefault(term + suffix, weight)
+        # Explicit terms always win over generated inflections
+        weights.update(lexicon)
+        return weights
+
+    @classmethod
+    def default(cls):
+        lexicon = {word: 1.0 for word in POSITIVE_WORDS}
+        lexicon.update({word: -1.0 for word in NEGATIVE_WORDS})
+        return cls(lexicon)
+
+    @classmethod
+    def from_file(cls, path, base=None):
+        """Load ``term,weight`` rows from a CSV file on top of an optional base lexicon."""
+        lexicon = dict(base.lexicon) if base else {}
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if len(row) >= 2 and not row[0].startswith('#'):
+                    lexicon[row[0].strip()] = float(row[1])
+        return cls(lexicon)
+
+    def score(self, text):
+        weights = self._weights
+        total = 0.0
+        words = 0
+        negate_left = 0
+        boost = 1.0
+        for token in TOKEN_RE.findall(text.lower()):
+            if token in BOUNDARIES:
+                negate_left = 0
+                boost = 1.0
+                continue
+            words += 1
+            weight = weights.get(token)
+            if weight is not None:
+                weight *= boost
+                if negate_left:
+                    weight *= NEGATION_FACTOR
+                total += weight
+                boost = 1.0
+            elif token in NEGATORS or token.endswith("n't"):
+                negate_left = NEGATION_WINDOW + 1
+            elif token in INTENSIFIERS:
+                boost = INTENSIFIERS[token]
+                # The intensifier itself doesn't use up the negation window
+                negate_left += 1 if negate_left else 0
+            if negate_left:
+                negate_left -= 1
+        return total / max(1, words)
+
+    def score_many(self, texts):
+        """Score a batch of texts, e.g. for backfills or dashboards."""
+        score = self.score
+        return [score(text) for text in texts]
+
+
+def load_default_engine():
+    path = os.environ.get("THERABOT_SENTIMENT_LEXICON")
+    base = SentimentEngine.default()
+    return SentimentEngine.from_file(path, base=base) if path else base
+
+
+sentiment_engine = load_default_engine()
+
+
+# Benchmark
+def _legacy_score(text, positive_words, negative_words):
+    # The substring scan this engine replaced, kept for comparison only
+    score = 0
+    text_lower = text.lower()
+    for word in positive_words:
+        if word in text_lower:
+            score += 1
+    for word in negative_words:
+        if word in text_lower:
+            score -= 1
+    return score / max(1, len(text.split()))
+
+
+def benchmark(lexicon_sizes=(18, 1000, 10000, 50000), entries=500, words_per_entry=150, seed=7):
+    """Time batch scoring as the lexicon grows. Returns [(size, engine_us, legacy_us)]."""
+    rng = random.Random(seed)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz'
+    vocab = POSITIVE_WORDS + NEGATIVE_WORDS + list(NEGATORS) + list(INTENSIFIERS)
+    vocab += [''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 9))) for _ in range(3000)]
+    texts = [' '.join(rng.choice(vocab) for _ in range(words_per_entry)) + '.' for _ in range(entries)]
+
+    results = []
+    for size in lexicon_sizes:
+        lexicon = {word: 1.0 for word in POSITIVE_WORDS}
+        lexicon.update({word: -1.0 for word in NEGATIVE_WORDS})
+        while len(lexicon) < size:
+            term = ''.join(rng.choice(alphabet) for _ in range(rng.randint(4, 10)))
+            lexicon[term] = rng.uniform(-2, 2)
+        engine = SentimentEngine(lexicon)
+
+        started = time.perf_counter()
+        engine.score_many(texts)
+        engine_us = (time.perf_counter() - started) / entries * 1e6
+
+        positive = [t for t, w in lexicon.items() if w > 0]
+        negative = [t for t, w in lexicon.items() if w < 0]
+        sample = texts[:max(1, entries // 10)]
+        started = time.perf_counter()
+        for text in sample:
+            _legacy_score(text, positive, negative)
+        legacy_us = (time.perf_counter() - started) / len(sample) * 1e6
+        results.append((size, engine_us, legacy_us))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['bench']:
+        print(f"{'lexicon terms':>14} {'engine us/entry':>16} {'substring us/entry':>19}")
+        for size, engine_us, legacy_us in benchmark():
+            print(f"{size:>14} {engine_us:>16.1f} {legacy_us:>19.1f}")
+        return 0
+    for text in argv or [sys.stdin.read()]:
+        print(f"{sentiment_engine.score(text):+.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Lazily connected Google Sheets client for In2Grative TheraBot.
+
+The Sheets app used to authorize and open the spreadsheet at import, so
+every Streamlit rerun paid for an OAuth handshake and two worksheet lookups
+before drawing anything. ``SheetsClient`` does no network work (and doesn't
+even import gspread) until a worksheet is first needed, then keeps the
+spreadsheet and worksheet handles for the life of the process. gspread's
+authorized session refreshes the access token itself; after any other
+failure ``reset()`` drops every handle so the next call reconnects from
+scratch.
+
+``FakeWorkbook`` is an in-memory stand-in with the same surface, passed in
+as the ``opener``.
+"""
+import os
+import threading
+import time
+
+SPREADSHEET_URL = os.environ.get(
+    "THERABOT_SHEET_URL",
+    "https://docs.google.com/spreadsheets/d/1wIewM-ehdoZTXB6OgP9vTXWqPhXkLZDfAY8O5w03Ntk")
+CREDENTIALS_FILE = os.environ.get("THERABOT_SHEETS_CREDENTIALS", "therabot-credentials.json")
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+
+class SheetsClient:
+    """Process-wide spreadsheet handle that connects on first use.
+
+    ``opener`` returns a spreadsheet object with ``worksheet(name)`` and
+    ``fetch_sheet_metadata()``; by default it authorizes a service account
+    through gspread.
+    """
+
+    def __init__(self, url=SPREADSHEET_URL, credentials_file=CREDENTIALS_FILE, opener=None):
+        self.url = url
+        self.credentials_file = credentials_file
+        self._opener = opener or self._open_gspread
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._lock = threading.RLock()
+        self.connects = 0
+
+    def _open_gspread(self):
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        creds = ServiceAccountCredentials.from_json_keyfile_name(self.credentials_file, SCOPE)
+        return gspread.authorize(creds).open_by_url(self.url)
+
+    @property
+    def connected(self):
+        return self._spreadsheet is not None
+
+    def spreadsheet(self):
+        with self._lock:
+            if self._spreadsheet is None:
+                self._spreadsheet = self._opener()
+                self.connects += 1
+            return self._spreadsheet
+
+    def worksheet(self, name):
+        with self._lock:
+            spreadsheet = self.spreadsheet()
+            ws = self._worksheets.get(name)
+            if ws is None:
+                ws = self._worksheets[name] = spreadsheet.worksheet(name)
+            return ws
+
+    def reset(self):
+        """Forget the connection and every worksheet handle."""
+        with self._lock:
+            self._spreadsheet = None
+            self._worksheets.clear()
+
+    def health(self, connect=False):
+        """Probe the spreadsheet with a metadata read.
+
+        Without ``connect`` an unconnected client reports its state instead of
+        opening a connection just to check it.
+        """
+        if not self.connected and not connect:
+            return {"ok": None, "connected": False, "latency_ms": None, "error": None}
+        started = time.perf_counter()
+        try:
+            self.spreadsheet().fetch_sheet_metadata()
+        except Exception as e:
+            self.reset()
+            return {"ok": False, "connected": False, "latency_ms": None, "error": str(e)}
+        return {"ok": True, "connected": True,
+                "latency_ms": (time.perf_counter() - started) * 1000, "error": None}
+
+
+class FakeWorksheet:
+    def __init__(self, title):
+        self.title = title
+        self.rows = []
+
+    def append_row(self, row, **kwargs):
+        self.rows.append(list(row))
+
+    def append_rows(self, rows, **kwargs):
+        self.rows.extend(list(row) for row in rows)
+
+    def get_all_values(self):
+        return [list(row) for row in self.rows]
+
+
+class FakeWorkbook:
+    """In-memory spreadsheet; worksheets are created on first access."""
+
+    def __init__(self, titles=()):
+        self.worksheets = {title: FakeWorksheet(title) for title in titles}
+        self.metadata_reads = 0
+
+    def worksheet(self, name):
+        return self.worksheets.setdefault(name, FakeWorksheet(name))
+
+    def fetch_sheet_metadata(self):
+        self.metadata_reads += 1
+        return {"sheets": [{"properties": {"title": title}} for title in self.worksheets]}
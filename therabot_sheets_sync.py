@@ -0,0 +1,364 @@
+"""Background Google Sheets sync for In2Grative TheraBot.
+
+Button handlers used to call ``worksheet.append_row`` directly, so every
+submission waited on a network round-trip and a failed call lost the row.
+Rows are now written to a local SQLite outbox first (one fast local commit)
+and a worker thread drains it to the spreadsheet with one ``append_rows``
+call per worksheet batch. Failed batches stay in the outbox and are retried
+with exponential backoff; rows for a worksheet are always sent in the order
+they were queued. Delivery is at-least-once: a crash between a successful
+append and the outbox delete can resend that batch.
+
+A batch the spreadsheet rejects outright (a malformed request, a worksheet
+that doesn't exist) would fail the same way forever and hold up every row
+behind it. The transport raises ``RowsRejected`` for those, and the worker
+moves the batch to the outbox's dead letters, where ``status()`` reports it.
+
+The spreadsheet side is a transport with a single ``append_rows(worksheet,
+rows)`` method. ``GspreadTransport`` talks to Google; ``FakeSpreadsheet``
+keeps rows in memory and can inject latency and failures.
+
+Run ``python therabot_sheets_sync.py bench`` to compare direct per-row
+appends with the queued writer against a fake spreadsheet.
+"""
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+OUTBOX_PATH = os.environ.get("THERABOT_SHEETS_OUTBOX", "sheets_outbox.db")
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 1.0
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 300.0
+# HTTP statuses that mean the request itself is wrong, so retrying can't help
+REJECTED_STATUS = frozenset({400, 404})
+
+
+class RowsRejected(Exception):
+    """Raised by a transport when the spreadsheet refuses a batch for good."""
+
+
+class SheetsOutbox:
+    """Durable FIFO of rows waiting to be appended to a worksheet."""
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS outbox
+                                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                   worksheet TEXT NOT NULL,
+                                   row TEXT NOT NULL,
+                                   enqueued_at REAL NOT NULL,
+                                   attempts INTEGER NOT NULL DEFAULT 0)''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_worksheet ON outbox (worksheet, id)')
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS dead_letters
+                                  (id INTEGER PRIMARY KEY,
+                                   worksheet TEXT NOT NULL,
+                                   row TEXT NOT NULL,
+                                   enqueued_at REAL NOT NULL,
+                                   attempts INTEGER NOT NULL,
+                                   failed_at REAL NOT NULL,
+                                   error TEXT)''')
+
+    def put(self, worksheet, row):
+        return self.put_many(worksheet, [row])
+
+    def put_many(self, worksheet, rows):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany('INSERT INTO outbox (worksheet, row, enqueued_at) VALUES (?,?,?)',
+                                   [(worksheet, json.dumps(list(row)), now) for row in rows])
+        return len(rows)
+
+    def worksheets(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute('SELECT DISTINCT worksheet FROM outbox')]
+
+    def peek(self, worksheet, limit=BATCH_SIZE):
+        """The oldest ``limit`` rows queued for ``worksheet`` as (ids, rows)."""
+        with self._lock:
+            found = self._conn.execute('SELECT id, row FROM outbox WHERE worksheet = ? ORDER BY id LIMIT ?',
+                                       (worksheet, limit)).fetchall()
+        return [r[0] for r in found], [json.loads(r[1]) for r in found]
+
+    def ack(self, ids):
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany('DELETE FROM outbox WHERE id = ?', [(i,) for i in ids])
+            self._conn.execute('COMMIT')
+
+    def nack(self, ids):
+        with self._lock:
+            self._conn.executemany('UPDATE outbox SET attempts = attempts + 1 WHERE id = ?', [(i,) for i in ids])
+
+    def reject(self, ids, error):
+        """Move rows the spreadsheet refused out of the queue and into dead_letters."""
+        params = [(time.time(), error, i) for i in ids]
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany('''INSERT INTO dead_letters (id, worksheet, row, enqueued_at, attempts, failed_at, error)
+                                      SELECT id, worksheet, row, enqueued_at, attempts + 1, ?, ?
+                                      FROM outbox WHERE id = ?''', params)
+            self._conn.executemany('DELETE FROM outbox WHERE id = ?', [(i,) for i in ids])
+            self._conn.execute('COMMIT')
+
+    def dead_letters(self, limit=100):
+        """The newest rejected rows as (worksheet, row, error)."""
+        with self._lock:
+            found = self._conn.execute('SELECT worksheet, row, error FROM dead_letters ORDER BY id DESC LIMIT ?',
+                                       (limit,)).fetchall()
+        return [(worksheet, json.loads(row), error) for worksheet, row, error in found]
+
+    def pending(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def dead(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM dead_letters').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class GspreadTransport:
+    """Appends rows through gspread. ``open_worksheet(name)`` returns a worksheet handle.
+
+    ``reset`` is called after a failed append so stale handles are reopened
+    on the retry. Errors in REJECTED_STATUS and missing worksheets are raised
+    as RowsRejected.
+    """
+
+    def __init__(self, open_worksheet, reset=None):
+        self.open_worksheet = open_worksheet
+        self.reset = reset
+
+    def append_rows(self, worksheet, rows):
+        try:
+            # RAW stores values exactly as given, as the original append_row did; a note
+            # starting with "=" stays text instead of becoming a formula
+            self.open_worksheet(worksheet).append_rows(rows, value_input_option="RAW")
+        except Exception as e:
+            if self.reset is not None:
+                self.reset()
+            if _rejected(e):
+                raise RowsRejected(str(e)) from e
+            raise
+
+
+def _rejected(error):
+    try:
+        import gspread
+    except ImportError:
+        return False
+    if isinstance(error, gspread.exceptions.WorksheetNotFound):
+        return True
+    return (isinstance(error, gspread.exceptions.APIError)
+            and getattr(error.response, 'status_code', None) in REJECTED_STATUS)
+
+
+class FakeSpreadsheet:
+    """In-memory transport; ``latency`` seconds per call and a ``failure_rate`` chance of raising.
+
+    Appends to a worksheet in ``missing`` are rejected, as if it didn't exist.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None, missing=()):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.missing = set(missing)
+        self.sheets = {}
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def append_rows(self, worksheet, rows):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise ConnectionError("fake spreadsheet: injected failure")
+        if worksheet in self.missing:
+            raise RowsRejected(f"fake spreadsheet: no worksheet {worksheet!r}")
+        with self._lock:
+            self.sheets.setdefault(worksheet, []).extend(list(row) for row in rows)
+
+    def append_row(self, worksheet, row):
+        self.append_rows(worksheet, [row])
+
+
+class SheetsSyncWorker:
+    """Daemon thread that drains a SheetsOutbox into a transport in batches."""
+
+    def __init__(self, outbox, transport, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.outbox = outbox
+        self.transport = transport
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sent_rows = 0
+        self.sent_batches = 0
+        self.failures = 0
+        self.rejected_rows = 0
+        self.last_error = None
+        self._retry_at = {}
+        self._failures_in_row = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._idle = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sheets-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def enqueue(self, worksheet, row):
+        """Queue one row durably and wake the worker; returns without touching the network."""
+        self.outbox.put(worksheet, row)
+        self._wake.set()
+
+    def enqueue_many(self, worksheet, rows):
+        self.outbox.put_many(worksheet, rows)
+        self._wake.set()
+
+    def drain_once(self):
+        """Send at most one batch per worksheet that is not backing off. Returns rows sent."""
+        sent = 0
+        now = time.monotonic()
+        for worksheet in self.outbox.worksheets():
+            if self._retry_at.get(worksheet, 0) > now:
+                continue
+            ids, rows = self.outbox.peek(worksheet, self.batch_size)
+            if not ids:
+                continue
+            try:
+                self.transport.append_rows(worksheet, rows)
+            except RowsRejected as e:
+                # Retrying can't succeed; set the batch aside so the rows behind it can go
+                self.outbox.reject(ids, str(e))
+                self._failures_in_row.pop(worksheet, None)
+                self._retry_at.pop(worksheet, None)
+                self.failures += 1
+                self.rejected_rows += len(ids)
+                self.last_error = f"{worksheet}: {len(ids)} rows rejected: {e}"
+                continue
+            except Exception as e:
+                self.outbox.nack(ids)
+                failures = self._failures_in_row.get(worksheet, 0) + 1
+                self._failures_in_row[worksheet] = failures
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+                self._retry_at[worksheet] = now + delay * random.uniform(0.5, 1.0)
+                self.failures += 1
+                self.last_error = f"{worksheet}: {e}"
+                continue
+            self.outbox.ack(ids)
+            self._failures_in_row.pop(worksheet, None)
+            self._retry_at.pop(worksheet, None)
+            self.sent_rows += len(ids)
+            self.sent_batches += 1
+            sent += len(ids)
+        return sent
+
+    def _run(self):
+        while not self._stop.is_set():
+            sent = self.drain_once()
+            with self._idle:
+                self._idle.notify_all()
+            if sent:
+                continue
+            # Wait for new rows, or for the next backoff to expire
+            timeout = self.flush_interval
+            if self._retry_at:
+                timeout = min(timeout, max(0.0, min(self._retry_at.values()) - time.monotonic()))
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def flush(self, timeout=30.0):
+        """Block until the outbox is empty or ``timeout`` passes. Returns True if drained."""
+        deadline = time.monotonic() + timeout
+        self._wake.set()
+        while self.outbox.pending():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            with self._idle:
+                self._idle.wait(min(remaining, 0.1))
+        return True
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        return {
+            "pending": self.outbox.pending(),
+            "sent_rows": self.sent_rows,
+            "sent_batches": self.sent_batches,
+            "failures": self.failures,
+            "dead_letters": self.outbox.dead(),
+            "last_error": self.last_error,
+        }
+
+
+def benchmark(rows=500, latency=0.05, failure_rate=0.1):
+    """Time direct per-row appends against queued batched appends on a fake spreadsheet.
+
+    Returns {mode: (submit_ms_per_row, total_seconds, transport_calls)}.
+    """
+    import tempfile
+
+    results = {}
+    sheet = FakeSpreadsheet(latency=latency)
+    started = time.perf_counter()
+    for i in range(rows):
+        sheet.append_row("Mood Logs", [f"2024-01-01 00:{i % 60:02d}", i % 11, ""])
+    elapsed = time.perf_counter() - started
+    results["direct"] = (elapsed / rows * 1000, elapsed, sheet.calls)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sheet = FakeSpreadsheet(latency=latency, failure_rate=failure_rate, seed=1)
+        worker = SheetsSyncWorker(SheetsOutbox(os.path.join(tmp, "outbox.db")), sheet,
+                                  backoff_base=latency, backoff_max=latency * 8).start()
+        started = time.perf_counter()
+        for i in range(rows):
+            worker.enqueue("Mood Logs", [f"2024-01-01 00:{i % 60:02d}", i % 11, ""])
+        submitted = time.perf_counter() - started
+        worker.flush(timeout=60)
+        elapsed = time.perf_counter() - started
+        worker.stop()
+        worker.outbox.close()
+        assert len(sheet.sheets["Mood Logs"]) >= rows
+        results["queued"] = (submitted / rows * 1000, elapsed, sheet.calls)
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["bench"]:
+        print(f"{'mode':>8} {'submit ms/row':>14} {'total s':>9} {'API calls':>10}")
+        for mode, (submit_ms, total, calls) in benchmark().items():
+            print(f"{mode:>8} {submit_ms:>14.3f} {total:>9.2f} {calls:>10}")
+        return 0
+    print("usage: python therabot_sheets_sync.py bench")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Related journal entries for In2Grative TheraBot.
+
+Each entry's terms (therabot_themes.tokenize) get a MinHash signature when
+the entry is saved: NUM_PERM hash permutations, keeping the smallest value
+of each, so two signatures agree in a position with probability equal to
+the Jaccard similarity of the two term sets. The signature is cut into
+BANDS bands and each band is hashed into a bucket in ``journal_lsh``.
+Entries that share a bucket with the new text are the candidates; they are
+ranked by how many signature positions agree, and a short list of the best
+is re-ranked by the exact overlap of their terms. Finding related entries is a
+few index lookups per band and never reads a user's whole history.
+
+With 64 bands of 2 rows, entries whose term sets overlap by 10% (Jaccard)
+are candidates about half the time, and by 25% or more almost always;
+short entries rarely overlap by much more than that.
+
+Run ``python therabot_similarity.py bench`` for speed and recall against
+an exact scan.
+"""
+import hashlib
+import random
+import sys
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from therabot_db import db_cursor
+from therabot_themes import synthetic_word, tokenize
+
+NUM_PERM = 128
+BANDS = 64
+ROWS = NUM_PERM // BANDS
+TOP_K = 3
+# Candidates re-ranked by signature agreement; the rest are dropped
+MAX_CANDIDATES = 100
+# The best k * SHORTLIST_FACTOR by signature are re-ranked by exact Jaccard
+SHORTLIST_FACTOR = 10
+# Jaccard below this isn't shown as related
+MIN_SIMILARITY = 0.1
+
+_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+Related = namedtuple('Related', 'id date entry similarity shared')
+
+
+def signature(terms):
+    """MinHash signature (NUM_PERM uint32) of a set of terms, or None for no terms."""
+    terms = set(terms)
+    if not terms:
+        return None
+    hashes = np.fromiter((zlib.crc32(t.encode()) for t in terms), np.uint64, len(terms))
+    # a, b and the hashes are all below 2**32, so a*h + b fits in 64 bits
+    permuted = (hashes[:, None] * _A + _B) % _PRIME
+    return (permuted.min(axis=0) & 0xFFFFFFFF).astype(np.uint32)
+
+
+def buckets(sig):
+    """The LSH bucket of each band of ``sig``, as signed 64-bit ints for SQLite."""
+    rows = sig.reshape(BANDS, ROWS)
+    return [int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), 'little', signed=True)
+            for band in rows]
+
+
+def record_signature(c, entry_id, user_id, terms):
+    """Index one entry's ``terms`` (from tokenize) for related-entry lookups."""
+    sig = signature(terms)
+    if sig is None:
+        return
+    c.execute('INSERT OR REPLACE INTO journal_signatures (entry_id, user_id, signature) VALUES (?,?,?)',
+              (entry_id, user_id, sig.tobytes()))
+    c.executemany('INSERT OR IGNORE INTO journal_lsh (user_id, band, bucket, entry_id) VALUES (?,?,?,?)',
+                  [(user_id, band, bucket, entry_id) for band, bucket in enumerate(buckets(sig))])
+
+
+def backfill_signatures(conn, batch=1000):
+    """Rebuild journal_signatures and journal_lsh from every journal entry."""
+    conn.execute('DELETE FROM journal_signatures')
+    conn.execute('DELETE FROM journal_lsh')
+    rows = conn.execute('SELECT id, user_id, entry FROM journal_entries WHERE entry IS NOT NULL')
+    c = conn.cursor()
+    while True:
+        chunk = rows.fetchmany(batch)
+        if not chunk:
+            break
+        for entry_id, user_id, entry in chunk:
+            record_signature(c, entry_id, user_id, tokenize(entry))
+
+
+def related_entries(user_id, text, k=TOP_K, exclude=(), cursor=db_cursor):
+    """Up to ``k`` of ``user_id``'s past entries most similar to ``text``, best first.
+
+    ``exclude`` holds entry ids to leave out, such as the entry just saved.
+    """
+    terms = set(tokenize(text))
+    sig = signature(terms)
+    if sig is None:
+        return []
+    probe = buckets(sig)
+    with cursor() as c:
+        c.execute(f'''WITH probe (band, bucket) AS (VALUES {','.join(['(?,?)'] * BANDS)})
+                      SELECT l.entry_id FROM probe p
+                      JOIN journal_lsh l ON l.user_id = ? AND l.band = p.band AND l.bucket = p.bucket
+                      GROUP BY l.entry_id ORDER BY COUNT(*) DESC, l.entry_id DESC LIMIT ?''',
+                  [v for band, bucket in enumerate(probe) for v in (band, bucket)]
+                  + [user_id, MAX_CANDIDATES + len(exclude)])
+        candidates = [row[0] for row in c.fetchall() if row[0] not in exclude]
+        if not candidates:
+            return []
+        c.execute(f'''SELECT entry_id, signature FROM journal_signatures
+                      WHERE entry_id IN ({','.join('?' * len(candidates))})''', candidates)
+        found = c.fetchall()
+        ids = np.array([row[0] for row in found])
+        sigs = np.frombuffer(b''.join(row[1] for row in found), np.uint32).reshape(len(found), NUM_PERM)
+        estimate = (sigs == sig).mean(axis=1)
+        shortlist = [int(ids[i]) for i in np.argsort(-estimate, kind='stable')[:k * SHORTLIST_FACTOR]
+                     if estimate[i] >= MIN_SIMILARITY]
+        if not shortlist:
+            return []
+        c.execute(f'''SELECT id, date, entry FROM journal_entries
+                      WHERE id IN ({','.join('?' * len(shortlist))})''', shortlist)
+        rows = c.fetchall()
+    related = []
+    for entry_id, date, entry in rows:
+        other = set(tokenize(entry))
+        shared = terms & other
+        related.append(Related(entry_id, date, entry, len(shared) / len(terms | other), sorted(shared)))
+    related.sort(key=lambda r: (-r.similarity, -r.id))
+    return [r for r in related[:k] if r.similarity >= MIN_SIMILARITY]
+
+
+def benchmark(entries=10000, topics=200, words_per_entry=40, queries=50, k=TOP_K, seed=7):
+    """One user with ``entries`` synthetic entries: LSH lookups vs an exact Jaccard scan.
+
+    Recall is the share of the exact top-``k`` the index also returns;
+    quality is the mean Jaccard of what it returns over that of the exact top-``k``.
+    """
+    import os
+    import tempfile
+
+    from therabot_db import ConnectionPool, migrate, record_journal
+
+    rng = random.Random(seed)
+    topic_words = [[synthetic_word(t * 30 + i) for i in range(30)] for t in range(topics)]
+    common = [synthetic_word(topics * 30 + i) for i in range(2000)]
+
+    def make_entry():
+        words = topic_words[rng.randrange(topics)]
+        return " ".join(rng.choice(words) if rng.random() < 0.6 else rng.choice(common)
+                        for _ in range(words_per_entry))
+
+    results = {'entries': entries}
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"))
+        migrate(pool)
+        texts = [make_entry() for _ in range(entries)]
+        started = time.perf_counter()
+        with pool.connection() as conn:
+            c = conn.cursor()
+            for i, text in enumerate(texts):
+                entry_id = record_journal(c, 1, 1_600_000_000 + i * 3600, text, 0.0)
+                record_signature(c, entry_id, 1, tokenize(text))
+        results['index_us'] = (time.perf_counter() - started) / entries * 1e6
+
+        asks = [make_entry() for _ in range(queries)]
+        started = time.perf_counter()
+        found = [related_entries(1, text, k, cursor=pool.cursor) for text in asks]
+        results['lsh_ms'] = (time.perf_counter() - started) / queries * 1000
+
+        hits = total = 0
+        returned = best = 0.0
+        started = time.perf_counter()
+        for text, got in zip(asks, found):
+            terms = set(tokenize(text))
+            with pool.cursor() as c:
+                c.execute('SELECT id, entry FROM journal_entries WHERE user_id = 1')
+                scored = []
+                for entry_id, entry in c.fetchall():
+                    other = set(tokenize(entry))
+                    scored.append((len(terms & other) / len(terms | other), entry_id))
+            top = sorted(scored, reverse=True)[:k]
+            exact = {entry_id for _, entry_id in top}
+            hits += len(exact & {r.id for r in got})
+            total += len(exact)
+            returned += sum(r.similarity for r in got)
+            best += sum(similarity for similarity, _ in top)
+        results['scan_ms'] = (time.perf_counter() - started) / queries * 1000
+        results['recall'] = hits / total
+        results['quality'] = returned / best
+        pool.close()
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["backfill"]:
+        from therabot_db import get_pool
+
+        with get_pool().connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            backfill_signatures(conn)
+        print("Rebuilt journal similarity index")
+        return 0
+    if argv[:1] == ["bench"]:
+        r = benchmark()
+        print(f"{r['entries']} entries: index {r['index_us']:.0f} us/entry, "
+              f"top-{TOP_K} related {r['lsh_ms']:.2f} ms vs exact scan {r['scan_ms']:.0f} ms, "
+              f"recall {r['recall']:.1%}, quality {r['quality']:.1%}")
+        return 0
+    print("usage: python therabot_similarity.py [backfill|bench]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
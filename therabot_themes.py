@@ -0,0 +1,229 @@
+"""Journal theme extraction for In2Grative TheraBot.
+
+Each journal entry is tokenized once, when it is saved: lowercased, common
+English stopwords dropped and plurals folded ("friends" -> "friend"). The
+term counts are folded into two tables by ``record_terms``, in the same
+transaction as the entry itself:
+
+- ``daily_terms``: per user, day and term, how often the term was used (tf)
+  and in how many entries (df), so any date window is a range scan, and
+- ``user_terms``: the same counts over a user's whole history.
+
+``top_terms`` ranks the terms used in a window by TF-IDF against the user's
+own history, so words they use everywhere fade and what was particular to
+that stretch of time stands out. History is never re-tokenized to answer
+it. Rebuild both tables with ``python therabot_themes.py backfill``.
+"""
+import math
+import random
+import re
+import sys
+import time
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from therabot_db import day_key, db_cursor, record_journal
+
+TOP_K = 10
+MIN_TERM_LENGTH = 3
+
+Theme = namedtuple('Theme', 'term weight count entries')
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are aren't as at be because been before being
+below between both but by can can't cannot could couldn't did didn't do does doesn't doing don't down
+during each even ever every few for from further get gets getting got had hadn't has hasn't have haven't
+having he he'd he'll he's her here here's hers herself him himself his how how's i i'd i'll i'm i've if
+in into is isn't it it's its itself just let's like lot lots me more most much mustn't my myself no nor
+not now of off on once only or other ought our ours ourselves out over own really same shan't she she'd
+she'll she's should shouldn't so some still such than that that's the their theirs them themselves then
+there there's these they they'd they'll they're they've thing things this those though through to too
+today under until up upon us very was wasn't way we we'd we'll we're we've were weren't what what's when
+when's where where's which while who who's whom why why's will with won't would wouldn't yet you you'd
+you'll you're you've your yours yourself yourselves im ive dont didnt cant wont feel felt feeling
+go goes going gone went come came make made take took want wanted know knew think thought say said see saw
+""".split())
+
+_WORDS = re.compile(r"[a-z][a-z']*")
+
+
+def normalize(word):
+    """Fold possessives and regular plurals so counts collect under one form."""
+    word = word.strip("'")
+    if word.endswith("'s"):
+        word = word[:-2]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Normalized, stopword-free terms of ``text``, in order."""
+    terms = []
+    for word in _WORDS.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        term = normalize(word)
+        if len(term) >= MIN_TERM_LENGTH and term not in STOPWORDS:
+            terms.append(term)
+    return terms
+
+
+def record_terms(c, user_id, ts, terms):
+    """Fold one entry's ``terms`` (from tokenize) into daily_terms and user_terms."""
+    counts = Counter(terms)
+    if not counts:
+        return
+    day = day_key(ts)
+    c.executemany('''INSERT INTO daily_terms (user_id, day, term, tf, df) VALUES (?,?,?,?,1)
+                     ON CONFLICT (user_id, day, term) DO UPDATE SET
+                         tf = tf + excluded.tf, df = df + 1''',
+                  [(user_id, day, term, n) for term, n in counts.items()])
+    c.executemany('''INSERT INTO user_terms (user_id, term, tf, df) VALUES (?,?,?,1)
+                     ON CONFLICT (user_id, term) DO UPDATE SET
+                         tf = tf + excluded.tf, df = df + 1''',
+                  [(user_id, term, n) for term, n in counts.items()])
+
+
+def backfill_terms(conn, batch=1000):
+    """Rebuild daily_terms and user_terms from every journal entry."""
+    conn.execute('DELETE FROM daily_terms')
+    conn.execute('DELETE FROM user_terms')
+    daily = Counter()
+    daily_docs = Counter()
+    totals = Counter()
+    total_docs = Counter()
+    rows = conn.execute('SELECT user_id, date, entry FROM journal_entries WHERE entry IS NOT NULL')
+    while True:
+        chunk = rows.fetchmany(batch)
+        if not chunk:
+            break
+        for user_id, ts, entry in chunk:
+            day = day_key(ts)
+            for term, n in Counter(tokenize(entry)).items():
+                daily[user_id, day, term] += n
+                daily_docs[user_id, day, term] += 1
+                totals[user_id, term] += n
+                total_docs[user_id, term] += 1
+    conn.executemany('INSERT INTO daily_terms (user_id, day, term, tf, df) VALUES (?,?,?,?,?)',
+                     [(*key, n, daily_docs[key]) for key, n in daily.items()])
+    conn.executemany('INSERT INTO user_terms (user_id, term, tf, df) VALUES (?,?,?,?)',
+                     [(*key, n, total_docs[key]) for key, n in totals.items()])
+
+
+def _rank(rows, documents, k):
+    """Top ``k`` Themes from (term, window tf, window df, history df) rows."""
+    if not rows:
+        return []
+    terms = [row[0] for row in rows]
+    tf, window_df, history_df = (np.array([row[i] for row in rows], np.float64) for i in (1, 2, 3))
+    weights = (1 + np.log(tf)) * (np.log((1 + documents) / (1 + history_df)) + 1)
+    k = min(k, len(terms))
+    top = np.argpartition(-weights, k - 1)[:k]
+    top = top[np.lexsort((np.array(terms, object)[top], -weights[top]))]
+    return [Theme(terms[i], float(weights[i]), int(tf[i]), int(window_df[i])) for i in top]
+
+
+def top_terms(user_id, start=None, end=None, k=TOP_K, cursor=db_cursor):
+    """The ``k`` most distinctive terms in ``user_id``'s entries dated ``start``..``end`` (Unix seconds)."""
+    sql = '''SELECT d.term, SUM(d.tf), SUM(d.df), u.df
+             FROM daily_terms d JOIN user_terms u ON u.user_id = d.user_id AND u.term = d.term
+             WHERE d.user_id = ?'''
+    params = [user_id]
+    if start is not None:
+        sql += " AND d.day >= ?"
+        params.append(day_key(start))
+    if end is not None:
+        sql += " AND d.day <= ?"
+        params.append(day_key(end))
+    sql += " GROUP BY d.term"
+    with cursor() as c:
+        c.execute(sql, params)
+        rows = c.fetchall()
+        c.execute('SELECT COUNT(*) FROM journal_entries WHERE user_id = ?', (user_id,))
+        documents = c.fetchone()[0]
+    return _rank(rows, documents, k)
+
+
+def synthetic_word(n):
+    """A distinct letters-only word for ``n``, so it survives tokenize unchanged."""
+    letters = ""
+    while True:
+        n, digit = divmod(n, 26)
+        letters += "abcdefghijklmnopqrstuvwxyz"[digit]
+        if not n:
+            return "zq" + letters + "x"
+
+
+def benchmark(entries=3000, words_per_entry=120, window_days=30, queries=50, seed=7):
+    """One user with ``entries`` daily entries: incremental top terms vs re-tokenizing the window."""
+    import os
+    import tempfile
+
+    from therabot_db import ConnectionPool, migrate
+
+    rng = random.Random(seed)
+    words = [synthetic_word(i) for i in range(3000)]
+    # Words the tokenizer drops would leave nothing to rank and time
+    assert tokenize(" ".join(words)) == words
+    vocabulary = words + sorted(STOPWORDS)
+    weights = [1 / (i + 1) for i in range(len(vocabulary))]
+    base = 1_600_000_000
+    results = {'entries': entries}
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"))
+        migrate(pool)
+        texts = [" ".join(rng.choices(vocabulary, weights, k=words_per_entry)) for _ in range(entries)]
+        started = time.perf_counter()
+        with pool.connection() as conn:
+            c = conn.cursor()
+            for i, text in enumerate(texts):
+                record_journal(c, 1, base + i * 86400, text, 0.0)
+                record_terms(c, 1, base + i * 86400, tokenize(text))
+        results['save_us'] = (time.perf_counter() - started) / entries * 1e6
+
+        windows = [base + rng.randrange(entries - window_days) * 86400 for _ in range(queries)]
+        started = time.perf_counter()
+        for start in windows:
+            top_terms(1, start, start + window_days * 86400, cursor=pool.cursor)
+        results['incremental_ms'] = (time.perf_counter() - started) / queries * 1000
+
+        started = time.perf_counter()
+        for start in windows:
+            with pool.cursor() as c:
+                c.execute('SELECT entry FROM journal_entries WHERE user_id = 1 AND date BETWEEN ? AND ?',
+                          (start, start + window_days * 86400))
+                window = [Counter(tokenize(row[0])) for row in c.fetchall()]
+                c.execute('SELECT entry FROM journal_entries WHERE user_id = 1')
+                history = Counter(term for row in c.fetchall() for term in set(tokenize(row[0])))
+            tf = sum(window, Counter())
+            sorted(tf, key=lambda t: -(1 + math.log(tf[t])) * (math.log((1 + entries) / (1 + history[t])) + 1))[:TOP_K]
+        results['retokenize_ms'] = (time.perf_counter() - started) / queries * 1000
+        pool.close()
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["backfill"]:
+        from therabot_db import get_pool
+
+        with get_pool().connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            backfill_terms(conn)
+        print("Rebuilt journal term counts")
+        return 0
+    if argv[:1] == ["bench"]:
+        r = benchmark()
+        print(f"{r['entries']} entries: save {r['save_us']:.0f} us/entry, "
+              f"30-day top terms {r['incremental_ms']:.2f} ms vs re-tokenizing {r['retokenize_ms']:.1f} ms")
+        return 0
+    print("usage: python therabot_themes.py [backfill|bench]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
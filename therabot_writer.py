@@ -0,0 +1,308 @@
+"""Group-commit writer for In2Grative TheraBot.
+
+Every log action used to commit on its own, so each click from each user
+cost one fsync and the database file became fsync-bound under load. Writes
+now go to a single writer thread that gathers them from every session into
+batches of at most ``max_batch`` operations, lingering up to ``max_delay``
+seconds for more, and commits each batch in one transaction. Each operation
+runs inside its own savepoint, so one failing write is rolled back and
+reported to its caller without taking the rest of the batch with it.
+
+``THERABOT_DURABILITY`` picks the durability mode:
+
+- ``full``: callers wait for the commit and the writer uses synchronous=FULL,
+  so a committed write survives power loss.
+- ``normal`` (default): callers wait for the commit, synchronous=NORMAL.
+  A committed write survives an app crash.
+- ``async``: callers return once the write is queued. Writes still queued
+  or in the open batch are lost if the process dies.
+
+Run ``python therabot_writer.py bench`` to compare per-write commits with
+group commit.
+"""
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future
+
+from therabot_db import DB_PATH, get_pool
+
+DURABILITY_MODES = ("full", "normal", "async")
+DURABILITY = os.environ.get("THERABOT_DURABILITY", "normal")
+MAX_BATCH = int(os.environ.get("THERABOT_WRITE_BATCH", "256"))
+# How long a batch lingers for more writes. With 0 the writer commits whatever
+# queued up while the previous commit was running, so batches grow with load
+MAX_DELAY = float(os.environ.get("THERABOT_WRITE_DELAY_MS", "0")) / 1000
+METRICS_WINDOW = 1000
+
+logger = logging.getLogger(__name__)
+
+_Write = namedtuple('_Write', 'fn args on_commit future queued_at')
+_STOP = object()
+
+
+def _summary(values):
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+class WriterMetrics:
+    """Totals plus the last METRICS_WINDOW batch sizes and latencies."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.batches = 0
+        self.writes = 0
+        self.failed_writes = 0
+        # on_commit callbacks (such as dashboard cache invalidation) that raised
+        self.failed_callbacks = 0
+        self.last_error = None
+        self._batch_sizes = deque(maxlen=window)
+        self._flush_ms = deque(maxlen=window)
+        self._wait_ms = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, size, flush_ms, wait_ms, failed):
+        with self._lock:
+            self.batches += 1
+            self.writes += size
+            self.failed_writes += failed
+            self._batch_sizes.append(size)
+            self._flush_ms.append(flush_ms)
+            self._wait_ms.append(wait_ms)
+
+    def record_callback_failure(self, error):
+        with self._lock:
+            self.failed_callbacks += 1
+            self.last_error = f"on_commit callback failed: {error!r}"
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "writes": self.writes,
+                "failed_writes": self.failed_writes,
+                "failed_callbacks": self.failed_callbacks,
+                "last_error": self.last_error,
+                "batch_size": _summary(self._batch_sizes),
+                "flush_ms": _summary(self._flush_ms),
+                "queue_wait_ms": _summary(self._wait_ms),
+            }
+
+
+class GroupCommitWriter:
+    """Runs ``fn(cursor, *args)`` writes on one thread, committing them in batches."""
+
+    def __init__(self, pool=None, max_batch=MAX_BATCH, max_delay=MAX_DELAY, durability=DURABILITY):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}, not {durability!r}")
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.durability = durability
+        self.metrics = WriterMetrics()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                    self._thread.start()
+
+    def submit(self, fn, *args, on_commit=None):
+        """Queue a write and return a Future for its result.
+
+        ``on_commit(result)`` runs on the writer thread once the write is
+        committed, before the Future resolves.
+        """
+        future = Future()
+        self._ensure_started()
+        self._queue.put(_Write(fn, args, on_commit, future, time.monotonic()))
+        return future
+
+    def write(self, fn, *args, on_commit=None, wait=None):
+        """Queue a write; wait for its result unless the durability mode is async.
+
+        Pass ``wait=True`` when the caller needs the result (a row id, say)
+        even in async mode.
+        """
+        future = self.submit(fn, *args, on_commit=on_commit)
+        if wait or (wait is None and self.durability != "async"):
+            return future.result()
+        return None
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is committed."""
+        self.submit(None).result(timeout)
+
+    def stop(self, timeout=5.0):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        pool = self.pool or get_pool()
+        conn = pool.acquire()
+        try:
+            conn.execute(f"PRAGMA synchronous={'FULL' if self.durability == 'full' else 'NORMAL'}")
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                batch = [first]
+                deadline = first.queued_at + self.max_delay
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+        finally:
+            pool.release(conn)
+
+    def _commit(self, conn, batch):
+        started = time.monotonic()
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            c = conn.cursor()
+            for item in batch:
+                if item.fn is None:
+                    outcomes.append((item, None, None))
+                    continue
+                c.execute("SAVEPOINT group_write")
+                try:
+                    result = item.fn(c, *item.args)
+                except Exception as e:
+                    c.execute("ROLLBACK TO group_write")
+                    c.execute("RELEASE group_write")
+                    outcomes.append((item, None, e))
+                else:
+                    c.execute("RELEASE group_write")
+                    outcomes.append((item, result, None))
+            c.close()
+            conn.commit()
+        except Exception as e:
+            # BEGIN or COMMIT itself failed: nothing in the batch was written
+            if conn.in_transaction:
+                conn.rollback()
+            outcomes = [(item, None, e) for item in batch]
+        finished = time.monotonic()
+        # flush() markers aren't writes and don't count toward batch sizes
+        writes = [error for item, _, error in outcomes if item.fn is not None]
+        if writes:
+            self.metrics.record(len(writes), (finished - started) * 1000,
+                                (started - batch[0].queued_at) * 1000,
+                                sum(1 for error in writes if error is not None))
+        for item, result, error in outcomes:
+            if error is None and item.on_commit is not None:
+                try:
+                    item.on_commit(result)
+                except Exception as e:
+                    # The write itself is committed; its caller still gets the result
+                    logger.exception("on_commit callback failed for %s", getattr(item.fn, '__name__', item.fn))
+                    self.metrics.record_callback_failure(e)
+            if error is None:
+                item.future.set_result(result)
+            else:
+                item.future.set_exception(error)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the process-wide writer, creating it on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter()
+    return _writer
+
+
+def benchmark(threads=16, writes_per_thread=200, durability="normal", directory=None):
+    """Concurrent mood inserts with a commit per write vs group commit.
+
+    Returns {mode: (writes_per_second, metrics or None)}.
+    """
+    import tempfile
+
+    from therabot_db import ConnectionPool, migrate, now_ts, record_mood
+
+    def hammer(write):
+        workers = [threading.Thread(target=lambda t=t: [write(t, i) for i in range(writes_per_thread)])
+                   for t in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return threads * writes_per_thread / (time.perf_counter() - started)
+
+    results = {}
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"), size=threads + 1)
+        migrate(pool)
+        if durability == "full":
+            for _ in range(threads):
+                conn = pool.acquire()
+                conn.execute("PRAGMA synchronous=FULL")
+                pool.release(conn)
+
+        def per_write(user_id, i):
+            with pool.cursor() as c:
+                record_mood(c, user_id, now_ts(), i % 11)
+
+        results["per-write commit"] = (hammer(per_write), None)
+
+        writer = GroupCommitWriter(pool, durability=durability)
+        results["group commit"] = (hammer(lambda user_id, i: writer.write(record_mood, user_id, now_ts(), i % 11)),
+                                   writer.metrics.snapshot())
+        writer.stop()
+        pool.close()
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["bench"]:
+        durability = argv[1] if len(argv) > 1 else "full"
+        # Benchmark next to the app database by default: fsync cost depends on the disk
+        directory = argv[2] if len(argv) > 2 else os.path.dirname(os.path.abspath(DB_PATH))
+        print(f"durability={durability} dir={directory}")
+        for mode, (rate, metrics) in benchmark(durability=durability, directory=directory).items():
+            line = f"{mode:>17}: {rate:9.0f} writes/s"
+            if metrics:
+                line += (f"  batches={metrics['batches']}"
+                         f" mean batch={metrics['batch_size']['mean']:.1f}"
+                         f" flush p95={metrics['flush_ms']['p95']:.2f} ms")
+            print(line)
+        return 0
+    print("usage: python therabot_writer.py bench [full|normal|async] [directory]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())